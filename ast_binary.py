@@ -0,0 +1,350 @@
+# ast_binary.py
+# Formato binário compacto e versionado para a AST (ASTNode), com leitura
+# preguiçosa por mmap.
+#
+# Os nós ficam em arrays planos (pré-ordem, raiz no índice 0): tipo, valor,
+# flags, linha, posição e o início dos filhos em um array único de índices.
+# Tipos e valores vão para tabelas deduplicadas, então 'x' repetido mil vezes
+# ocupa uma entrada só. Um nó compartilhado (AST como DAG, ver
+# PythonLikeParser(share_expressions=True)) é gravado uma vez e continua
+# compartilhado na leitura.
+#
+# A leitura (BinaryAST) mapeia o arquivo na memória e não decodifica nada além
+# do cabeçalho e dos nomes de tipos: cada LazyNode lê seus campos direto dos
+# arrays quando pedidos, então percorrer só um pedaço da árvore custa só esse
+# pedaço. LazyNode tem a mesma interface de leitura do ASTNode (type, value,
+# error, lineno, lexpos, children, id) e pode ir direto para o ast_to_dot ou
+# para o SemanticAnalyzer; to_ast() refaz os ASTNode quando for preciso alterar
+# a árvore (ex.: otimizador).
+import mmap
+import struct
+import sys
+from array import array
+
+from parser_ast import ASTNode
+
+# ---------------------------
+# Formato (little-endian)
+# ---------------------------
+#   cabeçalho: magic b'PLAS', versão u16, reservado u16, u32 quantidade de
+#              tipos, valores, nós e arestas, e o deslocamento (u64) de cada
+#              seção abaixo
+#   tipos:     n x (u16 tamanho + utf-8)
+#   valores:   índice u32[n+1] (início de cada valor nos dados) + dados:
+#              u8 tipo (None, int, int grande, str, True, False, float) + conteúdo
+#   nós:       tipos u16[n], valores u32[n], flags u8[n], linhas u32[n],
+#              posições i32[n], início dos filhos u32[n+1]
+# A posição tem sinal: em um nó compartilhado ela é relativa ao pai (ver
+# parser_ast.child_lexpos) e pode ser negativa.
+#   arestas:   índices dos filhos u32[m]
+# As seções começam em múltiplos de 4 bytes, para os arrays serem lidos sem cópia.
+AST_MAGIC = b'PLAS'
+AST_VERSION = 2
+
+_HEADER = struct.Struct('<4sHHIIII11Q')
+_SECTIONS = ('types', 'value_index', 'value_data', 'type_ids', 'value_ids', 'flags',
+             'linenos', 'lexpos', 'child_start', 'children', 'end')
+
+_VALUE_NONE = 0
+_VALUE_INT = 1
+_VALUE_BIGINT = 2  # inteiro fora de 64 bits, em decimal
+_VALUE_STR = 3
+_VALUE_TRUE = 4
+_VALUE_FALSE = 5
+_VALUE_FLOAT = 6  # constantes dobradas pelo otimizador (ex.: 1 / 2)
+
+_FLAG_ERROR = 1
+
+# Linha/posição ausente (None)
+_NO_POSITION = 0xFFFFFFFF
+_NO_LEXPOS = -0x80000000
+
+_INT64 = (-(1 << 63), (1 << 63) - 1)
+
+
+# ---------------------------
+# Escrita
+# ---------------------------
+def _encode_value(value):
+    if value is None:
+        return bytes((_VALUE_NONE,))
+    if value is True:
+        return bytes((_VALUE_TRUE,))
+    if value is False:
+        return bytes((_VALUE_FALSE,))
+    if isinstance(value, int):
+        if _INT64[0] <= value <= _INT64[1]:
+            return struct.pack('<Bq', _VALUE_INT, value)
+        data = str(value).encode('ascii')
+        return struct.pack('<BI', _VALUE_BIGINT, len(data)) + data
+    if isinstance(value, float):
+        return struct.pack('<Bd', _VALUE_FLOAT, value)
+    data = str(value).encode('utf-8')
+    return struct.pack('<BI', _VALUE_STR, len(data)) + data
+
+
+def _little_endian(arr):
+    if sys.byteorder == 'big':
+        arr = array(arr.typecode, arr)
+        arr.byteswap()
+    return arr.tobytes()
+
+
+def write_ast(root, out):
+    """Grava a AST (ou DAG) de root em um arquivo aberto em modo 'wb'."""
+    type_names, type_ids = [], {}
+    values, value_ids = [], {}
+    node_index = {}  # id do nó -> índice no arquivo
+    nodes = []
+
+    # Pré-ordem sem recursão; um nó já numerado (compartilhado) não é repetido
+    stack = [root]
+    while stack:
+        node = stack.pop()
+        if node.id in node_index:
+            continue
+        node_index[node.id] = len(nodes)
+        nodes.append(node)
+        stack.extend(reversed(node.children))
+
+    node_types = array('H')
+    node_values = array('I')
+    flags = array('B')
+    linenos = array('I')
+    lexpos = array('i')
+    child_start = array('I')
+    children = array('I')
+    for node in nodes:
+        type_id = type_ids.get(node.type)
+        if type_id is None:
+            type_id = type_ids[node.type] = len(type_names)
+            type_names.append(node.type)
+        # (tipo, valor) para que 1, True e '1' não virem a mesma entrada
+        key = (node.value.__class__, node.value)
+        value_id = value_ids.get(key)
+        if value_id is None:
+            value_id = value_ids[key] = len(values)
+            values.append(node.value)
+        node_types.append(type_id)
+        node_values.append(value_id)
+        flags.append(_FLAG_ERROR if node.error else 0)
+        linenos.append(_NO_POSITION if node.lineno is None else node.lineno)
+        lexpos.append(_NO_LEXPOS if node.lexpos is None else node.lexpos)
+        child_start.append(len(children))
+        children.extend(node_index[child.id] for child in node.children)
+    child_start.append(len(children))
+
+    value_index = array('I')
+    value_data = bytearray()
+    for value in values:
+        value_index.append(len(value_data))
+        value_data += _encode_value(value)
+    value_index.append(len(value_data))
+
+    types_data = b''.join(struct.pack('<H', len(data)) + data
+                          for data in (name.encode('utf-8') for name in type_names))
+    sections = [types_data, _little_endian(value_index), bytes(value_data),
+                _little_endian(node_types), _little_endian(node_values), flags.tobytes(),
+                _little_endian(linenos), _little_endian(lexpos), _little_endian(child_start),
+                _little_endian(children)]
+
+    offsets = []
+    position = _HEADER.size
+    for data in sections:
+        position += -position % 4
+        offsets.append(position)
+        position += len(data)
+    offsets.append(position)
+    out.write(_HEADER.pack(AST_MAGIC, AST_VERSION, 0, len(type_names), len(values), len(nodes),
+                           len(children), *offsets))
+    written = _HEADER.size
+    for data, offset in zip(sections, offsets):
+        out.write(b'\0' * (offset - written))
+        out.write(data)
+        written = offset + len(data)
+    return len(nodes)
+
+
+def save_ast(root, filename):
+    """Grava a AST em um arquivo; devolve quantos nós foram gravados."""
+    with open(filename, "wb") as f:
+        return write_ast(root, f)
+
+
+# ---------------------------
+# Leitura preguiçosa
+# ---------------------------
+class LazyNode:
+    """Nó lido sob demanda de um BinaryAST (somente leitura)."""
+    __slots__ = ('tree', 'id', '_children')
+
+    def __init__(self, tree, index):
+        self.tree = tree
+        self.id = index  # único dentro do arquivo (usado como nome no DOT)
+        self._children = None
+
+    @property
+    def type(self):
+        return self.tree.type_names[self.tree.type_ids[self.id]]
+
+    @property
+    def value(self):
+        return self.tree.value(self.tree.value_ids[self.id])
+
+    @property
+    def error(self):
+        return bool(self.tree.flags[self.id] & _FLAG_ERROR)
+
+    @property
+    def lineno(self):
+        lineno = self.tree.linenos[self.id]
+        return None if lineno == _NO_POSITION else lineno
+
+    @property
+    def lexpos(self):
+        lexpos = self.tree.lexpos[self.id]
+        return None if lexpos == _NO_LEXPOS else lexpos
+
+    @property
+    def children(self):
+        if self._children is None:
+            self._children = [LazyNode(self.tree, i) for i in self.tree.child_indexes(self.id)]
+        return self._children
+
+    def __repr__(self):
+        return f"LazyNode({self.type!r}, {self.value!r}, id={self.id})"
+
+
+class BinaryAST:
+    """AST gravada por write_ast, mapeada na memória; root é um LazyNode.
+
+    Use como gerenciador de contexto (ou chame close()) para liberar o arquivo.
+    """
+
+    def __init__(self, filename):
+        self._file = open(filename, 'rb')
+        self._views = []
+        try:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:  # arquivo vazio
+            self._file.close()
+            raise ValueError("Arquivo de AST inválido (vazio)") from None
+        try:
+            self._load()
+        except Exception:
+            self.close()
+            raise
+
+    def _load(self):
+        data = self._map
+        if len(data) < _HEADER.size:
+            raise ValueError("Arquivo de AST inválido (cabeçalho incompleto)")
+        magic, version, _, n_types, n_values, n_nodes, n_edges, *offsets = \
+            _HEADER.unpack_from(data, 0)
+        if magic != AST_MAGIC:
+            raise ValueError("Arquivo de AST inválido (assinatura incorreta)")
+        if version != AST_VERSION:
+            raise ValueError(f"Versão de arquivo de AST não suportada: {version}")
+        sections = dict(zip(_SECTIONS, offsets))
+        if sections['end'] > len(data) or not n_nodes:
+            raise ValueError("Arquivo de AST inválido (truncado)")
+
+        # Só os nomes de tipos são decodificados na abertura (são poucos)
+        self.type_names = []
+        position = sections['types']
+        for _ in range(n_types):
+            size, = struct.unpack_from('<H', data, position)
+            self.type_names.append(bytes(data[position + 2:position + 2 + size]).decode('utf-8'))
+            position += 2 + size
+
+        self._value_index = self._array(sections['value_index'], 'I', n_values + 1)
+        self._value_data = sections['value_data']
+        self._values = {}  # valores já decodificados
+        self.type_ids = self._array(sections['type_ids'], 'H', n_nodes)
+        self.value_ids = self._array(sections['value_ids'], 'I', n_nodes)
+        self.flags = self._array(sections['flags'], 'B', n_nodes)
+        self.linenos = self._array(sections['linenos'], 'I', n_nodes)
+        self.lexpos = self._array(sections['lexpos'], 'i', n_nodes)
+        self.child_start = self._array(sections['child_start'], 'I', n_nodes + 1)
+        self.child_array = self._array(sections['children'], 'I', n_edges)
+        self.root = LazyNode(self, 0)
+
+    def _array(self, offset, typecode, count):
+        """Array do arquivo sem cópia (memoryview); em máquinas big-endian, uma cópia invertida."""
+        size = array(typecode).itemsize
+        raw = memoryview(self._map)[offset:offset + count * size]
+        if sys.byteorder == 'big' and size > 1:
+            arr = array(typecode, raw.tobytes())
+            arr.byteswap()
+            raw.release()
+            return arr
+        view = raw.cast(typecode)
+        self._views += (raw, view)
+        return view
+
+    def __len__(self):
+        return len(self.type_ids)
+
+    def child_indexes(self, index):
+        return self.child_array[self.child_start[index]:self.child_start[index + 1]]
+
+    def value(self, value_id):
+        """Valor da tabela, decodificado na primeira vez em que é pedido."""
+        try:
+            return self._values[value_id]
+        except KeyError:
+            pass
+        data = self._map
+        position = self._value_data + self._value_index[value_id]
+        kind = data[position]
+        if kind == _VALUE_NONE:
+            value = None
+        elif kind == _VALUE_TRUE:
+            value = True
+        elif kind == _VALUE_FALSE:
+            value = False
+        elif kind == _VALUE_INT:
+            value, = struct.unpack_from('<q', data, position + 1)
+        elif kind == _VALUE_FLOAT:
+            value, = struct.unpack_from('<d', data, position + 1)
+        else:
+            size, = struct.unpack_from('<I', data, position + 1)
+            text = bytes(data[position + 5:position + 5 + size])
+            value = int(text) if kind == _VALUE_BIGINT else text.decode('utf-8')
+        self._values[value_id] = value
+        return value
+
+    def to_ast(self):
+        """Refaz toda a árvore como ASTNode (nós compartilhados continuam compartilhados)."""
+        nodes = []
+        for index in range(len(self)):
+            node = ASTNode(self.type_names[self.type_ids[index]], self.value(self.value_ids[index]))
+            node.error = bool(self.flags[index] & _FLAG_ERROR)
+            lineno, lexpos = self.linenos[index], self.lexpos[index]
+            node.lineno = None if lineno == _NO_POSITION else lineno
+            node.lexpos = None if lexpos == _NO_LEXPOS else lexpos
+            nodes.append(node)
+        child_start, child_array = self.child_start, self.child_array
+        for index, node in enumerate(nodes):
+            start, end = child_start[index], child_start[index + 1]
+            if start != end:
+                node.children = [nodes[i] for i in child_array[start:end]]
+        return nodes[0]
+
+    def close(self):
+        for view in reversed(self._views):
+            view.release()
+        self._views = []
+        self._map.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def load_ast(filename):
+    """Abre um arquivo gravado por save_ast; a árvore é lida sob demanda (BinaryAST.root)."""
+    return BinaryAST(filename)
@@ -1,18 +1,247 @@
-def ast_to_dot(node):
+# ast_to_dot.py
+# Saída da AST para o GraphViz: escrita do DOT e geração das imagens.
+#
+# O DOT é escrito direto no arquivo, nó a nó (em largura), sem montar o
+# documento na memória. Os limites de nós e de profundidade recolhem o que
+# sobra em nós-resumo ("+N nós"), para que árvores grandes ainda possam ser
+# desenhadas. As imagens (png, svg ou plain) podem ser geradas uma a uma ou em
+# lote: uma única chamada 'dot -O' converte vários arquivos de uma vez, o que
+# evita criar um processo do GraphViz por arquivo.
+import io
+import os
+import subprocess
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import pipeline_stats
+
+GRAPH_FORMATS = ('png', 'svg', 'plain')
+
+# Arquivos por chamada do 'dot' na geração em lote
+RENDER_BATCH_SIZE = 64
+
+
+# ---------------------------
+# DOT
+# ---------------------------
+def _escape(text):
+    return str(text).replace('\\', '\\\\').replace('"', '\\"')
+
+
+def subtree_size(node):
+    count = 0
+    stack = [node]
+    while stack:
+        n = stack.pop()
+        count += 1
+        stack.extend(n.children)
+    return count
+
+
+_DOT_HEADER = 'digraph AST {\nnode [shape=box];\n'
+
+
+def _write_node(write, node):
+    label = node.type if node.value is None else f"{node.type}\\n{_escape(node.value)}"
+    if node.error:
+        write(f'"{node.id}" [label="{label}", color=red, fontcolor=red];\n')
+    else:
+        write(f'"{node.id}" [label="{label}"];\n')
+
+
+def _write_summary(write, node, hidden):
+    write(f'"{node.id}+" [label="+{hidden} nós", shape=ellipse, style=dashed];\n')
+    write(f'"{node.id}" -> "{node.id}+" [style=dashed];\n')
+
+
+def write_dot(root, out, max_nodes=None, max_depth=None):
+    """Escreve o DOT da AST em out (arquivo texto); devolve quantos nós da AST entraram.
+
+    max_nodes limita os nós da AST escritos; max_depth, a profundidade (a raiz
+    tem profundidade 0). Os filhos que não couberem viram um único nó-resumo
+    por pai, com o total de nós recolhidos.
+    """
+    out.write(_DOT_HEADER)
+    reserved = _write_subtree(out.write, root, 0, 1, max_nodes, max_depth)
+    out.write('}\n')
+    return reserved
+
+
+def _write_subtree(write, root, depth, reserved, max_nodes, max_depth):
+    """Nós e arestas da subárvore (já contada em reserved); devolve o novo total."""
+    queue = deque([(root, depth)])
+    while queue:
+        node, depth = queue.popleft()
+        _write_node(write, node)
+        children = node.children
+        if not children:
+            continue
+
+        if max_depth is not None and depth >= max_depth:
+            shown = 0
+        elif max_nodes is not None:
+            shown = max(0, min(len(children), max_nodes - reserved))
+        else:
+            shown = len(children)
+        reserved += shown
+        for child in children[:shown]:
+            write(f'"{node.id}" -> "{child.id}";\n')
+            queue.append((child, depth + 1))
+
+        if shown < len(children):
+            _write_summary(write, node, sum(subtree_size(child) for child in children[shown:]))
+    return reserved
+
+
+class DotStream:
+    """DOT escrito aos pedaços (modo streaming): a raiz e depois um filho por vez.
+
+    add(filho) escreve a aresta da raiz até ele e a subárvore dele, que pode
+    ser descartada em seguida. Com os limites, os primeiros filhos entram
+    inteiros e os que não couberem viram um único nó-resumo, escrito no close().
+    """
+
+    def __init__(self, out, root, max_nodes=None, max_depth=None):
+        self.out = out
+        self.root = root
+        self.max_nodes = max_nodes
+        self.max_depth = max_depth
+        self.reserved = 1  # nós da AST já escritos
+        self.hidden = 0    # nós recolhidos no resumo da raiz
+        out.write(_DOT_HEADER)
+        _write_node(out.write, root)
+
+    def add(self, node):
+        if ((self.max_depth is not None and self.max_depth < 1)
+                or (self.max_nodes is not None and self.reserved >= self.max_nodes)):
+            self.hidden += subtree_size(node)
+            return
+        write = self.out.write
+        write(f'"{self.root.id}" -> "{node.id}";\n')
+        self.reserved = _write_subtree(write, node, 1, self.reserved + 1,
+                                       self.max_nodes, self.max_depth)
+
+    def close(self):
+        """Fecha o grafo; devolve quantos nós da AST entraram."""
+        if self.hidden:
+            _write_summary(self.out.write, self.root, self.hidden)
+        self.out.write('}\n')
+        return self.reserved
+
+
+def ast_to_dot(node, max_nodes=None, max_depth=None):
     """Gera texto DOT para GraphViz a partir de ASTNode"""
-    lines = []
-    lines.append('digraph AST {')
-    lines.append('node [shape=box];')
-
-    def walk(n):
-        label = f"{n.type}"
-        if n.value is not None:
-            label += f"\\n{n.value}"
-        lines.append(f'"{n.id}" [label="{label}"];')
-        for child in n.children:
-            lines.append(f'"{n.id}" -> "{child.id}";')
-            walk(child)
-
-    walk(node)
-    lines.append('}')
-    return '\n'.join(lines)
+    out = io.StringIO()
+    write_dot(node, out, max_nodes, max_depth)
+    return out.getvalue()
+
+
+# ---------------------------
+# GraphViz
+# ---------------------------
+class GraphvizRenderer:
+    """Converte arquivos DOT com o comando 'dot' (um arquivo ou vários por chamada)."""
+
+    def __init__(self, fmt='png', command='dot', batch_size=RENDER_BATCH_SIZE):
+        if fmt not in GRAPH_FORMATS:
+            raise ValueError(f"Formato de imagem desconhecido: {fmt}")
+        self.fmt = fmt
+        self.command = command
+        self.batch_size = batch_size
+        self.calls = 0  # chamadas ao 'dot'
+        self.missing = False  # o comando não foi encontrado
+
+    def _run(self, args):
+        """Executa o dot; devolve o erro (texto) ou None se correu tudo bem."""
+        if self.missing:
+            return "GraphViz não encontrado"
+        self.calls += 1
+        try:
+            result = subprocess.run([self.command] + args, stdout=subprocess.DEVNULL,
+                                    stderr=subprocess.PIPE)
+        except FileNotFoundError:
+            self.missing = True
+            print(f"GraphViz não encontrado. Instale o GraphViz para gerar o {self.fmt.upper()}.")
+            return "GraphViz não encontrado"
+        if result.returncode:
+            return result.stderr.decode('utf-8', 'replace').strip() or f"código {result.returncode}"
+        return None
+
+    def render(self, dot_file, out_file):
+        """Gera uma imagem; devolve True se ela foi gerada."""
+        with pipeline_stats.stage('graphviz'):
+            error = self._run([f"-T{self.fmt}", dot_file, "-o", out_file])
+        if error is None:
+            print(f"Arquivo {self.fmt.upper()} gerado: {out_file}")
+            return True
+        if not self.missing:
+            print(f"Erro ao gerar {self.fmt.upper()}:", error)
+        return False
+
+    def _render_chunk(self, chunk):
+        # 'dot -O' grava cada entrada em <entrada>.<formato>; depois renomeamos
+        self._run([f"-T{self.fmt}", "-O"] + [dot_file for dot_file, _ in chunk])
+        done = []
+        for dot_file, out_file in chunk:
+            produced = f"{dot_file}.{self.fmt}"
+            try:
+                os.replace(produced, out_file)
+            except OSError:
+                continue  # este arquivo falhou (o dot segue com os demais)
+            done.append(out_file)
+        return done
+
+    def render_many(self, jobs, workers=1):
+        """Gera as imagens de [(arquivo DOT, arquivo de saída)]; devolve as que foram geradas.
+
+        Os arquivos são agrupados em lotes de batch_size por chamada ao dot, com
+        até workers chamadas ao mesmo tempo.
+        """
+        jobs = list(jobs)
+        chunks = [jobs[i:i + self.batch_size] for i in range(0, len(jobs), self.batch_size)]
+        if not chunks:
+            return []
+        with pipeline_stats.stage('graphviz'):
+            first = self._render_chunk(chunks[0])  # se o dot não existir, para aqui
+            if self.missing or len(chunks) == 1:
+                return first
+            with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+                rest = executor.map(self._render_chunk, chunks[1:])
+                return first + [out_file for done in rest for out_file in done]
+
+
+class GraphOutput:
+    """Como a AST vira arquivos: limites do DOT, formato e geração da imagem.
+
+    Com defer=True as imagens não são geradas na hora: os pedidos ficam em
+    pending para serem convertidos depois, todos juntos (modo lote).
+    """
+
+    def __init__(self, fmt='png', max_nodes=None, max_depth=None, render=True, defer=False):
+        self.renderer = GraphvizRenderer(fmt)
+        self.fmt = fmt
+        self.max_nodes = max_nodes
+        self.max_depth = max_depth
+        self.render = render
+        self.defer = defer
+        self.pending = []  # (arquivo DOT, arquivo da imagem, chave do cache ou None)
+
+    @property
+    def variant(self):
+        """Parte da chave do cache que depende dos limites (o DOT muda com eles)."""
+        if self.max_nodes is None and self.max_depth is None:
+            return ''
+        return f"dot-nodes={self.max_nodes},depth={self.max_depth}"
+
+    def write_dot(self, root, dot_file):
+        with open(dot_file, "w") as f:
+            write_dot(root, f, self.max_nodes, self.max_depth)
+
+    def image(self, dot_file, image_file, key=None):
+        """Gera (ou agenda, com defer) a imagem; devolve True se ela foi gerada agora."""
+        if not self.render:
+            return False
+        if self.defer:
+            self.pending.append((dot_file, image_file, key))
+            return False
+        return self.renderer.render(dot_file, image_file)
@@ -0,0 +1,351 @@
+# async_server.py
+# Modo servidor concorrente (--serve --async): uma camada asyncio na frente do
+# AnalysisService de server.py.
+#
+# - lex/parse/semântica rodam em um pool limitado de processos, cada um com o
+#   seu AnalysisService já carregado; um arquivo enorme ocupa só um processo.
+# - As imagens do GraphViz são geradas por subprocessos assíncronos, com um
+#   limite de quantos rodam ao mesmo tempo.
+# - Cada pedido tem um tempo máximo (fila + análise + imagem); ao estourar, o
+#   cliente recebe um erro e, se o pedido ainda estava na fila, ele é descartado.
+#   Um pedido que já estava em um processo continua ocupando a sua vaga até o
+#   processo terminar.
+# - Com todos os processos ocupados e a fila cheia, novos pedidos são recusados
+#   na hora ("busy": true) em vez de se acumularem na memória.
+# - {"op": "stats"} devolve contadores e os percentis de latência.
+#
+# O protocolo é o mesmo de server.py, com dois campos a mais: "image" (png,
+# svg ou plain) e, opcionalmente, "image_file". Sem image_file a imagem vem
+# na resposta em base64; image_file é um nome de arquivo dentro do diretório
+# configurado em image_dir (--image-dir) e é recusado sem ele. As respostas de
+# uma mesma conexão saem na ordem em que ficam prontas; o cliente as associa
+# aos pedidos pelo "id".
+import asyncio
+import base64
+import contextlib
+import json
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from ast_to_dot import GRAPH_FORMATS
+from parser_ast import prepare_tables
+from server import AnalysisService, RequestError, DEFAULT_OUTPUTS, remove_stale_socket
+
+DEFAULT_MAX_QUEUE = 64
+DEFAULT_TIMEOUT = 30.0
+DEFAULT_GRAPHVIZ_JOBS = 2
+
+# Latências guardadas para os percentis (as mais recentes)
+LATENCY_WINDOW = 10000
+
+# Tamanho máximo de uma linha de pedido (o código vai dentro dela)
+MAX_LINE = 64 * 1024 * 1024
+
+# Serviço de cada processo do pool (preenchido pelo initializer)
+_worker = {}
+
+
+# -------------------------------
+# Processos do pool
+# -------------------------------
+def _init_worker(lexer_backend='ply'):
+    # A saída padrão pode ser o canal do protocolo: nada de prints nela
+    sys.stdout = sys.stderr
+    _worker['service'] = AnalysisService(lexer_backend)
+
+
+def _handle(request):
+    return _worker['service'].handle(request)
+
+
+def _warm_up():
+    return os.getpid()
+
+
+# -------------------------------
+# Serviço assíncrono
+# -------------------------------
+def percentile(sorted_values, p):
+    """Percentil p (0-100) pelo método do posto mais próximo."""
+    if not sorted_values:
+        return None
+    index = max(0, min(len(sorted_values) - 1, round(p / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+class AsyncAnalysisService:
+    def __init__(self, workers=None, max_queue=DEFAULT_MAX_QUEUE, timeout=DEFAULT_TIMEOUT,
+                 graphviz_jobs=DEFAULT_GRAPHVIZ_JOBS, lexer_backend='ply', graphviz_command='dot',
+                 image_dir=None):
+        self.workers = workers or os.cpu_count() or 1
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self.graphviz_command = graphviz_command
+        # Único diretório onde image_file pode gravar (None: image_file recusado)
+        self.image_dir = os.path.realpath(image_dir) if image_dir is not None else None
+        self.lexer_backend = lexer_backend
+        self.pool = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker,
+                                        initargs=(lexer_backend,))
+        self._graphviz_slots = asyncio.Semaphore(graphviz_jobs)
+        # Pedidos de análise aceitos e ainda não terminados: um pedido que
+        # estourou o tempo conta até o processo dele terminar
+        self.inflight = 0
+        self.counters = {'requests': 0, 'rejected': 0, 'timeouts': 0, 'errors': 0}
+        self.latencies = deque(maxlen=LATENCY_WINDOW)  # em segundos
+        self.tasks = set()  # respostas em andamento (de todas as conexões)
+        self.stopping = asyncio.Event()
+
+    async def start(self):
+        """Sobe os processos do pool (tabelas carregadas) antes do primeiro pedido."""
+        # Com o cache frio, os processos gerariam as mesmas tabelas ao mesmo tempo
+        prepare_tables(self.lexer_backend)
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(*(loop.run_in_executor(self.pool, _warm_up)
+                               for _ in range(self.workers)))
+
+    async def drain(self):
+        """Espera as respostas em andamento (inclusive a do próprio 'shutdown')."""
+        pending = self.tasks - {asyncio.current_task()}
+        if pending:
+            await asyncio.wait(pending, timeout=self.timeout)
+
+    def close(self):
+        self.pool.shutdown(wait=False, cancel_futures=True)
+
+    @property
+    def capacity(self):
+        return self.workers + self.max_queue
+
+    async def handle(self, request):
+        if not isinstance(request, dict):
+            return {'id': None, 'ok': False, 'error': "O pedido deve ser um objeto JSON"}
+        request_id = request.get('id')
+        op = request.get('op', 'analyze')
+        if op == 'ping':
+            return {'id': request_id, 'ok': True, 'requests': self.counters['requests']}
+        if op == 'stats':
+            return dict({'id': request_id, 'ok': True}, **self.stats())
+        if op == 'shutdown':
+            self.stopping.set()
+            return {'id': request_id, 'ok': True, 'shutdown': True}
+        if op != 'analyze':
+            return {'id': request_id, 'ok': False, 'error': f"Operação desconhecida: {op!r}"}
+
+        if self.inflight >= self.capacity:
+            self.counters['rejected'] += 1
+            return {'id': request_id, 'ok': False, 'busy': True,
+                    'error': f"Servidor ocupado ({self.inflight} pedidos em andamento)"}
+        self.inflight += 1
+        self.counters['requests'] += 1
+        start = time.perf_counter()
+        jobs = []  # trabalho mandado ao pool (preenchido por _analyze)
+        try:
+            response = await asyncio.wait_for(self._analyze(request, jobs), self.timeout)
+        except asyncio.TimeoutError:
+            self.counters['timeouts'] += 1
+            response = {'id': request_id, 'ok': False, 'timeout': True,
+                        'error': f"Tempo esgotado ({self.timeout:g} s)"}
+        except RequestError as e:
+            response = {'id': request_id, 'ok': False, 'error': str(e)}
+        finally:
+            if jobs and not jobs[0].done():
+                # O processo continua ocupado: a vaga só volta quando ele terminar
+                jobs[0].add_done_callback(self._release_later(asyncio.get_running_loop()))
+            else:
+                self.inflight -= 1
+        if 'error' in response:
+            self.counters['errors'] += 1
+        elapsed = time.perf_counter() - start
+        self.latencies.append(elapsed)
+        response['elapsed_ms'] = round(elapsed * 1000, 3)
+        return response
+
+    def _release_later(self, loop):
+        """Callback do pool (roda em outra thread) que devolve a vaga no laço."""
+        def release(_job):
+            with contextlib.suppress(RuntimeError):  # laço já fechado
+                loop.call_soon_threadsafe(self._release)
+        return release
+
+    def _release(self):
+        self.inflight -= 1
+
+    def _image_path(self, name):
+        """Caminho de image_file dentro de image_dir; RequestError se sair dele."""
+        if self.image_dir is None:
+            raise RequestError("image_file não está habilitado (inicie o servidor com --image-dir)")
+        if not isinstance(name, str):
+            raise RequestError("image_file deve ser um nome de arquivo")
+        path = os.path.realpath(os.path.join(self.image_dir, name))
+        if os.path.dirname(path) != self.image_dir:
+            raise RequestError(f"image_file deve ser um arquivo direto em {self.image_dir}: {name!r}")
+        return path
+
+    async def _analyze(self, request, jobs):
+        fmt = request.get('image')
+        if fmt is not None and fmt not in GRAPH_FORMATS:
+            raise RequestError(f"Formato de imagem desconhecido: {fmt!r}")
+        image_path = None
+        if fmt is not None and request.get('image_file'):
+            image_path = self._image_path(request['image_file'])
+        worker_request = request
+        if fmt is not None:
+            # A imagem sai do DOT, então ele é pedido ao processo mesmo sem 'dot' nas saídas
+            outputs = request.get('outputs', DEFAULT_OUTPUTS)
+            outputs = [outputs] if isinstance(outputs, str) else list(outputs)
+            worker_request = dict(request, outputs=outputs + ['dot'])
+
+        # Com o futuro do pool em mãos, handle sabe se o processo ainda trabalha
+        # depois de um tempo esgotado (cancelar só tira da fila)
+        jobs.append(self.pool.submit(_handle, worker_request))
+        response = await asyncio.wrap_future(jobs[0])
+        if fmt is None or response.get('dot') is None:
+            return response
+        dot = response['dot'] if 'dot' in request.get('outputs', ()) else response.pop('dot')
+        data, error = await self.render(dot, fmt)
+        if error is not None:
+            response['image_error'] = error
+        elif image_path is not None:
+            with open(image_path, "wb") as f:
+                f.write(data)
+            response['image_file'] = image_path
+        else:
+            response['image'] = {'format': fmt, 'data': base64.b64encode(data).decode('ascii')}
+        return response
+
+    async def render(self, dot, fmt):
+        """Gera a imagem com o dot (no máximo graphviz_jobs ao mesmo tempo); devolve (dados, erro)."""
+        async with self._graphviz_slots:
+            try:
+                process = await asyncio.create_subprocess_exec(
+                    self.graphviz_command, f"-T{fmt}", stdin=asyncio.subprocess.PIPE,
+                    stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE)
+            except FileNotFoundError:
+                return None, "GraphViz não encontrado"
+            try:
+                data, err = await process.communicate(dot.encode('utf-8'))
+            except asyncio.CancelledError:
+                # Tempo esgotado: o dot não fica rodando sozinho
+                with contextlib.suppress(ProcessLookupError):
+                    process.kill()
+                raise
+        if process.returncode:
+            return None, err.decode('utf-8', 'replace').strip() or f"código {process.returncode}"
+        return data, None
+
+    def stats(self):
+        ordered = sorted(self.latencies)
+        latency = {f"p{p}": (round(percentile(ordered, p) * 1000, 3) if ordered else None)
+                   for p in (50, 90, 95, 99)}
+        latency['max'] = round(ordered[-1] * 1000, 3) if ordered else None
+        return dict(self.counters, inflight=self.inflight, workers=self.workers,
+                    max_queue=self.max_queue, latency_ms=latency)
+
+
+# -------------------------------
+# Transportes
+# -------------------------------
+async def _respond(service, line, write):
+    try:
+        request = json.loads(line)
+    except ValueError as e:
+        response = {'id': None, 'ok': False, 'error': f"JSON inválido: {e}"}
+    else:
+        response = await service.handle(request)
+    await write(json.dumps(response, ensure_ascii=False) + '\n')
+
+
+async def _serve_lines(service, reader, write):
+    """Lê pedidos até o fim da conexão, atendendo cada um em uma tarefa própria."""
+    tasks = set()  # desta conexão
+    while not service.stopping.is_set():
+        line = await reader.readline()
+        if not line:
+            break
+        line = line.decode('utf-8', 'replace').strip()
+        if not line:
+            continue
+        task = asyncio.create_task(_respond(service, line, write))
+        for group in (tasks, service.tasks):
+            group.add(task)
+            task.add_done_callback(group.discard)
+    if tasks:
+        await asyncio.gather(*tasks)
+
+
+async def serve_stdio(service, out):
+    loop = asyncio.get_running_loop()
+    reader = asyncio.StreamReader(limit=MAX_LINE)
+    await loop.connect_read_pipe(lambda: asyncio.StreamReaderProtocol(reader), sys.stdin)
+
+    async def write(text):
+        out.write(text)
+        out.flush()
+
+    reading = asyncio.create_task(_serve_lines(service, reader, write))
+    stopping = asyncio.create_task(service.stopping.wait())
+    await asyncio.wait((reading, stopping), return_when=asyncio.FIRST_COMPLETED)
+    stopping.cancel()
+    await service.drain()
+    if not reading.done():
+        reading.cancel()
+
+
+async def serve_unix(service, path):
+    if not remove_stale_socket(path):
+        print(f"{path} já existe e não é um socket; escolha outro caminho para o --socket.",
+              file=sys.stderr)
+        return 1
+
+    async def client(reader, writer):
+        async def write(text):
+            writer.write(text.encode('utf-8'))
+            await writer.drain()
+
+        try:
+            await _serve_lines(service, reader, write)
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    server = await asyncio.start_unix_server(client, path, limit=MAX_LINE)
+    print(f"Servidor ouvindo em {path}", file=sys.stderr)
+    try:
+        await service.stopping.wait()
+        await service.drain()
+    finally:
+        server.close()
+        with contextlib.suppress(OSError):
+            os.unlink(path)
+    return 0
+
+
+async def _main(socket_path, options, out):
+    service = AsyncAnalysisService(**options)
+    try:
+        await service.start()
+        if socket_path:
+            return await serve_unix(service, socket_path)
+        await serve_stdio(service, out)
+        return 0
+    finally:
+        service.close()
+
+
+def run_async_server(socket_path=None, workers=None, max_queue=DEFAULT_MAX_QUEUE,
+                     timeout=DEFAULT_TIMEOUT, graphviz_jobs=DEFAULT_GRAPHVIZ_JOBS,
+                     lexer_backend='ply', image_dir=None):
+    options = {'workers': workers, 'max_queue': max_queue, 'timeout': timeout,
+               'graphviz_jobs': graphviz_jobs, 'lexer_backend': lexer_backend,
+               'image_dir': image_dir}
+    out = sys.stdout
+    # Só as respostas vão para a saída: qualquer print perdido iria para o stderr
+    with contextlib.redirect_stdout(sys.stderr):
+        try:
+            return asyncio.run(_main(socket_path, options, out))
+        except KeyboardInterrupt:
+            return 0
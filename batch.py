@@ -0,0 +1,254 @@
+# batch.py
+# Modo lote do CLI: processa muitos arquivos em paralelo com um pool de processos.
+#
+# Cada processo do pool constrói um PythonLikeParser e um SemanticAnalyzer uma
+# única vez (no initializer) e os reaproveita para todos os arquivos que receber.
+# As saídas de cada arquivo vão para o diretório de saída, espelhando o caminho
+# relativo da entrada; os diagnósticos de cada arquivo vão para um
+# .diagnostics.json e o restante da saída de texto para um .log.
+#
+# As imagens da AST não são geradas pelos processos do pool: eles só gravam o
+# DOT e devolvem os pedidos, e o processo principal converte todos ao final com
+# poucas chamadas ao GraphViz (vários arquivos por chamada).
+import contextlib
+import glob
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import pipeline_stats
+from ast_to_dot import GraphOutput
+from main import run_tokens_only, run_ast_only, run_full, run_exec
+from parser_ast import PythonLikeParser, prepare_tables
+from semantic_analyzer import SemanticAnalyzer
+from diagnostics import Diagnostics, WARNING
+from result_cache import ResultCache
+
+# Extensões consideradas ao expandir diretórios
+SOURCE_EXTENSIONS = ('.txt', '.py')
+
+# Extensão do arquivo de tokens para cada formato
+_TOKEN_EXTENSIONS = {'text': '.tokens.txt', 'tsv': '.tokens.tsv', 'jsonl': '.tokens.jsonl',
+                     'bin': '.tokens.bin'}
+
+# Estado de cada processo do pool (preenchido pelo initializer)
+_worker = {}
+
+
+# -------------------------------
+# Expansão das entradas
+# -------------------------------
+def _glob_root(pattern):
+    """Parte fixa (sem curingas) de um glob, usada como raiz dos caminhos relativos."""
+    parts = []
+    for part in pattern.replace('\\', '/').split('/'):
+        if glob.has_magic(part):
+            break
+        parts.append(part)
+    return '/'.join(parts) or '.'
+
+
+def collect_inputs(specs, files_from=None):
+    """Expande arquivos, diretórios e globs em pares (caminho, caminho relativo de saída)."""
+    if files_from is not None:
+        with open(files_from, "r") as f:
+            specs = list(specs) + [line.strip() for line in f if line.strip()]
+
+    found = []
+    seen = set()
+
+    def add(path, root):
+        real = os.path.abspath(path)
+        if real in seen:
+            return
+        seen.add(real)
+        found.append((path, os.path.relpath(path, root)))
+
+    for spec in specs:
+        if os.path.isdir(spec):
+            for dirpath, dirnames, filenames in os.walk(spec):
+                dirnames.sort()
+                for name in sorted(filenames):
+                    if name.endswith(SOURCE_EXTENSIONS):
+                        add(os.path.join(dirpath, name), spec)
+        elif glob.has_magic(spec):
+            root = _glob_root(spec)
+            for path in sorted(glob.glob(spec, recursive=True)):
+                if os.path.isfile(path):
+                    add(path, root)
+        else:
+            add(spec, os.path.dirname(spec) or '.')
+    return found
+
+
+def _output_base(out_dir, rel_path, used):
+    """Caminho base (sem extensão) das saídas de um arquivo, sem colidir com outro."""
+    rel_path = rel_path.replace('..', '__')
+    base = os.path.join(out_dir, os.path.splitext(rel_path)[0])
+    candidate = base
+    n = 1
+    while candidate in used:
+        n += 1
+        candidate = f"{base}-{n}"
+    used.add(candidate)
+    return candidate
+
+
+# -------------------------------
+# Processos do pool
+# -------------------------------
+def _init_worker(lexer_backend='ply', use_cache=True, graph_options=('png', None, None, True),
+                 stats_options=(False, False), share_expressions=False, dataflow=False):
+    # Sem eco no terminal e sem as mensagens informativas da tabela de símbolos
+    diagnostics = Diagnostics(level=WARNING)
+    _worker['diagnostics'] = diagnostics
+    _worker['parser'] = PythonLikeParser(lexer_backend, diagnostics, share_expressions)
+    _worker['analyzer'] = SemanticAnalyzer(diagnostics, memoize_types=share_expressions,
+                                           dataflow=dataflow)
+    # O limite de tamanho é aplicado pelo processo principal ao final do lote
+    cache = ResultCache.default() if use_cache else None
+    if cache is not None:
+        cache.max_bytes = float('inf')
+    _worker['cache'] = cache
+    fmt, max_nodes, max_depth, render = graph_options
+    _worker['graph'] = GraphOutput(fmt, max_nodes, max_depth, render, defer=True)
+    _worker['stats'] = stats_options  # (gravar <nome>.stats.json, medir memória)
+
+
+def _run_mode(code, mode, parser, analyzer, out_base, graph, tokens_format, cache=None,
+              optimize=False):
+    if mode == 'tokens':
+        ext = _TOKEN_EXTENSIONS[tokens_format]
+        with open(out_base + ext, 'wb' if tokens_format == 'bin' else 'w') as out:
+            run_tokens_only(code, parser.lexer, tokens_format, out)
+        return 'erro-lexico' if parser.lexer.error else 'ok'
+    if mode == 'ast':
+        if run_ast_only(code, parser=parser, dot_file=out_base + '.dot',
+                        image_file=f"{out_base}.{graph.fmt}", graph=graph, cache=cache,
+                        optimize=optimize):
+            return 'erro-sintatico'
+        return 'ok'
+    if mode == 'exec':
+        # A saída do programa vai para o .log do arquivo
+        if run_exec(code, parser=parser, semantic_analyzer=analyzer, optimize=optimize):
+            if parser.lexer.error or parser.error:
+                return 'erro-sintatico'
+            return 'erro-semantico' if analyzer.error else 'erro-execucao'
+        return 'ok'
+    if run_full(code, parser=parser, semantic_analyzer=analyzer,
+                dot_file=out_base + '.dot', image_file=f"{out_base}.{graph.fmt}",
+                symbol_file=out_base + '.symbols.json', graph=graph, cache=cache,
+                optimize=optimize):
+        return 'erro-sintatico'
+    return 'erro-semantico' if analyzer.error else 'ok'
+
+
+def _process_file(task):
+    """Processa um arquivo e devolve (caminho, status, segundos, imagens a gerar)."""
+    path, out_base, mode, tokens_format, optimize = task
+    graph = _worker['graph']
+    graph.pending = []
+    parser = _worker['parser']
+    analyzer = _worker['analyzer']
+    diagnostics = _worker['diagnostics']
+    diagnostics.clear()
+
+    start = time.perf_counter()
+    os.makedirs(os.path.dirname(out_base) or '.', exist_ok=True)
+    log_file = out_base + '.log'
+    status = 'ok'
+    enabled, trace_memory = _worker['stats']
+    stats = pipeline_stats.PipelineStats(trace_memory) if enabled else None
+    with open(log_file, "w") as log, contextlib.redirect_stdout(log), \
+            (pipeline_stats.collecting(stats) if stats else contextlib.nullcontext()):
+        try:
+            if not os.path.isfile(path):
+                print(f"Arquivo não encontrado: {path}")
+                status = 'nao-encontrado'
+            else:
+                pipeline_stats.set_counter('bytes', os.path.getsize(path))
+                with open(path, "r") as code:
+                    status = _run_mode(code, mode, parser, analyzer, out_base, graph,
+                                       tokens_format, _worker['cache'], optimize)
+        except Exception as e:
+            print(f"Falha ao processar {path}: {e!r}")
+            status = 'falha'
+    diagnostics.save_json(out_base + '.diagnostics.json')
+    if stats is not None:
+        stats.save_json(out_base + '.stats.json')
+    return path, status, time.perf_counter() - start, graph.pending
+
+
+def _render_images(requests, graph_options, jobs, use_cache):
+    """Gera as imagens pedidas pelos processos do pool, em lotes por chamada ao dot."""
+    fmt = graph_options[0]
+    graph = GraphOutput(fmt)
+    done = graph.renderer.render_many([(dot_file, image_file) for dot_file, image_file, _ in requests],
+                                      workers=jobs)
+    # Guarda as imagens novas nas entradas do cache dos respectivos arquivos
+    cache = ResultCache.default() if use_cache else None
+    if cache is not None:
+        cache.max_bytes = float('inf')
+        keys = {image_file: key for _, image_file, key in requests if key is not None}
+        for image_file in done:
+            if image_file in keys:
+                with open(image_file, 'rb') as f:
+                    cache.add_image(keys[image_file], fmt, f.read())
+    print(f"Imagens {fmt.upper()} geradas: {len(done)} de {len(requests)} "
+          f"({graph.renderer.calls} chamada(s) ao GraphViz)")
+
+
+# -------------------------------
+# Execução do lote
+# -------------------------------
+def run_batch(specs, mode, out_dir='saida', jobs=None, files_from=None, render_png=True,
+              lexer_backend='ply', tokens_format='text', use_cache=True, optimize=False,
+              graph_format='png', max_nodes=None, max_depth=None, stats=False, stats_memory=False,
+              share_expressions=False, dataflow=False):
+    inputs = collect_inputs(specs, files_from)
+    if not inputs:
+        print("Nenhum arquivo de entrada encontrado.")
+        return 1
+
+    used = set()
+    tasks = [(path, _output_base(out_dir, rel, used), mode, tokens_format, optimize)
+             for path, rel in inputs]
+    graph_options = (graph_format, max_nodes, max_depth, render_png)
+    stats_options = (stats, stats_memory)
+    jobs = max(1, min(jobs or os.cpu_count() or 1, len(tasks)))
+
+    start = time.perf_counter()
+    if jobs == 1:
+        _init_worker(lexer_backend, use_cache, graph_options, stats_options, share_expressions,
+                     dataflow)
+        results = [_process_file(task) for task in tasks]
+    else:
+        # Com o cache frio, os processos do pool gerariam as mesmas tabelas ao mesmo tempo
+        prepare_tables(lexer_backend)
+        # Lotes maiores diminuem a troca de mensagens entre processos
+        chunksize = max(1, min(64, len(tasks) // (jobs * 8)))
+        with ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker,
+                                 initargs=(lexer_backend, use_cache, graph_options,
+                                           stats_options, share_expressions,
+                                           dataflow)) as executor:
+            results = list(executor.map(_process_file, tasks, chunksize=chunksize))
+    requests = [request for *_, pending in results for request in pending]
+    if requests:
+        _render_images(requests, graph_options, jobs, use_cache)
+    elapsed = time.perf_counter() - start
+    if use_cache and mode in ('ast', 'run'):
+        cache = ResultCache.default()
+        if cache is not None:
+            cache.prune()
+
+    counts = {}
+    for path, status, *_ in results:
+        counts[status] = counts.get(status, 0) + 1
+        if status != 'ok':
+            print(f"  {status}: {path}")
+
+    total = len(results)
+    print(f"Arquivos processados: {total} em {elapsed:.2f}s ({jobs} processo(s), saída em {out_dir})")
+    for status in sorted(counts):
+        print(f"  {status}: {counts[status]}")
+    return 0 if counts.get('ok', 0) == total else 1
@@ -0,0 +1,305 @@
+# benchmark.py
+# Benchmarks de tempo e memória de cada etapa do pipeline (lexer, parser,
+# análise semântica e escrita do DOT) sobre programas gerados por
+# program_generator.py, com resultados salvos em JSON para comparação.
+# As etapas compile (vm.Compiler), exec (vm.execute do Program já compilado,
+# que compile_program guarda em cache por AST) e interp (vm.TreeInterpreter)
+# usam uma variante do mesmo cenário gerada com loop_limit, que termina sem
+# erros de execução.
+#
+#   python benchmark.py run --save base.json          # mede e salva
+#   python benchmark.py compare base.json             # mede de novo e compara
+#   python benchmark.py compare base.json atual.json  # compara dois arquivos
+#   python benchmark.py generate --statements 5000 > programa.txt
+#
+# Cada cenário parte do cenário 'base' e aumenta um eixo do gerador. O tempo é
+# a mediana (e o mínimo) de --repeat execuções; a memória é o pico medido pelo
+# tracemalloc em uma execução à parte (o tracemalloc deixa tudo mais lento).
+import argparse
+import gc
+import io
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+
+from ast_to_dot import write_dot
+from diagnostics import Diagnostics, ERROR
+from mylexer import create_lexer, LEXER_BACKENDS
+from parser_ast import PythonLikeParser
+from program_generator import generate_program
+from semantic_analyzer import SemanticAnalyzer
+from vm import Compiler, compile_program, execute, TreeInterpreter
+
+BENCHMARK_VERSION = 1
+
+_BASE = {'statements': 500, 'depth': 2, 'expr_size': 4, 'identifiers': 20}
+
+# Cenário -> parâmetros do gerador
+SCENARIOS = {
+    'base': _BASE,
+    'size-x8': dict(_BASE, statements=4000),
+    'depth-8': dict(_BASE, depth=8),
+    'expr-32': dict(_BASE, expr_size=32),
+    'ids-2000': dict(_BASE, identifiers=2000),
+}
+
+STAGES = ('lexer', 'parse', 'semantic', 'dot', 'compile', 'exec', 'interp')
+_EXEC_STAGES = ('compile', 'exec', 'interp')
+
+# Voltas de cada while (por entrada no laço) nos programas executados
+DEFAULT_LOOP_LIMIT = 20
+
+# Variação (%) acima da qual compare acusa regressão
+DEFAULT_THRESHOLD = 10.0
+
+
+# ---------------------------
+# Etapas
+# ---------------------------
+def _stage_functions(text, lexer_backend):
+    """Funções sem argumentos que executam cada etapa uma vez sobre o texto."""
+    diagnostics = Diagnostics(level=ERROR)
+    lexer = create_lexer(lexer_backend, diagnostics)
+    parser = PythonLikeParser(lexer_backend, diagnostics)
+    analyzer = SemanticAnalyzer(diagnostics)
+    ast = parser.parse(text)
+    if ast is None or parser.error:
+        raise RuntimeError("Programa gerado não passou no parser")
+
+    def lexer_stage():
+        lexer.reset()
+        lexer.input(text)
+        for _ in iter(lexer.token, None):
+            pass
+
+    def parse_stage():
+        parser.parse(text)
+
+    def semantic_stage():
+        analyzer.reset()
+        analyzer.analyze(ast)
+
+    def dot_stage():
+        with open(os.devnull, 'w') as out:
+            write_dot(ast, out)
+
+    return {'lexer': lexer_stage, 'parse': parse_stage, 'semantic': semantic_stage,
+            'dot': dot_stage}
+
+
+def _exec_functions(text):
+    """compile, exec (VM) e interp (interpretador sobre a AST) de um programa executável."""
+    diagnostics = Diagnostics(level=ERROR)
+    parser = PythonLikeParser(diagnostics=diagnostics)
+    ast = parser.parse(text)
+    analyzer = SemanticAnalyzer(diagnostics)
+    if ast is not None:
+        analyzer.analyze(ast)
+    if ast is None or parser.error or diagnostics.has_errors():
+        raise RuntimeError("Programa gerado não passou na análise")
+    symbol_table = analyzer.symbol_table
+
+    def compile_stage():
+        Compiler(symbol_table).compile(ast)
+
+    def exec_stage(out):
+        # Só a primeira chamada compila; as medidas usam o Program do cache
+        execute(compile_program(ast, symbol_table), out)
+
+    def interp_stage(out):
+        TreeInterpreter(out).run(ast)
+
+    # As duas execuções precisam imprimir exatamente a mesma coisa
+    outputs = []
+    for stage in (exec_stage, interp_stage):
+        out = io.StringIO()
+        stage(out)
+        outputs.append(out.getvalue())
+    if outputs[0] != outputs[1]:
+        raise RuntimeError("VM e TreeInterpreter divergem no programa gerado")
+
+    def to_devnull(stage):
+        def run():
+            with open(os.devnull, 'w') as out:
+                stage(out)
+        return run
+
+    return {'compile': compile_stage, 'exec': to_devnull(exec_stage),
+            'interp': to_devnull(interp_stage)}
+
+
+def measure(fn, repeat):
+    """Tempos (s) de repeat execuções e pico de memória (KiB) de mais uma."""
+    times = []
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    gc.collect()
+    tracemalloc.start()
+    try:
+        fn()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return {'median': statistics.median(times), 'min': min(times), 'peak_kb': peak / 1024}
+
+
+def run_benchmarks(scenarios=None, stages=None, repeat=5, seed=0, scale=1.0, lexer_backend='ply',
+                   out=None, loop_limit=DEFAULT_LOOP_LIMIT):
+    """Executa os benchmarks e devolve o dicionário salvo por 'run --save'."""
+    out = out or sys.stdout
+    scenarios = scenarios or list(SCENARIOS)
+    stages = stages or list(STAGES)
+    results = {}
+    params = {}
+    for name in scenarios:
+        scenario = dict(SCENARIOS[name])
+        scenario['statements'] = max(1, int(scenario['statements'] * scale))
+        params[name] = scenario
+        text = generate_program(seed=seed, **scenario)
+        sizes = dict.fromkeys(STAGES, len(text))
+        functions = {}
+        if any(stage not in _EXEC_STAGES for stage in stages):
+            functions.update(_stage_functions(text, lexer_backend))
+        if any(stage in _EXEC_STAGES for stage in stages):
+            exec_text = generate_program(seed=seed, loop_limit=loop_limit, **scenario)
+            functions.update(_exec_functions(exec_text))
+            sizes.update(dict.fromkeys(_EXEC_STAGES, len(exec_text)))
+        for stage in stages:
+            result = measure(functions[stage], repeat)
+            result['bytes'] = sizes[stage]
+            results[f"{stage}/{name}"] = result
+            print(f"{stage + '/' + name:<20} {result['median'] * 1000:10.2f} ms "
+                  f"(min {result['min'] * 1000:.2f}) {result['peak_kb']:10.0f} KiB", file=out)
+    return {
+        'version': BENCHMARK_VERSION,
+        'meta': {'python': platform.python_version(), 'platform': platform.platform(),
+                 'lexer': lexer_backend, 'repeat': repeat, 'seed': seed, 'loop_limit': loop_limit,
+                 'date': time.strftime('%Y-%m-%d %H:%M:%S')},
+        'scenarios': params,
+        'results': results,
+    }
+
+
+# ---------------------------
+# Comparação
+# ---------------------------
+def compare_results(baseline, current, threshold=DEFAULT_THRESHOLD, out=None):
+    """Imprime a variação de tempo e memória; devolve as chaves com regressão."""
+    out = out or sys.stdout
+    for name, params in current.get('scenarios', {}).items():
+        if baseline.get('scenarios', {}).get(name, params) != params:
+            print(f"Aviso: o cenário '{name}' usa parâmetros diferentes na linha de base", file=out)
+
+    limit = 1 + threshold / 100
+    regressions = []
+    print(f"{'etapa/cenário':<20} {'base (ms)':>10} {'atual (ms)':>10} {'tempo':>8} {'memória':>8}",
+          file=out)
+    for key, now in current['results'].items():
+        before = baseline['results'].get(key)
+        if before is None:
+            print(f"{key:<20} {'-':>10} {now['median'] * 1000:10.2f}   (novo)", file=out)
+            continue
+        time_ratio = now['median'] / before['median'] if before['median'] else 1.0
+        mem_ratio = now['peak_kb'] / before['peak_kb'] if before['peak_kb'] else 1.0
+        flag = ''
+        if time_ratio > limit or mem_ratio > limit:
+            regressions.append(key)
+            flag = '  <- regressão'
+        print(f"{key:<20} {before['median'] * 1000:10.2f} {now['median'] * 1000:10.2f} "
+              f"{(time_ratio - 1) * 100:+7.1f}% {(mem_ratio - 1) * 100:+7.1f}%{flag}", file=out)
+    return regressions
+
+
+def _load(path):
+    with open(path, "r") as f:
+        data = json.load(f)
+    if data.get('version') != BENCHMARK_VERSION:
+        raise SystemExit(f"{path}: versão de benchmark incompatível")
+    return data
+
+
+def _save(data, path):
+    with open(path, "w") as f:
+        json.dump(data, f, indent=2)
+    print(f"Resultados salvos em {path}")
+
+
+# ---------------------------
+# CLI
+# ---------------------------
+def build_arg_parser():
+    parser = argparse.ArgumentParser(description='Benchmarks do lexer/parser/semântica/DOT/execução')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    def add_run_options(p):
+        p.add_argument('--repeat', type=int, default=5, help='Execuções medidas por etapa (padrão: 5)')
+        p.add_argument('--scenario', action='append', choices=sorted(SCENARIOS),
+                       help='Cenário a medir (pode repetir; padrão: todos)')
+        p.add_argument('--stage', action='append', choices=STAGES,
+                       help='Etapa a medir (pode repetir; padrão: todas)')
+        p.add_argument('--scale', type=float, default=1.0,
+                       help='Multiplica o número de statements de todos os cenários')
+        p.add_argument('--seed', type=int, default=0, help='Semente do gerador (padrão: 0)')
+        p.add_argument('--lexer', choices=sorted(LEXER_BACKENDS), default='ply',
+                       help='Backend do lexer (padrão: ply)')
+        p.add_argument('--loop-limit', type=int, default=DEFAULT_LOOP_LIMIT,
+                       help='Voltas de cada while nas etapas compile/exec/interp '
+                            f'(padrão: {DEFAULT_LOOP_LIMIT})')
+
+    run = sub.add_parser('run', help='Executa os benchmarks')
+    add_run_options(run)
+    run.add_argument('--save', metavar='ARQUIVO', help='Grava os resultados em JSON')
+
+    compare = sub.add_parser('compare', help='Compara com uma linha de base salva')
+    compare.add_argument('baseline', help='Resultados salvos com run --save')
+    compare.add_argument('current', nargs='?',
+                         help='Resultados a comparar (padrão: mede agora com as opções abaixo)')
+    compare.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                         help=f'Variação (%%) tolerada antes de acusar regressão (padrão: {DEFAULT_THRESHOLD:g})')
+    add_run_options(compare)
+    compare.add_argument('--save', metavar='ARQUIVO', help='Grava os resultados medidos em JSON')
+
+    generate = sub.add_parser('generate', help='Imprime um programa gerado')
+    for name, default in _BASE.items():
+        generate.add_argument('--' + name.replace('_', '-'), type=int, default=default)
+    generate.add_argument('--seed', type=int, default=0)
+    generate.add_argument('--loop-limit', type=int,
+                          help='Gera um programa executável, com cada while limitado a N voltas')
+    return parser
+
+
+def main(argv=None):
+    args = build_arg_parser().parse_args(argv)
+    if args.command == 'generate':
+        sys.stdout.write(generate_program(args.statements, args.depth, args.expr_size,
+                                          args.identifiers, args.seed, args.loop_limit))
+        return 0
+
+    if args.command == 'compare' and args.current:
+        current = _load(args.current)
+    else:
+        current = run_benchmarks(args.scenario, args.stage, args.repeat, args.seed, args.scale,
+                                 args.lexer, loop_limit=args.loop_limit)
+        if args.save:
+            _save(current, args.save)
+    if args.command == 'run':
+        return 0
+
+    baseline = _load(args.baseline)
+    regressions = compare_results(baseline, current, args.threshold)
+    if regressions:
+        print(f"{len(regressions)} regressão(ões) acima de {args.threshold:g}%")
+        return 1
+    print("Nenhuma regressão.")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
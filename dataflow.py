@@ -0,0 +1,349 @@
+# dataflow.py
+# Grafo de fluxo de controle (CFG) e análises de fluxo de dados sobre a AST,
+# rodadas pelo SemanticAnalyzer com dataflow=True (opção --dataflow).
+#
+# - O CFG tem blocos básicos com os eventos de cada statement, em ordem:
+#   leitura de variável ('use') e atribuição ('def', com o tipo da expressão).
+#   if/if_else/while viram desvios; a condição fica no bloco que decide.
+# - Conjuntos de variáveis são bitsets (int do Python, bit i = variável i);
+#   os tipos que chegam a um ponto usam TYPE_COUNT bits por variável.
+# - As análises são iterativas com worklist em ordem de prioridade (pós-ordem
+#   reversa para frente, o inverso dela para trás), então laços aninhados
+#   convergem em poucas voltas:
+#     * atribuição definitiva (para frente, interseção);
+#     * tipos que alcançam cada ponto (para frente, união);
+#     * variáveis vivas (para trás, união), para achar atribuições nunca lidas.
+# Os avisos vão para o coletor de diagnósticos com o estágio 'dataflow'.
+import heapq
+
+from parser_ast import child_lexpos
+from visitor import NodeVisitor, dispatch_table
+
+# Ordem dos bits de tipo de cada variável ('unknown' marca atribuição com erro)
+TYPES = ('number', 'string', 'boolean', 'unknown')
+TYPE_COUNT = len(TYPES)
+_TYPE_INDEX = {name: i for i, name in enumerate(TYPES)}
+_TYPE_INDEX.update(int=0, float=0)
+_VAR_TYPE_MASK = (1 << TYPE_COUNT) - 1
+_KNOWN_TYPES_MASK = _VAR_TYPE_MASK & ~(1 << _TYPE_INDEX['unknown'])
+
+# Eventos de um bloco são inteiros (não geram trabalho para o coletor de lixo):
+# variável << 3 | índice do tipo << 1 | USE/DEF
+USE = 0
+DEF = 1
+
+
+class BasicBlock:
+    __slots__ = ('index', 'events', 'positions', 'succs', 'preds')
+
+    def __init__(self, index):
+        self.index = index
+        self.events = []  # eventos codificados, em ordem
+        self.positions = []  # (linha, posição) de cada evento, para os avisos
+        self.succs = []
+        self.preds = []
+
+
+# ---------------------------
+# Construção do CFG
+# ---------------------------
+class ControlFlowGraph:
+    """CFG de um programa; variables[i] é o nome da variável do bit i."""
+
+    def __init__(self, root, assign_types=None):
+        self.blocks = []
+        self.variables = []
+        self._var_index = {}
+        # Tipo de cada atribuição (id do nó assign -> tipo), vindo da análise semântica
+        self._assign_types = assign_types or {}
+        self.entry = self.current = self._new_block()
+        NodeVisitor(dispatch_table(self, '_cfg_'), self._cfg_other).visit(root)
+        self.exit = self.current
+
+    def _new_block(self, *preds):
+        block = BasicBlock(len(self.blocks))
+        self.blocks.append(block)
+        for pred in preds:
+            self._link(pred, block)
+        return block
+
+    @staticmethod
+    def _link(pred, succ):
+        pred.succs.append(succ)
+        succ.preds.append(pred)
+
+    def variable(self, name):
+        index = self._var_index.get(name)
+        if index is None:
+            index = self._var_index[name] = len(self.variables)
+            self.variables.append(name)
+        return index
+
+    def _uses(self, expr, statement):
+        """Leituras de variáveis da expressão, da esquerda para a direita (sem recursão)."""
+        block = self.current
+        line = statement.lineno
+        # (nó, posição da ocorrência): nós compartilhados não guardam a posição
+        stack = [(expr, child_lexpos(expr, statement.lexpos))]
+        while stack:
+            node, lexpos = stack.pop()
+            if node.type == 'var':
+                block.events.append(self.variable(node.value) << 3 | USE)
+                block.positions.append((line, lexpos))
+            elif node.children:
+                stack.extend((child, child_lexpos(child, lexpos)) for child in reversed(node.children))
+
+    # Handlers _cfg_<tipo>; os de bloco fazem "yield filho" (ver visitor.NodeVisitor)
+    def _cfg_program(self, node):
+        for child in node.children:
+            yield child
+
+    _cfg_block = _cfg_program
+    _cfg_error = _cfg_program
+
+    def _cfg_assign(self, node):
+        target, expr = node.children
+        self._uses(expr, node)
+        type_index = _TYPE_INDEX.get(self._assign_types.get(node.id), _TYPE_INDEX['unknown'])
+        self.current.events.append(self.variable(target.value) << 3 | type_index << 1 | DEF)
+        self.current.positions.append((node.lineno, node.lexpos))
+
+    def _cfg_print(self, node):
+        if node.children:
+            self._uses(node.children[0], node)
+
+    def _cfg_if(self, node):
+        self._uses(node.children[0], node)
+        branch = self.current
+        exits = []
+        for block in node.children[1:]:
+            self.current = self._new_block(branch)
+            yield block
+            exits.append(self.current)
+        if node.type == 'if' or len(node.children) < 3:
+            exits.append(branch)  # condição falsa: segue direto
+        self.current = self._new_block(*exits)
+
+    _cfg_if_else = _cfg_if
+
+    def _cfg_while(self, node):
+        header = self._new_block(self.current)
+        self.current = header
+        self._uses(node.children[0], node)
+        if len(node.children) > 1:
+            self.current = self._new_block(header)
+            yield node.children[1]
+            self._link(self.current, header)
+        self.current = self._new_block(header)
+
+    def _cfg_other(self, node):
+        # Expressão solta no lugar de um statement: só as leituras contam
+        self._uses(node, node)
+
+    def reverse_postorder(self):
+        """Blocos alcançáveis a partir da entrada, em pós-ordem reversa (sem recursão).
+
+        Os sucessores são percorridos do último para o primeiro: a saída de um
+        while é terminada antes do corpo, então o corpo vem antes dela na ordem
+        e o que muda dentro do laço não precisa atravessar o resto do programa.
+        """
+        order = []
+        seen = {self.entry.index}
+        stack = [(self.entry, reversed(self.entry.succs))]
+        while stack:
+            block, succs = stack[-1]
+            for succ in succs:
+                if succ.index not in seen:
+                    seen.add(succ.index)
+                    stack.append((succ, reversed(succ.succs)))
+                    break
+            else:
+                stack.pop()
+                order.append(block)
+        order.reverse()
+        return order
+
+
+# ---------------------------
+# Análises
+# ---------------------------
+def _solve(order, size, transfer, merge, dependents, initial):
+    """Worklist genérica: recalcula um bloco quando a entrada dele muda.
+
+    order: blocos na ordem de visita; transfer(índice, entrada) dá a saída de
+    um bloco; merge(bloco, saídas) junta as saídas dos vizinhos de onde o
+    valor vem; dependents(bloco) são os blocos a recalcular quando a saída
+    dele muda; initial é o valor de todo bloco antes da primeira visita
+    (neutro para o merge). Devolve a lista das saídas, por índice do bloco.
+
+    A worklist é um heap pela posição em order: um bloco só é recalculado
+    depois dos que vêm antes dele, então cada volta de um laço propaga tudo de
+    uma vez (com FIFO, laços aninhados levariam uma volta por bloco).
+    """
+    out = [initial] * size
+    position = [0] * size
+    for i, block in enumerate(order):
+        position[block.index] = i
+    queued = [False] * size
+    for block in order:
+        queued[block.index] = True
+    worklist = list(range(len(order)))  # já é um heap
+    while worklist:
+        block = order[heapq.heappop(worklist)]
+        index = block.index
+        queued[index] = False
+        value = transfer(index, merge(block, out))
+        if value != out[index]:
+            out[index] = value
+            for dependent in dependents(block):
+                if not queued[dependent.index]:
+                    queued[dependent.index] = True
+                    heapq.heappush(worklist, position[dependent.index])
+    return out
+
+
+def _preds(block):
+    return block.preds
+
+
+def _succs(block):
+    return block.succs
+
+
+class DataflowAnalysis:
+    """Roda as três análises sobre um CFG e reporta os avisos encontrados."""
+
+    def __init__(self, cfg, diagnostics):
+        self.cfg = cfg
+        self.diagnostics = diagnostics
+        self.warnings = 0
+        self.order = cfg.reverse_postorder()
+        self._everything = (1 << len(cfg.variables)) - 1  # todas as variáveis
+        # Resumo de cada bloco, por índice: atribuídas, lidas antes de atribuir,
+        # tipos gerados e máscara dos tipos apagados
+        size = len(cfg.blocks)
+        self._assigned = [0] * size
+        self._upward_uses = [0] * size
+        self._type_gen = [0] * size
+        self._type_kill = [0] * size
+        for block in self.order:
+            self._summarize(block)
+
+    def _summarize(self, block):
+        assigned = upward_uses = type_gen = type_kill = 0
+        for event in block.events:
+            var = event >> 3
+            bit = 1 << var
+            if not event & DEF:
+                if not assigned & bit:
+                    upward_uses |= bit
+                continue
+            assigned |= bit
+            shift = var * TYPE_COUNT
+            mask = _VAR_TYPE_MASK << shift
+            type_kill |= mask
+            type_gen = (type_gen & ~mask) | (1 << (shift + (event >> 1 & 3)))
+        index = block.index
+        self._assigned[index] = assigned
+        self._upward_uses[index] = upward_uses
+        self._type_gen[index] = type_gen
+        self._type_kill[index] = type_kill
+
+    # Para frente: definitivamente atribuídas (interseção) e tipos que chegam (união)
+    def _definite_in(self, block, out):
+        if block is self.cfg.entry:
+            return 0
+        definite = self._everything
+        for pred in block.preds:
+            definite &= out[pred.index]
+        return definite
+
+    @staticmethod
+    def _types_in(block, out):
+        types = 0
+        for pred in block.preds:
+            types |= out[pred.index]
+        return types
+
+    def definite_assignment(self):
+        assigned = self._assigned
+        return _solve(self.order, len(self.cfg.blocks),
+                      lambda index, definite: definite | assigned[index],
+                      self._definite_in, _succs, self._everything)
+
+    def reaching_types(self):
+        type_gen, type_kill = self._type_gen, self._type_kill
+        return _solve(self.order, len(self.cfg.blocks),
+                      lambda index, types: (types & ~type_kill[index]) | type_gen[index],
+                      self._types_in, _succs, 0)
+
+    # Para trás: variáveis vivas na saída de cada bloco
+    @staticmethod
+    def _live_out(block, live_in):
+        live = 0
+        for succ in block.succs:
+            live |= live_in[succ.index]
+        return live
+
+    def liveness(self):
+        assigned, upward_uses = self._assigned, self._upward_uses
+        live_in = _solve(self.order[::-1], len(self.cfg.blocks),
+                         lambda index, live: upward_uses[index] | (live & ~assigned[index]),
+                         self._live_out, _preds, 0)
+        return [self._live_out(block, live_in) for block in self.cfg.blocks]
+
+    def run(self):
+        """Analisa e reporta; devolve quantos avisos foram gerados."""
+        definite = self.definite_assignment()
+        types = self.reaching_types()
+        live_out = self.liveness()
+        for block in self.order:
+            self._check_uses(block, self._definite_in(block, definite), self._types_in(block, types))
+            self._check_assignments(block, live_out[block.index])
+        return self.warnings
+
+    def _check_uses(self, block, definite, types):
+        variables = self.cfg.variables
+        for event, position in zip(block.events, block.positions):
+            var = event >> 3
+            shift = var * TYPE_COUNT
+            if event & DEF:
+                definite |= 1 << var
+                types = (types & ~(_VAR_TYPE_MASK << shift)) | (1 << (shift + (event >> 1 & 3)))
+                continue
+            reaching = (types >> shift) & _VAR_TYPE_MASK
+            if not definite >> var & 1 and reaching:
+                # Sem atribuição em nenhum caminho o analisador já reportou 'nao declarada'
+                self._warn('maybe-unassigned',
+                           "Aviso: a variavel '{name}' pode ser usada antes de receber um valor",
+                           {'name': variables[var]}, position)
+            known = reaching & _KNOWN_TYPES_MASK
+            if known & (known - 1):
+                names = [TYPES[i] for i in range(TYPE_COUNT) if known >> i & 1]
+                self._warn('type-differs-by-path',
+                           "Aviso: a variavel '{name}' pode ter tipos diferentes aqui ({types})",
+                           {'name': variables[var], 'types': ', '.join(names)}, position)
+
+    def _check_assignments(self, block, live):
+        variables = self.cfg.variables
+        for event, position in zip(reversed(block.events), reversed(block.positions)):
+            bit = 1 << (event >> 3)
+            if not event & DEF:
+                live |= bit
+                continue
+            if not live & bit:
+                self._warn('unused-assignment',
+                           "Aviso: o valor atribuido a '{name}' nunca e usado",
+                           {'name': variables[event >> 3]}, position)
+            live &= ~bit
+
+    def _warn(self, code, template, args, position):
+        self.warnings += 1
+        line, offset = position
+        self.diagnostics.warning('dataflow', code, template, args, line=line, offset=offset)
+
+
+def analyze_dataflow(root, diagnostics, assign_types=None):
+    """Monta o CFG da AST e roda as análises; devolve (cfg, quantidade de avisos)."""
+    cfg = ControlFlowGraph(root, assign_types)
+    return cfg, DataflowAnalysis(cfg, diagnostics).run()
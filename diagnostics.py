@@ -0,0 +1,141 @@
+# diagnostics.py
+# Coleta estruturada de mensagens (erros, avisos, informações) do lexer,
+# parser e analisador semântico.
+#
+# Cada registro guarda estágio, código, linha, posição e os argumentos da
+# mensagem; o texto só é formatado quando alguém pede (render/to_dict), então
+# em modo silencioso nenhuma string de mensagem é montada.
+import json
+import sys
+
+ERROR = 'error'
+WARNING = 'warning'
+INFO = 'info'
+
+_SEVERITY_RANK = {ERROR: 0, WARNING: 1, INFO: 2}
+
+# Cores do terminal por estágio (as mesmas usadas antes pelos prints diretos)
+_STAGE_COLORS = {
+    'lexer': '\033[91m',
+    'parser': '\033[38;2;8;126;108m',
+    'semantic': '\033[38;2;220;20;60m',
+    'dataflow': '\033[38;2;255;140;0m',
+    'runtime': '\033[93m',
+}
+_RESET = '\033[0m'
+
+
+class Diagnostic:
+    __slots__ = ('severity', 'stage', 'code', 'line', 'offset', 'template', 'args', 'fields')
+
+    def __init__(self, severity, stage, code, template, args, line=None, offset=None, fields=()):
+        self.severity = severity
+        self.stage = stage
+        self.code = code
+        self.line = line
+        self.offset = offset
+        self.template = template  # texto com campos {nome} preenchidos por args
+        self.args = args
+        self.fields = fields      # linhas extras no terminal: (rótulo, chave, usar repr)
+
+    @property
+    def message(self):
+        return self.template.format(**self.args)
+
+    def to_dict(self):
+        return {
+            'severity': self.severity,
+            'stage': self.stage,
+            'code': self.code,
+            'message': self.message,
+            'line': self.line,
+            'offset': self.offset,
+            'data': self.args,
+        }
+
+    def render_terminal(self):
+        """Texto colorido no mesmo formato que os estágios imprimiam antes."""
+        lines = [self.message]
+        for label, key, use_repr in self.fields:
+            # 'line'/'offset' vêm do próprio registro, o resto dos argumentos
+            value = getattr(self, key) if key in ('line', 'offset') else self.args[key]
+            lines.append(f"  {label}: {value!r}" if use_repr else f"  {label}: {value}")
+        color = _STAGE_COLORS.get(self.stage) if self.severity != INFO else None
+        if color:
+            return '\n'.join(f"{color}{line}{_RESET}" for line in lines)
+        return '\n'.join(lines)
+
+    def __repr__(self):
+        return f"Diagnostic({self.severity}, {self.stage}, {self.code}, line={self.line})"
+
+
+class Diagnostics:
+    """Coletor de diagnósticos compartilhado pelos estágios do pipeline.
+
+    level: severidade mínima registrada ('error', 'warning' ou 'info'); registros
+           abaixo dela são descartados sem montar nada.
+    echo:  se True, cada registro é impresso no terminal assim que chega
+           (comportamento antigo dos prints diretos).
+    """
+
+    def __init__(self, level=INFO, echo=False, out=None):
+        self.level = level
+        self.echo = echo
+        self.out = out
+        self.records = []
+        self._max_rank = _SEVERITY_RANK[level]
+
+    def clear(self):
+        self.records = []
+
+    def wants(self, severity):
+        return _SEVERITY_RANK[severity] <= self._max_rank
+
+    def add(self, severity, stage, code, template, args, line=None, offset=None, fields=()):
+        if _SEVERITY_RANK[severity] > self._max_rank:
+            return
+        record = Diagnostic(severity, stage, code, template, args, line, offset, fields)
+        self.records.append(record)
+        if self.echo:
+            print(record.render_terminal(), file=self.out or sys.stdout)
+
+    def error(self, stage, code, template, args, **kwargs):
+        self.add(ERROR, stage, code, template, args, **kwargs)
+
+    def warning(self, stage, code, template, args, **kwargs):
+        self.add(WARNING, stage, code, template, args, **kwargs)
+
+    def info(self, stage, code, template, args, **kwargs):
+        self.add(INFO, stage, code, template, args, **kwargs)
+
+    # ---------------------------
+    # Consultas
+    # ---------------------------
+    def errors(self, stage=None):
+        return [r for r in self.records
+                if r.severity == ERROR and (stage is None or r.stage == stage)]
+
+    def has_errors(self, stage=None):
+        return any(r.severity == ERROR and (stage is None or r.stage == stage)
+                   for r in self.records)
+
+    def counts(self):
+        result = {}
+        for r in self.records:
+            result[r.severity] = result.get(r.severity, 0) + 1
+        return result
+
+    # ---------------------------
+    # Renderização
+    # ---------------------------
+    def render_terminal(self, out=None):
+        out = out or sys.stdout
+        for record in self.records:
+            print(record.render_terminal(), file=out)
+
+    def to_json(self, indent=None):
+        return json.dumps([r.to_dict() for r in self.records], indent=indent, ensure_ascii=False)
+
+    def save_json(self, filename):
+        with open(filename, "w") as f:
+            json.dump([r.to_dict() for r in self.records], f, indent=4, ensure_ascii=False)
@@ -0,0 +1,313 @@
+# incremental.py
+# Reanálise incremental para integração com editores.
+#
+# O texto é dividido em segmentos de nível superior: cada um começa em uma
+# linha na coluna 0 (que não seja vazia, comentário ou 'else') e vai até o
+# início do próximo. Como nenhum statement atravessa essa fronteira, cada
+# segmento pode ser lexado e analisado sozinho. Depois de uma edição só os
+# segmentos cujo texto mudou são reanalisados; os demais mantêm as subárvores
+# da AST (com as posições deslocadas) e os diagnósticos.
+#
+# A análise semântica depende da tabela de símbolos que vem dos segmentos
+# anteriores. A cada CHECKPOINT_INTERVAL segmentos guardamos uma cópia da
+# tabela; uma edição reanalisa a partir do checkpoint anterior a ela e para
+# assim que a tabela volta a ser igual à da execução anterior (daí em diante
+# o resultado antigo continua válido). O pool de literais não entra nessa
+# comparação (não influencia os tipos), e o de um checkpoint pode estar
+# desatualizado: cada segmento guarda quantas ocorrências de cada literal
+# registrou, e o pool da tabela final é o anterior corrigido pela diferença
+# dos segmentos reanalisados ou removidos.
+#
+# A ordem da tabela (a do symbol_table.json) também não sai certa desse
+# remendo: cada segmento guarda a ordem em que registrou símbolos novos e
+# literais, e a tabela final é reordenada juntando essas listas na ordem dos
+# segmentos (só quando é lida, ver symbol_table).
+import re
+from bisect import bisect_right
+
+from diagnostics import Diagnostics, ERROR, WARNING
+from parser_ast import ASTNode, PythonLikeParser
+from semantic_analyzer import SemanticAnalyzer
+from symbol_table import SymbolTable
+
+# Início de um segmento: linha na coluna 0 que não é vazia, comentário ou 'else'
+_SEGMENT_START = re.compile(r'^(?![ \t\r\n#]|else\b)', re.M)
+
+# Segmentos entre duas cópias guardadas da tabela de símbolos
+CHECKPOINT_INTERVAL = 32
+
+
+class _Segment:
+    __slots__ = ('text', 'start', 'lineno', 'statements', 'parse_error', 'parse_records',
+                 'semantic_records', 'checkpoint', 'node_base', 'literal_counts', 'order')
+
+    def __init__(self, text, start, lineno):
+        self.text = text
+        self.start = start        # posição no texto completo
+        self.lineno = lineno      # linha da primeira linha do segmento
+        self.statements = []
+        self.parse_error = False
+        self.parse_records = []
+        self.semantic_records = []
+        self.checkpoint = None    # tabela de símbolos antes deste segmento
+        self.node_base = (start, lineno)  # posição em que os nós foram gerados
+        self.literal_counts = None  # (tipo, valor) -> ocorrências na última análise
+        self.order = ()           # símbolos novos e literais na última análise (SymbolTable.reorder)
+
+    @property
+    def end(self):
+        return self.start + len(self.text)
+
+    def move(self, start, lineno):
+        """Desloca o segmento; os diagnósticos acompanham na hora, os nós só em sync_nodes()."""
+        delta_pos = start - self.start
+        delta_line = lineno - self.lineno
+        if not delta_pos and not delta_line:
+            return
+        self.start = start
+        self.lineno = lineno
+        for record in self.parse_records + self.semantic_records:
+            if record.offset is not None:
+                record.offset += delta_pos
+            if record.line is not None:
+                record.line += delta_line
+
+    def sync_nodes(self):
+        delta_pos = self.start - self.node_base[0]
+        delta_line = self.lineno - self.node_base[1]
+        if not delta_pos and not delta_line:
+            return
+        stack = list(self.statements)
+        while stack:
+            node = stack.pop()
+            if node.lexpos is not None:
+                node.lexpos += delta_pos
+            if node.lineno is not None:
+                node.lineno += delta_line
+            stack.extend(node.children)
+        self.node_base = (self.start, self.lineno)
+
+
+class IncrementalParser:
+    """Mantém a análise de um texto e a atualiza a cada edição.
+
+    Uso típico:
+        inc = IncrementalParser()
+        inc.parse(texto)
+        inc.edit(offset, tamanho_removido, texto_inserido)
+        inc.ast, inc.symbol_table, inc.diagnostics
+    """
+
+    def __init__(self, lexer_backend='ply', analyze=True, level=WARNING):
+        self._parse_diagnostics = Diagnostics(level=level)
+        self._semantic_diagnostics = Diagnostics(level=level)
+        self.parser = PythonLikeParser(lexer_backend, diagnostics=self._parse_diagnostics)
+        self.analyzer = SemanticAnalyzer(diagnostics=self._semantic_diagnostics) if analyze else None
+        self.text = ''
+        self.segments = []
+        self._starts = []
+        self._final_table = SymbolTable()
+        self._literal_delta = []  # (contagens, sinal) a aplicar no pool de _final_table
+        self._program = None
+        self._reorder = False     # a ordem de _final_table precisa ser refeita
+        self.stats = {}  # números da última atualização (segmentos reanalisados etc.)
+
+    # ---------------------------
+    # Entrada
+    # ---------------------------
+    def parse(self, text):
+        """Analisa o texto inteiro (descarta o estado anterior)."""
+        self.text = text
+        self.segments = self._split(text, 0, len(text), 1)
+        self._final_table = SymbolTable()
+        self._literal_delta = []
+        for seg in self.segments:
+            self._parse_segment(seg)
+        self._finish(0, len(self.segments), len(self.segments))
+        return self
+
+    def edit(self, offset, removed, inserted):
+        """Aplica a edição text[offset:offset+removed] = inserted e reanalisa o necessário."""
+        old_text = self.text
+        if not self.segments:
+            return self.parse(old_text[:offset] + inserted + old_text[offset + removed:])
+        if offset < 0 or removed < 0 or offset + removed > len(old_text):
+            raise ValueError(f"Edição fora do texto: offset={offset}, removido={removed}")
+
+        text = old_text[:offset] + inserted + old_text[offset + removed:]
+        delta = len(inserted) - removed
+        delta_lines = inserted.count('\n') - old_text.count('\n', offset, offset + removed)
+
+        # Segmentos afetados: do anterior ao que contém o início (a edição pode
+        # juntar linhas ou transformar a primeira linha em continuação) até o
+        # que contém o fim da edição
+        segments = self.segments
+        first = max(self._segment_at(offset) - 1, 0)
+        last = self._segment_at(offset + removed)
+        region_start = segments[first].start
+        region_end = segments[last].end + delta
+
+        # Reaproveita segmentos da região cujo texto não mudou
+        reusable = {}
+        for seg in segments[first:last + 1]:
+            reusable.setdefault(seg.text, []).append(seg)
+
+        new_region = self._split(text, region_start, region_end, segments[first].lineno)
+        dirty = 0
+        for i, seg in enumerate(new_region):
+            candidates = reusable.get(seg.text)
+            if candidates:
+                old = candidates.pop(0)
+                old.move(seg.start, seg.lineno)
+                new_region[i] = old
+            else:
+                self._parse_segment(seg)
+                dirty += 1
+
+        # Literais dos segmentos que saíram do texto deixam de contar
+        for leftover in reusable.values():
+            for seg in leftover:
+                if seg.literal_counts:
+                    self._literal_delta.append((seg.literal_counts, -1))
+
+        for seg in segments[last + 1:]:
+            seg.move(seg.start + delta, seg.lineno + delta_lines)
+
+        self.text = text
+        self.segments = segments[:first] + new_region + segments[last + 1:]
+        # A ordem dos segmentos da região pode ter mudado (ou algum ter sido
+        # removido), então a semântica recomeça no início da região
+        self._finish(first, first + len(new_region), dirty)
+        return self
+
+    # ---------------------------
+    # Segmentos
+    # ---------------------------
+    def _split(self, text, start, end, lineno):
+        """Divide text[start:end] (start no início de um segmento) em segmentos."""
+        cuts = [m.start() for m in _SEGMENT_START.finditer(text, start, end)]
+        if not cuts or cuts[0] != start:
+            cuts.insert(0, start)
+        if cuts[-1] == end and len(cuts) > 1:
+            cuts.pop()  # '^' casa também logo após o último '\n'
+        cuts.append(end)
+
+        segments = []
+        for seg_start, seg_end in zip(cuts, cuts[1:]):
+            seg_text = text[seg_start:seg_end]
+            segments.append(_Segment(seg_text, seg_start, lineno))
+            lineno += seg_text.count('\n')
+        return segments
+
+    def _segment_at(self, pos):
+        index = bisect_right(self._starts, pos) - 1
+        return min(max(index, 0), len(self.segments) - 1)
+
+    def _parse_segment(self, seg):
+        parser = self.parser
+        self._parse_diagnostics.clear()
+        tokens = parser.lexer.tokenize_segment(seg.text, seg.start, seg.lineno)
+        program = parser.parse_tokens(tokens)
+        seg.statements = list(program.children) if program is not None else []
+        seg.parse_error = program is None or parser.error or parser.lexer.error
+        seg.parse_records = self._parse_diagnostics.records
+        seg.semantic_records = []
+        seg.checkpoint = None
+        seg.node_base = (seg.start, seg.lineno)
+
+    # ---------------------------
+    # Semântica
+    # ---------------------------
+    def _finish(self, first_dirty, end_dirty, reparsed):
+        self._starts = [seg.start for seg in self.segments]
+        self._program = None
+        self.stats = {'segments': len(self.segments), 'reparsed': reparsed, 'reanalyzed': 0}
+        if self.analyzer is not None:
+            self.stats['reanalyzed'] = self._analyze(first_dirty, end_dirty)
+
+    def _analyze(self, first_dirty, end_dirty):
+        """Reanalisa a partir do checkpoint anterior a first_dirty; devolve quantos segmentos rodaram."""
+        segments = self.segments
+        analyzer = self.analyzer
+        start = min(first_dirty, len(segments) - 1)
+        while start > 0 and segments[start].checkpoint is None:
+            start -= 1
+        checkpoint = segments[start].checkpoint if start > 0 else None
+        table = checkpoint.copy() if checkpoint is not None else SymbolTable()
+        analyzer.symbol_table = table
+
+        old_final = self._final_table
+        delta = self._literal_delta
+        count = 0
+        for index in range(start, len(segments)):
+            seg = segments[index]
+            if index >= end_dirty and seg.checkpoint is not None and index > start \
+                    and table.same_symbols(seg.checkpoint):
+                # Mesmos símbolos que na execução anterior: o resto continua válido
+                self._finish_literals(old_final)
+                analyzer.symbol_table = old_final
+                return count
+            seg.checkpoint = table.copy() if index % CHECKPOINT_INTERVAL == 0 else None
+            seg.sync_nodes()  # os diagnósticos usam as posições dos nós
+            self._semantic_diagnostics.clear()
+            if seg.literal_counts:
+                delta.append((seg.literal_counts, -1))
+            table.literals.journal = {}
+            table.order = []
+            for stmt in seg.statements:
+                analyzer.analyze(stmt)
+            seg.literal_counts = table.literals.journal
+            seg.order = tuple(dict.fromkeys(table.order))
+            table.literals.journal = None
+            table.order = None
+            delta.append((seg.literal_counts, 1))
+            seg.semantic_records = self._semantic_diagnostics.records
+            count += 1
+        self._finish_literals(old_final)
+        table.literals = old_final.literals
+        self._final_table = table
+        return count
+
+    def _finish_literals(self, final):
+        for counts, sign in self._literal_delta:
+            final.literals.apply(counts, sign)
+        self._literal_delta = []
+        self._reorder = True
+
+    # ---------------------------
+    # Resultados
+    # ---------------------------
+    @property
+    def ast(self):
+        """Nó 'program' com os statements de todos os segmentos (posições atualizadas)."""
+        if self._program is None:
+            program = ASTNode('program')
+            for seg in self.segments:
+                seg.sync_nodes()
+                program.extend(seg.statements)
+            self._program = program
+        return self._program
+
+    @property
+    def symbol_table(self):
+        if self.analyzer is None:
+            return None
+        if self._reorder:
+            self._final_table.reorder(event for seg in self.segments for event in seg.order)
+            self._reorder = False
+        return self._final_table
+
+    @property
+    def diagnostics(self):
+        """Registros do parser e, depois, do analisador semântico, em ordem de segmento."""
+        records = [r for seg in self.segments for r in seg.parse_records]
+        records.extend(r for seg in self.segments for r in seg.semantic_records)
+        return records
+
+    @property
+    def parse_error(self):
+        return any(seg.parse_error for seg in self.segments)
+
+    @property
+    def semantic_error(self):
+        return any(r.severity == ERROR for seg in self.segments for r in seg.semantic_records)
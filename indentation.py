@@ -0,0 +1,95 @@
+# indentation.py
+# Etapa de indentação dos lexers: transforma o início de cada linha lógica em
+# tokens INDENT/DEDENT, seguindo as regras do Python.
+#
+# - Os lexers casam o NEWLINE junto com as linhas em branco e de comentário
+#   que vêm depois dele e com os espaços iniciais da próxima linha com código
+#   (NEWLINE_PATTERN); só essa indentação final chega aqui, uma vez por linha.
+# - Tab avança até a próxima coluna múltipla de 8 e form feed volta à coluna 0.
+#   Como no Python, a indentação também é comparada contando cada tab como 1
+#   coluna: se as duas contagens discordarem, a mistura de tabs e espaços é
+#   ambígua e vira erro.
+# - No fim da entrada, close() fecha todos os blocos ainda abertos.
+# - Os tokens pendentes ficam em uma deque (retirada em O(1) pelo início).
+import re
+from collections import deque
+
+TAB_SIZE = 8
+
+# NEWLINE + linhas em branco/só com comentário + indentação da próxima linha
+NEWLINE_PATTERN = r'\n(?:[ \t\f]*(?:\#[^\n]*)?\n)*[ \t\f]*'
+
+# Linha sem código (usada para achar pontos de corte no modo streaming)
+BLANK_LINE_RE = re.compile(r'[ \t\f]*(?:\#[^\n]*)?\Z')
+
+
+def measure(indent):
+    """(coluna com tabs de 8, coluna com tabs de 1) de um trecho de espaços/tabs."""
+    if '\t' not in indent and '\f' not in indent:
+        return len(indent), len(indent)
+    col = alt = 0
+    for ch in indent:
+        if ch == ' ':
+            col += 1
+            alt += 1
+        elif ch == '\t':
+            col = (col // TAB_SIZE + 1) * TAB_SIZE
+            alt += 1
+        else:  # form feed
+            col = alt = 0
+    return col, alt
+
+
+class IndentationTracker:
+    """Pilha de níveis de indentação e fila de INDENT/DEDENT a emitir.
+
+    make_token(tipo, lineno, lexpos) cria os tokens no formato do lexer.
+    """
+    __slots__ = ('make_token', 'stack', 'pending')
+
+    def __init__(self, make_token):
+        self.make_token = make_token
+        self.reset()
+
+    def reset(self):
+        self.stack = [(0, 0)]  # (coluna, coluna com tabs de 1) de cada bloco aberto
+        self.pending = deque()
+
+    @property
+    def depth(self):
+        return len(self.stack) - 1
+
+    def line(self, indent, lineno, lexpos):
+        """Indentação de uma nova linha lógica; devolve um código de erro ou None."""
+        col, alt = measure(indent)
+        stack = self.stack
+        top, top_alt = stack[-1]
+        if col == top:
+            return None if alt == top_alt else 'inconsistent-indentation'
+        if col > top:
+            stack.append((col, alt))
+            self.pending.append(self.make_token('INDENT', lineno, lexpos))
+            return None if alt > top_alt else 'inconsistent-indentation'
+
+        make_token = self.make_token
+        pending = self.pending
+        while len(stack) > 1 and stack[-1][0] > col:
+            stack.pop()
+            pending.append(make_token('DEDENT', lineno, lexpos))
+        top, top_alt = stack[-1]
+        if top != col:
+            return 'unmatched-dedent'
+        return None if alt == top_alt else 'inconsistent-indentation'
+
+    def close(self, lineno, lexpos):
+        """Fim da entrada: DEDENT para cada bloco ainda aberto."""
+        while len(self.stack) > 1:
+            self.stack.pop()
+            self.pending.append(self.make_token('DEDENT', lineno, lexpos))
+
+
+# Mensagens dos erros devolvidos por IndentationTracker.line
+INDENT_ERRORS = {
+    'inconsistent-indentation': "Indentação inconsistente: mistura ambígua de tabs e espaços",
+    'unmatched-dedent': "Indentação não corresponde a nenhum nível externo",
+}
@@ -1,129 +1,510 @@
 import sys
-import subprocess
+import contextlib
 import os
 import argparse
+import glob
 from parser_ast import PythonLikeParser
 from semantic_analyzer import SemanticAnalyzer  # Importe a classe SemanticAnalyzer
-from mylexer import PythonLikeLexer
+from mylexer import create_lexer, LEXER_BACKENDS
+from diagnostics import Diagnostics, ERROR, WARNING
+from ast_to_dot import GraphOutput, GRAPH_FORMATS, subtree_size
+from token_buffer import write_tokens, TOKEN_FORMATS
+from ast_binary import save_ast
+from streaming import StreamingPipeline
+from optimizer import ASTOptimizer
+from vm import VMError, compile_program, execute, disassemble
+from result_cache import (ResultCache, new_entry, flatten_ast, rebuild_ast,
+                          dump_diagnostics, replay_diagnostics)
+import pipeline_stats
+from pipeline_stats import PipelineStats
 
 # -------------------------------
-# Função para gerar DOT
+# Parser e AST
 # -------------------------------
-def ast_to_dot(node):
-    """Gera texto DOT para GraphViz a partir de ASTNode"""
-    lines = []
-    lines.append('digraph AST {')
-    lines.append('node [shape=box];')
-
-    def walk(n):
-        label = f"{n.type}"
-        if n.value is not None:
-            label += f"\\n{n.value}"
-        lines.append(f'"{n.id}" [label="{label}"];')
-        for child in n.children:
-            lines.append(f'"{n.id}" -> "{child.id}";')
-            walk(child)
-
-    walk(node)
-    lines.append('}')
-    return '\n'.join(lines)
+def run_tokens_only(code, lexer=None, fmt='text', out=None):
+    # Instâncias podem ser reaproveitadas entre arquivos (tabelas já carregadas)
+    lexer = lexer or create_lexer()
+    if isinstance(code, str):
+        lexer.input(code)
+        tokens = iter(lexer.token, None)
+    else:
+        # Arquivo/mmap: tokeniza aos pedaços, sem ler o arquivo inteiro
+        tokens = lexer.tokenize_stream(code)
+    if out is None:
+        out = sys.stdout.buffer if fmt == 'bin' else sys.stdout
+    with pipeline_stats.stage('lexer'):
+        write_tokens(pipeline_stats.counted('tokens', tokens), out, fmt)
 
 
-# -------------------------------
-# Lê arquivo do CLI
-# -------------------------------
-parser = argparse.ArgumentParser(description='Analisador léxico/sintático/semântico simples')
-group = parser.add_mutually_exclusive_group()
-group.add_argument('--tokens', action='store_true', help='Executa apenas o lexer e imprime tokens')
-group.add_argument('--ast', action='store_true', help='Gera apenas a AST (arquivo DOT/PNG)')
-group.add_argument('--run', action='store_true', help='Executa o pipeline completo (parser + semântica + AST)')
-parser.add_argument('input_file', help='Arquivo de entrada')
-args = parser.parse_args()
+def write_image(dot_file, image_file, graph, image_data=None, key=None):
+    """Gera a imagem do DOT já gravado; devolve True se ela foi gerada agora.
 
-input_file = args.input_file
+    image_data permite reaproveitar uma imagem já pronta (cache); key é a
+    chave do cache, repassada quando a geração fica para depois (modo lote).
+    """
+    if not graph.render:
+        return False
+    if image_data is not None:
+        with open(image_file, "wb") as f:
+            f.write(image_data)
+        print(f"Arquivo {graph.fmt.upper()} gerado: {image_file}")
+        return True
+    return graph.image(dot_file, image_file, key)
 
-# Se nenhuma flag for informada, comportamento padrão é --run
-mode_tokens = args.tokens
-mode_ast = args.ast
-mode_run = args.run or not (args.tokens or args.ast)
 
-if not os.path.isfile(input_file):
-    print(f"Arquivo não encontrado: {input_file}")
-    sys.exit(1)
+def write_graph(ast_root, dot_file, image_file, graph):
+    """Grava o DOT (em streaming, com os limites de graph) e gera a imagem."""
+    with pipeline_stats.stage('dot'):
+        graph.write_dot(ast_root, dot_file)
+    print(f"Arquivo DOT gerado: {dot_file}")
+    return write_image(dot_file, image_file, graph)
 
-with open(input_file, "r") as f:
-    code = f.read()
 
+def _parse(code, parser):
+    if pipeline_stats.active() is None:
+        return parser.parse(code)
+    # Com estatísticas, os tokens passam por um contador a caminho do parser
+    lexer = parser.lexer
+    tokens = lexer.tokenize_segment(code) if isinstance(code, str) else lexer.tokenize_stream(code)
+    return parser.parse_tokens(pipeline_stats.counted('tokens', tokens))
 
-# -------------------------------
-# Parser e AST
-# -------------------------------
-def run_tokens_only(code):
-    lexer = PythonLikeLexer()
-    lexer.lexer.input(code)
-    print("Tokens:")
-    while True:
-        tok = lexer.token()
-        if not tok:
-            break
-        val = repr(tok.value)
-        print(f"{tok.type}\t{val}\t(lineno={tok.lineno}, pos={tok.lexpos})")
-
-
-def run_ast_only(code):
-    parser = PythonLikeParser()
-    ast_root = parser.parse(code)
-    if parser.lexer.error or parser.error or ast_root is None:
+
+def parse_and_optimize(code, parser, optimize=False):
+    """Parse e, se pedido, o passo de otimização (as mudanças vão para os diagnósticos do parser)."""
+    with pipeline_stats.stage('parse'):
+        ast_root = _parse(code, parser)
+    if optimize and ast_root is not None and not (parser.lexer.error or parser.error):
+        with pipeline_stats.stage('optimize'):
+            ast_root = ASTOptimizer(parser.diagnostics, parser.share_expressions).optimize(ast_root)
+    if ast_root is not None and pipeline_stats.active() is not None:
+        pipeline_stats.set_counter('nodes', subtree_size(ast_root))
+    return ast_root
+
+
+def analyze(ast_root, semantic_analyzer):
+    """Análise semântica (com a tabela zerada antes)."""
+    semantic_analyzer.reset()
+    with pipeline_stats.stage('semantic'):
+        semantic_analyzer.analyze(ast_root)
+    _count_symbols(semantic_analyzer.symbol_table)
+
+
+def _count_symbols(symbol_table):
+    pipeline_stats.set_counter('symbols', len(symbol_table.symbols()))
+    pipeline_stats.set_counter('literals', len(symbol_table.literals))
+
+
+def syntax_errors(parser, ast_root):
+    """Avisa dos erros do lexer/parser; devolve True se houve algum.
+
+    Com a recuperação de erros o parser ainda devolve a AST parcial (nós 'error'
+    no lugar dos statements quebrados), que segue no pipeline; só sem AST
+    nenhuma é que nada é gerado.
+    """
+    if ast_root is None:
         print("Ocorreram erros no lexer ou parser. Nenhum arquivo AST será gerado.")
+        return True
+    if parser.lexer.error or parser.error:
+        print("Ocorreram erros no lexer ou parser. A análise segue com os statements válidos.")
+        return True
+    return False
+
+
+def new_analyzer(parser, dataflow=False):
+    """SemanticAnalyzer com o coletor do parser; memoiza tipos se a AST for um DAG."""
+    return SemanticAnalyzer(parser.diagnostics, memoize_types=parser.share_expressions,
+                            dataflow=dataflow)
+
+
+def write_ast_file(ast_root, ast_file):
+    """Grava a AST no formato binário (ver ast_binary.py)."""
+    with pipeline_stats.stage('ast-file'):
+        count = save_ast(ast_root, ast_file)
+    print(f"Arquivo AST binário gerado: {ast_file} ({count} nós)")
+
+
+def run_ast_only(code, parser=None, dot_file="ast.dot", image_file=None, graph=None,
+                 cache=None, optimize=False, ast_file=None):
+    parser = parser or PythonLikeParser()
+    graph = graph or GraphOutput()
+    image_file = image_file or f"ast.{graph.fmt}"
+    if cache is not None:
+        return run_cached(code, parser, None, cache, dot_file, image_file, None, graph, optimize,
+                          ast_file)
+    ast_root = parse_and_optimize(code, parser, optimize)
+    failed = syntax_errors(parser, ast_root)
+    if ast_root is None:
         return 1
-    dot_code = ast_to_dot(ast_root)
-    dot_file = "ast.dot"
-    png_file = "ast.png"
-    with open(dot_file, "w") as f:
-        f.write(dot_code)
+    if ast_file:
+        write_ast_file(ast_root, ast_file)
+    write_graph(ast_root, dot_file, image_file, graph)
+    return 1 if failed else 0
+
+
+def run_full(code, parser=None, semantic_analyzer=None, dot_file="ast.dot", image_file=None,
+             symbol_file="symbol_table.json", graph=None, cache=None, optimize=False,
+             ast_file=None):
+    parser = parser or PythonLikeParser()
+    graph = graph or GraphOutput()
+    image_file = image_file or f"ast.{graph.fmt}"
+    if cache is not None:
+        semantic_analyzer = semantic_analyzer or new_analyzer(parser)
+        return run_cached(code, parser, semantic_analyzer, cache, dot_file, image_file,
+                          symbol_file, graph, optimize, ast_file)
+    ast_root = parse_and_optimize(code, parser, optimize)
+    failed = syntax_errors(parser, ast_root)
+    if ast_root is None:
+        return 1
+    if ast_file:
+        write_ast_file(ast_root, ast_file)
+    # O analisador usa o mesmo coletor de diagnósticos do parser
+    semantic_analyzer = semantic_analyzer or new_analyzer(parser)
+    analyze(ast_root, semantic_analyzer)
+    semantic_analyzer.save_symbol_table(symbol_file)
+    write_graph(ast_root, dot_file, image_file, graph)
+    return 1 if failed else 0
+
+
+def run_stream(code, parser=None, semantic_analyzer=None, dot_file="ast.dot", image_file=None,
+               symbol_file="symbol_table.json", delta_file="symbol_table.jsonl", graph=None,
+               optimize=False, diagnostics_out=None):
+    """Pipeline statement a statement (ver streaming.py); sem semantic_analyzer é o modo --ast."""
+    parser = parser or PythonLikeParser()
+    graph = graph or GraphOutput()
+    image_file = image_file or f"ast.{graph.fmt}"
+    with contextlib.ExitStack() as files:
+        dot = files.enter_context(open(dot_file, "w"))
+        deltas = files.enter_context(open(delta_file, "w")) if semantic_analyzer else None
+        pipeline = StreamingPipeline(parser, semantic_analyzer, dot, deltas, diagnostics_out,
+                                     graph.max_nodes, graph.max_depth, optimize)
+        ast_root = pipeline.run(code)
+    print(f"Statements processados: {pipeline.statements}")
+    failed = syntax_errors(parser, ast_root)
+    if semantic_analyzer is not None:
+        _count_symbols(semantic_analyzer.symbol_table)
+        semantic_analyzer.save_symbol_table(symbol_file)
+        print(f"Deltas da tabela de símbolos salvos em {delta_file}")
     print(f"Arquivo DOT gerado: {dot_file}")
-    try:
-        subprocess.run(["dot", "-Tpng", dot_file, "-o", png_file], check=True)
-        print(f"Arquivo PNG gerado: {png_file}")
-    except FileNotFoundError:
-        print("GraphViz não encontrado. Instale o GraphViz para gerar o PNG.")
-    except subprocess.CalledProcessError as e:
-        print("Erro ao gerar PNG:", e)
-    return 0
+    write_image(dot_file, image_file, graph)
+    return 1 if failed else 0
 
 
-def run_full(code):
-    parser = PythonLikeParser()
-    ast_root = parser.parse(code)
-    if parser.lexer.error or parser.error or ast_root is None:
-        print("Ocorreram erros no lexer ou parser. Nenhum arquivo AST será gerado.")
+def run_cached(code, parser, semantic_analyzer, cache, dot_file, image_file, symbol_file, graph,
+               optimize=False, ast_file=None):
+    """run_ast_only/run_full usando o cache de resultados (semantic_analyzer=None no modo --ast).
+
+    Cada etapa que já estiver na entrada do cache (parse, semântica, DOT, imagem) é
+    reaproveitada, inclusive as mensagens, que são reenviadas ao coletor; as
+    que faltarem são executadas e a entrada é atualizada.
+    """
+    with pipeline_stats.stage('cache'):
+        variant = (('optimized' if optimize else '') + ('shared' if parser.share_expressions else '')
+                   + ('dataflow' if getattr(semantic_analyzer, 'dataflow', False) else '')
+                   + graph.variant)
+        key = cache.key_for(code, variant)
+        entry = cache.load(key, parser.diagnostics)
+    pipeline_stats.set_counter('cache', 'miss' if entry is None else 'hit')
+    changed = entry is None
+    ast_root = None
+    parser.reset()
+    if entry is None:
+        entry = new_entry(parser.diagnostics)
+        ast_root = parse_and_optimize(code, parser, optimize)
+        entry['parse_failed'] = ast_root is None
+        entry['syntax_error'] = bool(parser.lexer.error or parser.error)
+        entry['parse_diagnostics'] = dump_diagnostics(parser.diagnostics.records)
+        if not entry['parse_failed']:
+            entry['ast'] = flatten_ast(ast_root)
+    else:
+        replay_diagnostics(entry['parse_diagnostics'], parser.diagnostics)
+        parser.error = entry['syntax_error']
+
+    if entry['parse_failed']:
+        syntax_errors(parser, None)
+        if changed:
+            with pipeline_stats.stage('cache'):
+                cache.store(key, entry)
         return 1
-    semantic_analyzer = SemanticAnalyzer()
-    semantic_analyzer.analyze(ast_root)
-    semantic_analyzer.save_symbol_table("symbol_table.json")
-    dot_code = ast_to_dot(ast_root)
-    dot_file = "ast.dot"
-    png_file = "ast.png"
-    with open(dot_file, "w") as f:
-        f.write(dot_code)
+    failed = syntax_errors(parser, ast_root or entry['ast'])
+    if ast_file:
+        ast_root = ast_root or rebuild_ast(entry['ast'])
+        write_ast_file(ast_root, ast_file)
+
+    if semantic_analyzer is not None:
+        semantic_analyzer.reset()
+        diagnostics = semantic_analyzer.diagnostics
+        if entry['symbol_table'] is None:
+            ast_root = ast_root or rebuild_ast(entry['ast'])
+            first = len(diagnostics.records)
+            with pipeline_stats.stage('semantic'):
+                semantic_analyzer.analyze(ast_root)
+            entry['symbol_table'] = semantic_analyzer.symbol_table
+            entry['semantic_error'] = semantic_analyzer.error
+            entry['semantic_diagnostics'] = dump_diagnostics(diagnostics.records[first:])
+            changed = True
+        else:
+            replay_diagnostics(entry['semantic_diagnostics'], diagnostics)
+            semantic_analyzer.symbol_table = entry['symbol_table']
+            semantic_analyzer.error = entry['semantic_error']
+        _count_symbols(semantic_analyzer.symbol_table)
+        semantic_analyzer.save_symbol_table(symbol_file)
+
+    with pipeline_stats.stage('dot'):
+        if entry['dot'] is None:
+            graph.write_dot(ast_root or rebuild_ast(entry['ast']), dot_file)
+            with open(dot_file, "r") as f:
+                entry['dot'] = f.read()
+            changed = True
+        else:
+            with open(dot_file, "w") as f:
+                f.write(entry['dot'])
     print(f"Arquivo DOT gerado: {dot_file}")
+    image_data = entry['images'].get(graph.fmt)
+    if write_image(dot_file, image_file, graph, image_data, key) and image_data is None:
+        with open(image_file, "rb") as f:
+            entry['images'][graph.fmt] = f.read()
+        changed = True
+
+    if changed:
+        with pipeline_stats.stage('cache'):
+            cache.store(key, entry)
+    return 1 if failed else 0
+
+
+def run_exec(code, parser=None, semantic_analyzer=None, show_bytecode=False, optimize=False):
+    """Analisa, compila para bytecode e executa o programa na VM."""
+    parser = parser or PythonLikeParser()
+    ast_root = parse_and_optimize(code, parser, optimize)
+    if parser.lexer.error or parser.error or ast_root is None:
+        print("Ocorreram erros no lexer ou parser. O programa não será executado.")
+        return 1
+    semantic_analyzer = semantic_analyzer or new_analyzer(parser)
+    analyze(ast_root, semantic_analyzer)
+    if semantic_analyzer.error:
+        print("Ocorreram erros semânticos. O programa não será executado.")
+        return 1
     try:
-        subprocess.run(["dot", "-Tpng", dot_file, "-o", png_file], check=True)
-        print(f"Arquivo PNG gerado: {png_file}")
-    except FileNotFoundError:
-        print("GraphViz não encontrado. Instale o GraphViz para gerar o PNG.")
-    except subprocess.CalledProcessError as e:
-        print("Erro ao gerar PNG:", e)
+        with pipeline_stats.stage('compile'):
+            program = compile_program(ast_root, semantic_analyzer.symbol_table)
+        if show_bytecode:
+            disassemble(program)
+        with pipeline_stats.stage('execute'):
+            execute(program)
+    except VMError as e:
+        semantic_analyzer.diagnostics.error('runtime', e.code, e.template, e.args_, line=e.line,
+                                            fields=(('Linha', 'line', False),))
+        return 1
     return 0
 
 
-# Executa modo selecionado
-exit_code = 0
-if mode_tokens:
-    run_tokens_only(code)
-elif mode_ast:
-    exit_code = run_ast_only(code)
-elif mode_run:
-    exit_code = run_full(code)
+# -------------------------------
+# Lê argumentos do CLI
+# -------------------------------
+def build_arg_parser():
+    parser = argparse.ArgumentParser(description='Analisador léxico/sintático/semântico simples')
+    group = parser.add_mutually_exclusive_group()
+    group.add_argument('--tokens', action='store_true', help='Executa apenas o lexer e imprime tokens')
+    group.add_argument('--ast', action='store_true', help='Gera apenas a AST (arquivo DOT/PNG)')
+    group.add_argument('--run', action='store_true', help='Executa o pipeline completo (parser + semântica + AST)')
+    group.add_argument('--exec', action='store_true',
+                       help='Compila o programa para bytecode e o executa na VM')
+    parser.add_argument('input_file', nargs='*',
+                        help='Arquivo de entrada (em modo lote: arquivos, diretórios ou globs)')
+    parser.add_argument('--files-from', metavar='LISTA',
+                        help='Arquivo com um caminho de entrada por linha (modo lote)')
+    parser.add_argument('--out-dir', metavar='DIR',
+                        help='Diretório de saída dos arquivos gerados em modo lote (padrão: saida)')
+    parser.add_argument('-j', '--jobs', type=int, default=None,
+                        help='Número de processos em modo lote (padrão: número de CPUs)')
+    parser.add_argument('--lexer', choices=sorted(LEXER_BACKENDS), default='ply',
+                        help='Backend do lexer: ply (padrão) ou fast (scanner de regex única)')
+    parser.add_argument('--tokens-format', choices=TOKEN_FORMATS, default='text',
+                        help='Formato da saída de --tokens: text (padrão), tsv, jsonl ou bin')
+    parser.add_argument('--tokens-out', metavar='ARQUIVO',
+                        help='Grava a saída de --tokens em um arquivo em vez da saída padrão')
+    parser.add_argument('--diagnostics', choices=('terminal', 'json'), default='terminal',
+                        help='Mensagens no terminal à medida que ocorrem (padrão) ou em JSON ao final')
+    parser.add_argument('-q', '--quiet', action='store_true',
+                        help='Não exibe mensagens do lexer/parser/semântica (apenas o código de saída)')
+    parser.add_argument('--no-png', action='store_true',
+                        help='Não chama o GraphViz para gerar a imagem (só o DOT)')
+    parser.add_argument('--graph-format', choices=GRAPH_FORMATS, default='png',
+                        help='Formato da imagem gerada pelo GraphViz: png (padrão), svg ou plain')
+    parser.add_argument('--max-nodes', type=int, default=None, metavar='N',
+                        help='Máximo de nós da AST no DOT; o restante vira nós-resumo')
+    parser.add_argument('--max-depth', type=int, default=None, metavar='N',
+                        help='Profundidade máxima da AST no DOT; subárvores abaixo viram nós-resumo')
+    parser.add_argument('-O', '--optimize', action='store_true',
+                        help='Otimiza a AST (dobra de constantes, ramos mortos) antes da semântica')
+    parser.add_argument('--share-expressions', action='store_true',
+                        help='Compartilha subexpressões iguais (AST como DAG) e memoiza os '
+                             'tipos delas na análise semântica')
+    parser.add_argument('--dataflow', action='store_true',
+                        help='Monta o grafo de fluxo de controle e avisa sobre uso antes da '
+                             'atribuição, tipos que variam por caminho e atribuições não usadas')
+    parser.add_argument('--stream', action='store_true',
+                        help='Em --ast/--run, processa um statement de nível superior por vez, '
+                             'com memória constante (para arquivos enormes; sem cache, '
+                             '--dataflow e --ast-out)')
+    parser.add_argument('--ast-out', metavar='ARQUIVO',
+                        help='Em --ast/--run, grava também a AST no formato binário '
+                             '(lido por ast_binary.load_ast)')
+    parser.add_argument('--disasm', action='store_true',
+                        help='Com --exec, imprime o bytecode antes de executar')
+    parser.add_argument('--no-cache', action='store_true',
+                        help='Ignora o cache de resultados (--ast/--run) e não grava nada nele')
+    parser.add_argument('--stats', action='store_true',
+                        help='Ao final, mostra na saída de erro o tempo de cada etapa e os '
+                             'contadores; em modo lote grava <nome>.stats.json')
+    parser.add_argument('--stats-format', choices=('text', 'json'), default='text',
+                        help='Formato de --stats: text (padrão) ou json')
+    parser.add_argument('--stats-memory', action='store_true',
+                        help='Com --stats, mede também o pico de memória (tracemalloc; mais lento)')
+    parser.add_argument('--profile', metavar='ARQUIVO',
+                        help='Grava um perfil do cProfile da execução (abrir com pstats/snakeviz)')
+    parser.add_argument('--serve', action='store_true',
+                        help='Modo servidor: atende pedidos JSON Lines na entrada padrão '
+                             '(ou em --socket) com o parser já carregado')
+    parser.add_argument('--socket', metavar='CAMINHO',
+                        help='Com --serve, atende em um socket Unix em vez da entrada padrão')
+    parser.add_argument('--async', dest='use_async', action='store_true',
+                        help='Com --serve, atende pedidos em paralelo (asyncio + pool de '
+                             '-j processos, GraphViz assíncrono)')
+    parser.add_argument('--max-queue', type=int, default=None, metavar='N',
+                        help='Com --async, pedidos aguardando além dos que já estão em '
+                             'análise; acima disso são recusados (padrão: 64)')
+    parser.add_argument('--timeout', type=float, default=None, metavar='SEG',
+                        help='Com --async, tempo máximo de cada pedido (padrão: 30)')
+    parser.add_argument('--graphviz-jobs', type=int, default=None, metavar='N',
+                        help='Com --async, chamadas simultâneas ao GraphViz (padrão: 2)')
+    parser.add_argument('--image-dir', metavar='DIR',
+                        help='Com --async, diretório onde os pedidos podem gravar a imagem '
+                             '("image_file"); sem ele image_file é recusado')
+    return parser
+
+
+def main(argv=None):
+    arg_parser = build_arg_parser()
+    args = arg_parser.parse_args(argv)
+
+    # Se nenhuma flag for informada, comportamento padrão é --run
+    if args.tokens:
+        mode = 'tokens'
+    elif args.ast:
+        mode = 'ast'
+    elif args.exec:
+        mode = 'exec'
+    else:
+        mode = 'run'
+
+    if args.serve:
+        # Import tardio, como no modo lote
+        if args.use_async:
+            from async_server import run_async_server
+            options = {name: getattr(args, name)
+                       for name in ('max_queue', 'timeout', 'graphviz_jobs', 'image_dir')
+                       if getattr(args, name) is not None}
+            return run_async_server(args.socket, workers=args.jobs, lexer_backend=args.lexer,
+                                    **options)
+        from server import run_server
+        return run_server(args.socket, args.lexer)
+
+    inputs = args.input_file
+    is_batch = (
+        args.files_from is not None
+        or args.out_dir is not None
+        or len(inputs) > 1
+        or any(os.path.isdir(p) or glob.has_magic(p) for p in inputs)
+    )
+    if not inputs and args.files_from is None:
+        arg_parser.error("informe um arquivo de entrada")
+
+    if args.stream and (is_batch or mode not in ('ast', 'run') or args.dataflow or args.ast_out):
+        arg_parser.error("--stream vale para --ast/--run de um arquivo, sem --dataflow e --ast-out")
+
+    if is_batch:
+        # Import tardio: batch.py importa as funções run_* deste módulo
+        from batch import run_batch
+        return run_batch(inputs, mode, out_dir=args.out_dir or 'saida', jobs=args.jobs,
+                         files_from=args.files_from, render_png=not args.no_png,
+                         lexer_backend=args.lexer, tokens_format=args.tokens_format,
+                         use_cache=not args.no_cache, optimize=args.optimize,
+                         share_expressions=args.share_expressions, dataflow=args.dataflow,
+                         graph_format=args.graph_format, max_nodes=args.max_nodes,
+                         max_depth=args.max_depth,
+                         stats=args.stats, stats_memory=args.stats_memory)
+
+    input_file = inputs[0]
+    if not os.path.isfile(input_file):
+        print(f"Arquivo não encontrado: {input_file}")
+        return 1
+
+    if args.quiet:
+        diagnostics = Diagnostics(level=ERROR)
+    elif args.diagnostics == 'json':
+        diagnostics = Diagnostics()
+    elif mode == 'exec':
+        # Sem as mensagens informativas, que se misturariam à saída do programa
+        diagnostics = Diagnostics(level=WARNING, echo=True)
+    else:
+        diagnostics = Diagnostics(echo=True)
+
+    cache = None if args.no_cache or args.stream or mode in ('tokens', 'exec') else ResultCache.default()
+    graph = GraphOutput(args.graph_format, args.max_nodes, args.max_depth, render=not args.no_png)
+
+    stats = None
+    if args.stats or args.profile:
+        stats = PipelineStats(trace_memory=args.stats_memory, profile_file=args.profile)
+    with (pipeline_stats.collecting(stats) if stats else contextlib.nullcontext()):
+        exit_code = run_file(input_file, mode, args, diagnostics, cache, graph)
+        pipeline_stats.set_counter('bytes', os.path.getsize(input_file))
+    if cache is not None and cache.written:
+        cache.prune()
+
+    if args.diagnostics == 'json' and not args.quiet and not args.stream:
+        # (com --stream as mensagens já saíram em JSON Lines, statement a statement)
+        print(diagnostics.to_json(indent=2))
+    if args.stats and args.stats_format == 'json':
+        print(stats.to_json(indent=2), file=sys.stderr)
+    elif args.stats:
+        stats.render(sys.stderr)
+    elif args.profile:
+        print(f"Perfil do cProfile gravado em {args.profile}", file=sys.stderr)
+    return exit_code
+
+
+def run_file(input_file, mode, args, diagnostics, cache, graph):
+    """Executa o modo escolhido sobre um arquivo; devolve o código de saída."""
+    # O arquivo é lido em streaming pelo lexer, não é carregado inteiro
+    with open(input_file, "r") as code:
+        if mode == 'tokens':
+            with pipeline_stats.stage('tables'):
+                lexer = create_lexer(args.lexer, diagnostics)
+            if args.tokens_out:
+                mode_flag = 'wb' if args.tokens_format == 'bin' else 'w'
+                with open(args.tokens_out, mode_flag) as out:
+                    run_tokens_only(code, lexer, args.tokens_format, out)
+            else:
+                run_tokens_only(code, lexer, args.tokens_format)
+            return 0
+
+        with pipeline_stats.stage('tables'):
+            parser = PythonLikeParser(args.lexer, diagnostics, args.share_expressions)
+        if args.stream:
+            diagnostics_out = sys.stdout if args.diagnostics == 'json' and not args.quiet else None
+            analyzer = new_analyzer(parser) if mode == 'run' else None
+            return run_stream(code, parser=parser, semantic_analyzer=analyzer, graph=graph,
+                              optimize=args.optimize, diagnostics_out=diagnostics_out)
+        if mode == 'ast':
+            return run_ast_only(code, parser=parser, graph=graph, cache=cache,
+                                optimize=args.optimize, ast_file=args.ast_out)
+        analyzer = new_analyzer(parser, args.dataflow)
+        if mode == 'exec':
+            return run_exec(code, parser=parser, semantic_analyzer=analyzer,
+                            show_bytecode=args.disasm, optimize=args.optimize)
+        return run_full(code, parser=parser, semantic_analyzer=analyzer, graph=graph, cache=cache,
+                        optimize=args.optimize, ast_file=args.ast_out)
+
 
-sys.exit(exit_code)
+if __name__ == '__main__':
+    sys.exit(main())
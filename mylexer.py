@@ -1,5 +1,70 @@
+import codecs
+import itertools
+import os
+import re
+
 import ply.lex as lex
 
+from diagnostics import Diagnostics
+from indentation import IndentationTracker, NEWLINE_PATTERN, BLANK_LINE_RE, INDENT_ERRORS
+from table_cache import cache_dir, definitions_hash, load_table_module, staging_dir
+
+# Tamanho padrão (em caracteres/bytes) de cada pedaço lido no modo streaming
+DEFAULT_CHUNK_SIZE = 1 << 16
+
+
+def _read_chunks(source, chunk_size, encoding):
+    """Lê a fonte em pedaços de texto: caminho, arquivo (texto ou binário), mmap ou bytes."""
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, "r", encoding=encoding) as f:
+            yield from _read_chunks(f, chunk_size, encoding)
+        return
+
+    decoder = codecs.getincrementaldecoder(encoding)()
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        view = memoryview(source)
+        for start in range(0, len(view), chunk_size):
+            yield decoder.decode(bytes(view[start:start + chunk_size]))
+        yield decoder.decode(b'', final=True)
+        return
+
+    # Objeto de arquivo ou mmap: ambos têm read(n)
+    while True:
+        data = source.read(chunk_size)
+        if not data:
+            break
+        if isinstance(data, str):
+            yield data
+        else:
+            yield decoder.decode(data)
+    yield decoder.decode(b'', final=True)
+
+
+def _chunk_cut(buf):
+    """Posição onde o buffer pode ser cortado sem quebrar token nem indentação.
+
+    O corte fica na quebra de linha que termina a última linha com código: o
+    NEWLINE, as linhas em branco/comentário seguintes e a indentação da próxima
+    linha ficam juntos no próximo pedaço (o lexer os casa em um token só).
+    Retorna 0 se ainda não há ponto de corte.
+    """
+    pos = buf.rfind('\n')
+    while pos > 0:
+        start = buf.rfind('\n', 0, pos) + 1
+        if not BLANK_LINE_RE.match(buf, start, pos):
+            return pos
+        pos = start - 1
+    return 0
+
+
+# Linhas extras exibidas no terminal para um caractere inválido
+_CHAR_ERROR_FIELDS = (
+    ('Linha', 'line', False),
+    ('Posição', 'offset', False),
+    ('Resto da linha', 'rest', True),
+)
+
+
 class PythonLikeLexer:
 
     # ---------------------------
@@ -43,24 +108,135 @@ class PythonLikeLexer:
     # Ignorar comentários e espaços
     # ---------------------------
     t_ignore_COMMENT = r'\#.*'
-    t_ignore = ' \t'
+    t_ignore = ' \t\f'
 
     # ---------------------------
     # Inicialização
     # ---------------------------
-    def __init__(self):
-        self.indent_stack = [0]  # pilha de indentação
-        self.pending = []        # tokens pendentes (DEDENT)
+    def __init__(self, diagnostics=None):
+        # INDENT/DEDENT pendentes e pilha de níveis (ver indentation.py)
+        self.indentation = IndentationTracker(self._make_token)
         self.error = False       # indica se houve erro
-        self.lexer = lex.lex(module=self)
+        self._chunk_base = 0     # posição do pedaço atual no texto (modo streaming)
+        self._open_line = False  # o texto termina em uma linha com código, sem '\n'
+        self._last_newline = (1, 0)  # (linha, posição) do último NEWLINE
+        self._tokens = iter(())
+        self._init_diagnostics(diagnostics)
+        self.lexer = self._build_lexer()
 
-    def input(self, data):
-        """Reinicia estado e envia novo código para o lexer interno."""
-        self.indent_stack = [0]
-        self.pending = []
+    def _init_diagnostics(self, diagnostics):
+        # Sem coletor explícito, imprime as mensagens assim que ocorrem (como antes)
+        self._owns_diagnostics = diagnostics is None
+        self.diagnostics = diagnostics if diagnostics is not None else Diagnostics(echo=True)
+
+    def _build_lexer(self):
+        """Constrói o lexer do PLY reaproveitando o lextab do cache quando existir."""
+        outputdir = cache_dir()
+        if outputdir is None:
+            return lex.lex(module=self)
+
+        tabname = 'lextab_' + definitions_hash(type(self), 't_')
+        tabfile = os.path.join(outputdir, tabname + '.py')
+        if os.path.isfile(tabfile):
+            try:
+                tabmodule = load_table_module(tabname, tabfile)
+                return lex.lex(module=self, optimize=True, lextab=tabmodule)
+            except Exception:
+                pass  # tabela corrompida: gera de novo abaixo
+        # Em modo otimizado o PLY gera e grava o lextab (aqui, no diretório temporário)
+        with staging_dir(outputdir) as staging:
+            return lex.lex(module=self, optimize=True, lextab=tabname, outputdir=staging)
+
+    def reset(self):
+        """Limpa o estado de indentação/erro para reutilizar o mesmo lexer."""
+        self.indentation.reset()
         self.error = False
+        self._chunk_base = 0
+        self._open_line = False
+        self._last_newline = (1, 0)
+        self._tokens = iter(())
+        if self._owns_diagnostics:
+            self.diagnostics.clear()
         self.lexer.lineno = 1
+
+    def input(self, data):
+        """Reinicia estado e envia novo código para o lexer interno."""
+        self.reset()
         self.lexer.input(data)
+        self._open_line = _ends_open(data)
+        self._tokens = itertools.chain(self._drain(0), self._close())
+
+    # ---------------------------
+    # Entrada em streaming
+    # ---------------------------
+    def tokenize_stream(self, source, chunk_size=DEFAULT_CHUNK_SIZE, encoding='utf-8'):
+        """Gera os tokens lendo a fonte aos pedaços, com memória limitada.
+
+        source pode ser um caminho, um arquivo aberto (texto ou binário), um mmap
+        ou bytes. As posições (lexpos) dos tokens são relativas ao texto inteiro.
+        """
+        self.reset()
+        base = 0    # posição do início do pedaço atual no texto completo
+        carry = ''  # final do pedaço anterior que ainda não pode ser analisado
+        for data in _read_chunks(source, chunk_size, encoding):
+            buf = carry + data
+            cut = _chunk_cut(buf)
+            if cut == 0:
+                carry = buf
+                continue
+            yield from self._tokenize_chunk(buf[:cut], base)
+            base += cut
+            carry = buf[cut:]
+        if carry:
+            yield from self._tokenize_chunk(carry, base)
+        yield from self._close()
+
+    def tokenize_segment(self, text, base=0, lineno=1):
+        """Gera os tokens de um trecho que começa na posição base e na linha lineno.
+
+        Usado pela análise incremental para relexar só uma parte do arquivo.
+        """
+        self.reset()
+        self.lexer.lineno = lineno
+        yield from self._tokenize_chunk(text, base)
+        yield from self._close()
+
+    def _tokenize_chunk(self, chunk, base):
+        # lineno e pilha de indentação continuam valendo entre os pedaços
+        self._chunk_base = base
+        self._open_line = _ends_open(chunk)
+        self.lexer.input(chunk)
+        yield from self._drain(base)
+
+    def _drain(self, base):
+        """Tokens do texto atual do PLY, intercalados com os INDENT/DEDENT pendentes."""
+        pending = self.indentation.pending
+        next_token = self.lexer.token
+        while True:
+            if pending:
+                tok = pending.popleft()
+            else:
+                tok = next_token()
+                if tok is None:
+                    break
+            tok.lexpos += base
+            yield tok
+
+    def _lineno(self):
+        return self.lexer.lineno
+
+    def _close(self):
+        """Fim da entrada: NEWLINE da última linha (se faltar) e DEDENT dos blocos abertos."""
+        if self._open_line:
+            lineno = self._lineno()
+            lexpos = self._chunk_base + len(self.lexdata)
+            yield self._make_token('NEWLINE', lineno, lexpos, '\n')
+        else:
+            lineno, lexpos = self._last_newline
+        indentation = self.indentation
+        indentation.close(lineno, lexpos)
+        while indentation.pending:
+            yield indentation.pending.popleft()
 
     # ---------------------------
     # Tokens básicos
@@ -96,62 +272,227 @@ class PythonLikeLexer:
     # ---------------------------
     # NEWLINE → calcula indentação
     # ---------------------------
+    # Um NEWLINE só por linha lógica: as linhas em branco e de comentário que
+    # vêm depois dele e a indentação da próxima linha entram no mesmo token.
+    @lex.TOKEN(NEWLINE_PATTERN)
     def t_NEWLINE(self, t):
-        r'\n+'
-        t.lexer.lineno += t.value.count("\n")
+        text = t.value
+        lexer = t.lexer
+        lexer.lineno += text.count('\n')
         t.value = '\n'
-
-        # Próxima posição na linha
-        line_pos = t.lexer.lexpos
-        spaces = 0
-        while line_pos < len(t.lexer.lexdata) and t.lexer.lexdata[line_pos] == ' ':
-            spaces += 1
-            line_pos += 1
-
-        last = self.indent_stack[-1]
-
-        # INDENT
-        if spaces > last:
-            self.indent_stack.append(spaces)
-            self.pending.append(self._make_token(t, "INDENT"))
-
-        # DEDENT
-        elif spaces < last:
-            while self.indent_stack and self.indent_stack[-1] > spaces:
-                self.indent_stack.pop()
-                self.pending.append(self._make_token(t, "DEDENT"))
-
+        self._last_newline = (t.lineno, self._chunk_base + t.lexpos)
+        # No fim do texto não há próxima linha: os blocos são fechados em _close()
+        if lexer.lexpos < len(lexer.lexdata):
+            error = self.indentation.line(text[text.rfind('\n') + 1:], t.lineno, t.lexpos)
+            if error:
+                self._report_indent_error(error, lexer.lineno, self._chunk_base + lexer.lexpos)
         return t
 
     # ---------------------------
     # Cria token auxiliar
     # ---------------------------
-    def _make_token(self, base, type_):
+    def _make_token(self, type_, lineno, lexpos, value=None):
         tok = lex.LexToken()
         tok.type = type_
-        tok.value = None
-        tok.lineno = base.lineno
-        tok.lexpos = base.lexpos
+        tok.value = value
+        tok.lineno = lineno
+        tok.lexpos = lexpos
         return tok
 
     # ---------------------------
     # Retorna token (inclui tokens pendentes)
     # ---------------------------
     def token(self):
-        if self.pending:
-            return self.pending.pop(0)
-        return self.lexer.token()
+        """Próximo token do texto passado a input() (None no fim)."""
+        return next(self._tokens, None)
 
     # ---------------------------
     # Erro
     # ---------------------------
     def t_error(self, t):
-        RED = '\033[91m'
-        RESET = '\033[0m'
-        print(f"{RED}Character não reconhecido: {t.value[0]!r}{RESET}")
-        print(f"{RED}  Linha: {t.lineno}{RESET}")
-        print(f"{RED}  Posição: {t.lexpos}{RESET}")
         rest = t.lexer.lexdata[t.lexpos:t.lexpos + 20]
-        print(f"{RED}  Resto da linha: {rest!r}{RESET}")
-        self.error = True
+        self._report_error(t.value[0], t.lineno, self._chunk_base + t.lexpos, rest)
         t.lexer.skip(1)
+
+    def _report_indent_error(self, code, lineno, lexpos):
+        self.error = True
+        self.diagnostics.error('lexer', code, INDENT_ERRORS[code], {}, line=lineno, offset=lexpos,
+                               fields=(('Linha', 'line', False),))
+
+    def _report_error(self, char, lineno, lexpos, rest):
+        self.error = True
+        self.diagnostics.error('lexer', 'illegal-character', "Character não reconhecido: {char!r}",
+                               {'char': char, 'rest': rest},
+                               line=lineno, offset=lexpos, fields=_CHAR_ERROR_FIELDS)
+
+    def text_at(self, lexpos, length=20):
+        """Trecho do texto a partir de lexpos (absoluto), se ainda estiver em memória."""
+        start = lexpos - self._chunk_base
+        if start < 0:
+            return ''
+        return self.lexdata[start:start + length]
+
+    @property
+    def lexdata(self):
+        """Texto sendo analisado (usado pelo parser ao reportar erros)."""
+        # O PLY lê todos os atributos no lex.lex(), antes de self.lexer existir
+        lexer = getattr(self, 'lexer', None)
+        return lexer.lexdata if lexer is not None else ''
+
+
+
+def _ends_open(text):
+    """True se a última linha do texto tem código e não termina em '\n'."""
+    return not BLANK_LINE_RE.match(text, text.rfind('\n') + 1)
+
+
+# ---------------------------
+# Token leve usado pelo backend rápido
+# ---------------------------
+class Token:
+    __slots__ = ('type', 'value', 'lineno', 'lexpos', 'lexer')
+
+    def __init__(self, type_, value, lineno, lexpos):
+        self.type = type_
+        self.value = value
+        self.lineno = lineno
+        self.lexpos = lexpos
+
+    def __repr__(self):
+        return f"LexToken({self.type},{self.value!r},{self.lineno},{self.lexpos})"
+
+
+# ---------------------------
+# Backend rápido: uma única regex mestre
+# ---------------------------
+# Cada casamento consome os espaços/comentário à esquerda e um token. As
+# alternativas não se sobrepõem no primeiro caractere (exceto comparadores,
+# já ordenados do mais longo para o mais curto, e '=' vs '=='), então a
+# ordem equivale à prioridade das regras do PythonLikeLexer; o grupo ERROR
+# pega qualquer caractere restante e o finditer percorre o texto sem lacunas.
+_MASTER_RE = re.compile(r"""
+    [\ \t\f]*(?:\#.*)?
+    (?:
+        (?P<NAME>[A-Za-z_][A-Za-z0-9_]*)
+      | (?P<NUMBER>\d+)
+      | (?P<STRING>\".*?\"|\'.*?\')
+      | (?P<NEWLINE>""" + NEWLINE_PATTERN + r""")
+      | (?P<OP><=|>=|==|!=|<|>)
+      | (?P<LITERAL>[+\-*/=():,.])
+      | (?P<ERROR>.)
+      | $
+    )
+""", re.VERBOSE)
+
+# Tipo do token para cada comparador
+_OPERATOR_TYPES = {'<=': 'LE', '>=': 'GE', '==': 'EQ', '!=': 'NE', '<': 'LT', '>': 'GT'}
+
+
+class FastLexer(PythonLikeLexer):
+    """Scanner de passada única, com a mesma sequência de tokens do PythonLikeLexer.
+
+    Não constrói o lexer do PLY: usa _MASTER_RE e um dicionário para as
+    palavras-chave. A interface (input/token/reset/tokenize_stream/error) é a
+    mesma, então pode ser usado no lugar do PythonLikeLexer inclusive pelo parser.
+    """
+
+    keyword_types = {kw: kw.upper() for kw in PythonLikeLexer.keywords}
+    lexdata = ''  # atributo simples aqui (no PythonLikeLexer é property)
+
+    def __init__(self, diagnostics=None):
+        self.indentation = IndentationTracker(self._make_token)
+        self._init_diagnostics(diagnostics)
+        self.reset()
+
+    def reset(self):
+        self.indentation.reset()
+        self.error = False
+        self.lineno = 1
+        self._chunk_base = 0
+        self._open_line = False
+        self._last_newline = (1, 0)
+        if self._owns_diagnostics:
+            self.diagnostics.clear()
+        self._tokens = iter(())
+
+    def input(self, data):
+        self.reset()
+        self.lexdata = data
+        self._open_line = _ends_open(data)
+        self._tokens = itertools.chain(self._scan(data, 0), self._close())
+
+    def tokenize_segment(self, text, base=0, lineno=1):
+        self.reset()
+        self.lineno = lineno
+        yield from self._tokenize_chunk(text, base)
+        yield from self._close()
+
+    def _tokenize_chunk(self, chunk, base):
+        self.lexdata = chunk
+        self._chunk_base = base
+        self._open_line = _ends_open(chunk)
+        return self._scan(chunk, base)
+
+    def _lineno(self):
+        return self.lineno
+
+    def _make_token(self, type_, lineno, lexpos, value=None):
+        return Token(type_, value, lineno, lexpos)
+
+    def _scan(self, data, base):
+        keyword_types = self.keyword_types
+        operator_types = _OPERATOR_TYPES
+        indentation = self.indentation
+        pending = indentation.pending
+        size = len(data)
+        lineno = self.lineno
+        for m in _MASTER_RE.finditer(data):
+            kind = m.lastgroup
+            if kind == 'NAME':
+                value = m.group(kind)
+                yield Token(keyword_types.get(value, 'NAME'), value, lineno, base + m.start(kind))
+            elif kind == 'LITERAL':
+                value = m.group(kind)
+                yield Token(value, value, lineno, base + m.start(kind))
+            elif kind == 'NEWLINE':
+                pos = m.start(kind)
+                text = m.group(kind)
+                self.lineno = lineno + text.count('\n')
+                self._last_newline = (lineno, base + pos)
+                yield Token('NEWLINE', '\n', lineno, base + pos)
+
+                # Indentação da próxima linha (no fim do texto, _close() fecha os blocos)
+                if m.end() < size:
+                    error = indentation.line(text[text.rfind('\n') + 1:], lineno, base + pos)
+                    if error:
+                        self._report_indent_error(error, self.lineno, base + m.end())
+                    while pending:
+                        yield pending.popleft()
+                lineno = self.lineno
+            elif kind == 'NUMBER':
+                yield Token('NUMBER', int(m.group(kind)), lineno, base + m.start(kind))
+            elif kind == 'OP':
+                value = m.group(kind)
+                yield Token(operator_types[value], value, lineno, base + m.start(kind))
+            elif kind == 'STRING':
+                yield Token('STRING', m.group(kind), lineno, base + m.start(kind))
+            elif kind == 'ERROR':
+                pos = m.start(kind)
+                self._report_error(m.group(kind), lineno, base + pos, data[pos:pos + 20])
+            # kind None: só espaços/comentário até o fim do texto
+
+
+# Backends de lexer disponíveis (selecionáveis no parser e no CLI)
+LEXER_BACKENDS = {
+    'ply': PythonLikeLexer,
+    'fast': FastLexer,
+}
+
+
+def create_lexer(backend='ply', diagnostics=None):
+    """Cria o lexer do backend escolhido ('ply' ou 'fast')."""
+    try:
+        lexer_class = LEXER_BACKENDS[backend]
+    except KeyError:
+        raise ValueError(f"Backend de lexer desconhecido: {backend!r}") from None
+    return lexer_class(diagnostics)
@@ -0,0 +1,305 @@
+# optimizer.py
+# Passo opcional de otimização da AST, entre o parser e a análise semântica.
+#
+#   - dobra de constantes: binop/unop sobre literais viram um literal, usando as
+#     mesmas regras de tipos do SemanticAnalyzer.resolve_binop_type (operações
+#     inválidas ficam como estão, para a análise semântica reportar o erro);
+#   - simplificação algébrica: e + 0, e - 0, e * 1, e and True, e or False,
+#     not not e -> e, só quando e é feita de literais e operações válidas sobre
+#     eles (tipo garantido e nenhum erro de tipo que a simplificação esconderia);
+#   - remoção de ramos mortos: if/if_else com condição literal e while False.
+#
+# O código dentro de um ramo removido não passa mais pela análise semântica.
+# Cada mudança é registrada no coletor de diagnósticos (estágio 'optimizer',
+# severidade info) e contada em ASTOptimizer.stats.
+#
+# Com shared=True (AST como DAG, PythonLikeParser com share_expressions=True)
+# cada expressão compartilhada é otimizada uma vez; as outras ocorrências
+# reusam o resultado e repetem os registros na própria posição. As posições
+# das expressões vêm do percurso (parser_ast.child_lexpos), nos dois modos.
+import operator
+from types import GeneratorType
+
+from diagnostics import Diagnostics, ERROR
+from parser_ast import ASTNode, child_lexpos
+from semantic_analyzer import SemanticAnalyzer
+from visitor import NodeVisitor, dispatch_table
+
+_LITERAL_TYPES = {'number': 'number', 'string': 'string', 'boolean': 'boolean'}
+
+_FOLD_FUNCTIONS = {
+    '+': operator.add, '-': operator.sub, '*': operator.mul, '/': operator.truediv,
+    '<': operator.lt, '>': operator.gt, '<=': operator.le, '>=': operator.ge,
+    '==': operator.eq, '!=': operator.ne,
+    'and': lambda a, b: a and b, 'or': lambda a, b: a or b,
+}
+
+# Elemento neutro de cada lado: (operador, lado do literal, valor) -> fica o outro lado
+_IDENTITIES = {
+    ('+', 'right', 0): 'number', ('+', 'left', 0): 'number',
+    ('-', 'right', 0): 'number',
+    ('*', 'right', 1): 'number', ('*', 'left', 1): 'number',
+    ('and', 'right', True): 'boolean', ('and', 'left', True): 'boolean',
+    ('or', 'right', False): 'boolean', ('or', 'left', False): 'boolean',
+}
+
+_STATEMENT_TYPES = frozenset(('assign', 'print', 'if', 'if_else', 'while'))
+
+
+class ASTOptimizer:
+    """Otimiza uma AST no lugar; optimize() devolve a raiz (possivelmente nova)."""
+
+    def __init__(self, diagnostics=None, shared=False):
+        # Sem coletor explícito as mudanças só ficam em stats
+        self.diagnostics = diagnostics if diagnostics is not None else Diagnostics(level=ERROR)
+        # Usado só pelas regras de tipos; os erros dele são descartados
+        self._types = SemanticAnalyzer(Diagnostics(level=ERROR))
+        self.shared = shared
+        handlers = dispatch_table(self, '_opt_')
+        default = self._opt_other
+        if shared:
+            for type_ in ('binop', 'unop'):
+                handlers[type_] = self._memoized(handlers[type_])
+            default = self._memoized(default)
+        self._visitor = NodeVisitor(handlers, default)
+        self.reset()
+
+    def reset(self):
+        self.stats = {'constant-folded': 0, 'algebraic-simplified': 0, 'dead-branch-removed': 0}
+        self._checked = {}      # id do nó -> tipo, para expressões sem erro de tipo (ver _checked_type)
+        # Ocorrência da expressão em análise: linha do statement e posição do
+        # pai do nó atual (ver parser_ast.child_lexpos)
+        self._line = None
+        self._parent_lexpos = None
+        # Estado do modo shared
+        self._optimized = {}    # id do nó -> (resultado, registros da subárvore)
+        self._log = []          # registros do statement atual: (code, template, args, posição)
+
+    def optimize(self, root):
+        self.reset()
+        if root is None:
+            return None
+        return self._visitor.visit(root)
+
+    def _report(self, code, template, args, node):
+        """Registra uma mudança no statement node ou, para expressões, na ocorrência em análise."""
+        if node.type in _STATEMENT_TYPES:
+            self.stats[code] += 1
+            self.diagnostics.info('optimizer', code, template, args, line=node.lineno, offset=node.lexpos)
+        else:
+            self._expression_report(code, template, args, child_lexpos(node, self._parent_lexpos))
+
+    def _expression_report(self, code, template, args, offset):
+        self.stats[code] += 1
+        if self.shared:
+            self._log.append((code, template, args, offset))
+        self.diagnostics.info('optimizer', code, template, args, line=self._line, offset=offset)
+
+    def _enter_statement(self, node):
+        """Statement node: as expressões dele são filhas dele, na linha dele."""
+        self._line = node.lineno
+        self._parent_lexpos = node.lexpos
+        self._log.clear()
+
+    def _hoist(self, node, child):
+        """child sobe para o lugar de node (e + 0 -> e, not not e -> e).
+
+        Um nó compartilhado guarda a posição em relação ao pai: sobe uma cópia
+        com o deslocamento em relação ao pai de node.
+        """
+        lexpos = child_lexpos(child, node.lexpos)
+        if lexpos == child.lexpos:
+            return child  # posição absoluta (sem share_expressions) ou nenhuma
+        moved = ASTNode(child.type, child.value)
+        moved.children = child.children
+        moved.lexpos = lexpos
+        if child.id in self._checked:
+            self._checked[moved.id] = self._checked[child.id]
+        return moved
+
+    # ---------------------------
+    # AST como DAG (shared=True)
+    # ---------------------------
+    def _memoized(self, handler):
+        """Handler de expressão que otimiza cada nó uma vez e repete os registros nas outras ocorrências.
+
+        As posições dos registros ficam relativas à do nó.
+        """
+        def visit(node):
+            lexpos = child_lexpos(node, self._parent_lexpos)
+            entry = self._optimized.get(node.id)
+            if entry is not None:
+                result, reports = entry
+                for code, template, args, offset in reports:
+                    self._expression_report(code, template, args, lexpos + offset)
+                return result
+            start = len(self._log)
+            result = handler(node)
+            if type(result) is GeneratorType:
+                result = yield from result
+            self._optimized[node.id] = (result, tuple((code, template, args, offset - lexpos)
+                                                      for code, template, args, offset in self._log[start:]))
+            return result
+        return visit
+
+    # ---------------------------
+    # Statements
+    # ---------------------------
+    # Os handlers de statements devolvem o nó, None (removido) ou uma lista de
+    # nós que entram no lugar dele (conteúdo de um ramo que sempre executa).
+    def _opt_program(self, node):
+        children = []
+        for child in node.children:
+            result = yield child
+            if isinstance(result, list):
+                children.extend(result)
+            elif result is not None:
+                children.append(result)
+        node.children = children
+        return node
+
+    _opt_block = _opt_program
+
+    def _opt_assign(self, node):
+        self._enter_statement(node)
+        node.children[1] = yield node.children[1]
+        return node
+
+    def _opt_print(self, node):
+        self._enter_statement(node)
+        if node.children:
+            node.children[0] = yield node.children[0]
+        return node
+
+    def _opt_if(self, node):
+        self._enter_statement(node)
+        cond = yield node.children[0]
+        node.children[0] = cond
+        if cond.type != 'boolean':
+            for i in range(1, len(node.children)):
+                node.children[i] = yield node.children[i]
+            return node
+
+        # Condição constante: só o ramo escolhido sobrevive
+        if cond.value:
+            taken = node.children[1]
+        elif node.type == 'if_else':
+            taken = node.children[2]
+        else:
+            taken = None
+        self._report('dead-branch-removed',
+                     "Otimização: ramo morto removido em '{statement}' (condição sempre {value})",
+                     {'statement': node.type, 'value': cond.value}, node)
+        if taken is None:
+            return None
+        block = yield taken
+        return list(block.children)
+
+    _opt_if_else = _opt_if
+
+    def _opt_while(self, node):
+        self._enter_statement(node)
+        cond = yield node.children[0]
+        node.children[0] = cond
+        if cond.type == 'boolean' and not cond.value:
+            self._report('dead-branch-removed',
+                         "Otimização: ramo morto removido em '{statement}' (condição sempre {value})",
+                         {'statement': node.type, 'value': False}, node)
+            return None
+        node.children[1] = yield node.children[1]
+        return node
+
+    # ---------------------------
+    # Expressões
+    # ---------------------------
+    def _opt_binop(self, node):
+        parent_lexpos = self._parent_lexpos
+        self._parent_lexpos = child_lexpos(node, parent_lexpos)
+        left = yield node.children[0]
+        right = yield node.children[1]
+        self._parent_lexpos = parent_lexpos
+        node.children[0] = left
+        node.children[1] = right
+        op = node.value
+
+        if left.type in _LITERAL_TYPES and right.type in _LITERAL_TYPES:
+            folded = self._fold_binop(node, left, right)
+            if folded is not None:
+                return folded
+
+        for side, literal, other in (('right', right, left), ('left', left, right)):
+            if literal.type not in _LITERAL_TYPES:
+                continue
+            # True == 1 em Python: o tipo do literal também precisa bater
+            kind = _IDENTITIES.get((op, side, literal.value))
+            if kind is not None and _LITERAL_TYPES[literal.type] == kind and self._checked_type(other) == kind:
+                self._report('algebraic-simplified',
+                             "Otimização: operação '{operator}' com elemento neutro {value!r} removida",
+                             {'operator': op, 'value': literal.value}, node)
+                return self._hoist(node, other)
+
+        left_type, right_type = self._checked_type(left), self._checked_type(right)
+        if left_type is not None and right_type is not None:
+            result_type = self._types.resolve_binop_type(left_type, right_type, op)
+            if result_type in (None, 'unknown'):
+                self._types.diagnostics.clear()
+            else:
+                self._checked[node.id] = result_type
+        return node
+
+    def _checked_type(self, node):
+        """Tipo da expressão quando nem ela nem as subexpressões têm erro de tipo, ou None.
+
+        Variáveis não têm tipo conhecido antes da análise semântica; uma operação
+        só entra em _checked quando os dois operandos também estão lá.
+        """
+        if node.type in _LITERAL_TYPES:
+            return _LITERAL_TYPES[node.type]
+        return self._checked.get(node.id)
+
+    def _fold_binop(self, node, left, right):
+        op = node.value
+        result_type = self._types.resolve_binop_type(_LITERAL_TYPES[left.type],
+                                                     _LITERAL_TYPES[right.type], op)
+        if result_type in (None, 'unknown'):
+            self._types.diagnostics.clear()
+            return None
+        try:
+            value = _FOLD_FUNCTIONS[op](left.value, right.value)
+        except (ZeroDivisionError, KeyError):
+            return None  # divisão por zero fica para a execução
+        return self._literal(result_type, value, node)
+
+    def _opt_unop(self, node):
+        parent_lexpos = self._parent_lexpos
+        self._parent_lexpos = child_lexpos(node, parent_lexpos)
+        operand = yield node.children[0]
+        self._parent_lexpos = parent_lexpos
+        node.children[0] = operand
+        if node.value != 'not':
+            return node
+        if operand.type == 'boolean':
+            return self._literal('boolean', not operand.value, node)
+        if self._checked_type(operand) != 'boolean':
+            return node
+        if operand.type == 'unop' and operand.value == 'not':
+            self._report('algebraic-simplified', "Otimização: dupla negação removida", {}, node)
+            return self._hoist(node, self._hoist(operand, operand.children[0]))
+        self._checked[node.id] = 'boolean'
+        return node
+
+    def _literal(self, type_, value, node):
+        literal = ASTNode(type_, value)
+        literal.lineno = node.lineno
+        literal.lexpos = node.lexpos
+        self._report('constant-folded', "Otimização: expressão constante '{operator}' dobrada para {value!r}",
+                     {'operator': node.value, 'value': value}, node)
+        return literal
+
+    def _opt_other(self, node):
+        return node
+
+
+def optimize_ast(root, diagnostics=None):
+    """Atalho: otimiza a AST com um ASTOptimizer novo e devolve a raiz."""
+    return ASTOptimizer(diagnostics).optimize(root)
@@ -1,27 +1,67 @@
 # parser_ast.py
-from ply import yacc
-from mylexer import PythonLikeLexer
-import uuid
+import itertools
+import os
+
+from ply import lex, yacc
+from mylexer import PythonLikeLexer, DEFAULT_CHUNK_SIZE, create_lexer
+from table_cache import cache_dir, definitions_hash, staging_dir
+from diagnostics import Diagnostics
 
 # ---------------------------
 # NÓS DA AST
 # ---------------------------
+# Ids inteiros sequenciais (únicos no processo), usados como nome do nó no DOT
+_next_node_id = itertools.count(1).__next__
+
+
 class ASTNode:
+    # __slots__ evita um __dict__ por nó (a maior parte da AST são folhas)
+    __slots__ = ('id', 'type', 'value', 'error', 'children', 'lineno', 'lexpos')
+
     def __init__(self, type_, value=None):
-        self.id = str(uuid.uuid4())
+        self.id = _next_node_id()
         self.type = type_
         self.value = value
         self.error = False  # indica erro do parser
-        self.children = []
+        self.children = []  # lista também nas folhas: children.append() funciona em qualquer nó
+        self.lineno = None  # posição no fonte (usada nos diagnósticos)
+        self.lexpos = None
+
+    def at(self, p, index):
+        """Copia linha/posição do símbolo p[index] da produção."""
+        self.lineno = p.lineno(index)
+        self.lexpos = p.lexpos(index)
+        return self
 
     def add(self, node):
         if node is not None:
             self.children.append(node)
         return self
 
+    def extend(self, nodes):
+        for node in nodes:
+            self.add(node)
+        return self
+
+    def __repr__(self):
+        return f"ASTNode({self.type!r}, {self.value!r}, id={self.id})"
+
 # ---------------------------
 # Parser
 # ---------------------------
+# Tokens sem texto próprio (o nó de erro guarda o tipo)
+_LAYOUT_TOKENS = ('NEWLINE', 'INDENT', 'DEDENT')
+
+# Linhas extras exibidas no terminal para um token inesperado
+_TOKEN_ERROR_FIELDS = (
+    ('Tipo', 'type', False),
+    ('Valor', 'value', True),
+    ('Linha', 'line', False),
+    ('Posição', 'offset', False),
+    ('Resto da linha', 'rest', True),
+)
+
+
 class PythonLikeParser:
     tokens = PythonLikeLexer.tokens + list(PythonLikeLexer.literals)
 
@@ -35,19 +75,79 @@ class PythonLikeParser:
         ('left', '*', '/'),
     )
 
-    def __init__(self):
-        self.lexer = PythonLikeLexer()
-        self.parser = yacc.yacc(module=self)
+    def __init__(self, lexer_backend='ply', diagnostics=None, share_expressions=False):
+        # Sem coletor explícito, imprime as mensagens assim que ocorrem (como antes)
+        self._owns_diagnostics = diagnostics is None
+        self.diagnostics = diagnostics if diagnostics is not None else Diagnostics(echo=True)
+        # 'ply' (PythonLikeLexer) ou 'fast' (FastLexer); ambos geram os mesmos tokens
+        self.lexer = create_lexer(lexer_backend, self.diagnostics)
+        self.parser = self._build_parser()
         self.error = False  # indica se houve erro no parser
+        self._last_error_pos = None  # lexpos do último token inesperado relatado
+        self._recovering = False  # entre o p_error e a redução da regra de erro
+        # Hash-consing: expressões iguais (mesmo texto, em qualquer coluna) viram
+        # um único nó e a AST passa a ser um DAG. Um nó compartilhado não guarda
+        # posição: lineno fica None e lexpos é o deslocamento em relação ao pai
+        # (ver _place e child_lexpos).
+        self.share_expressions = share_expressions
+        self._shared = {}  # (tipo, valor, deslocamento, ids dos filhos) -> nó
+        # Modo streaming: recebe cada statement de nível superior (ver parse_statements)
+        self.on_statement = None
+
+    def _build_parser(self):
+        """Carrega as tabelas LALR do cache (ou gera e grava na primeira vez)."""
+        outputdir = cache_dir()
+        if outputdir is None:
+            return yacc.yacc(module=self, debug=False, write_tables=False)
+
+        picklename = f"parsetab_{definitions_hash(type(self), 'p_')}.pickle"
+        picklefile = os.path.join(outputdir, picklename)
+        # optimize=True pula a checagem de assinatura: o hash no nome já garante a versão
+        if os.path.isfile(picklefile):
+            try:
+                return yacc.yacc(module=self, debug=False, optimize=True, picklefile=picklefile)
+            except Exception:
+                pass  # tabela corrompida (ex.: pickle truncado): gera de novo abaixo
+        # Sem o pickle no diretório temporário, o PLY gera as tabelas e grava lá
+        with staging_dir(outputdir) as staging:
+            return yacc.yacc(module=self, debug=False, optimize=True,
+                             picklefile=os.path.join(staging, picklename))
+
+    def reset(self):
+        """Limpa o estado de erro do parser e do lexer entre uma análise e outra."""
+        self.error = False
+        self._last_error_pos = None
+        self._recovering = False
+        if self._owns_diagnostics:
+            self.diagnostics.clear()
+        self.lexer.reset()
+        self._shared = {}
 
     # -----------------------
     # Programa e statements
     # -----------------------
     def p_program(self, p):
-        """program : statements"""
-        p[0] = ASTNode('program')
-        for stmt in p[1]:
-            p[0].add(stmt)
+        """program : top_statements"""
+        p[0] = ASTNode('program').extend(p[1])
+
+    # Os statements de nível superior têm regra própria para que, no modo
+    # streaming (parse_statements), cada um seja entregue assim que termina
+    def p_top_statements_multiple(self, p):
+        """top_statements : top_statements statement"""
+        p[0] = self._top_statement(p[1], p[2])
+
+    def p_top_statements_single(self, p):
+        """top_statements : statement"""
+        p[0] = self._top_statement([], p[1])
+
+    def _top_statement(self, statements, node):
+        if self.on_statement is None:
+            statements.append(node)
+        elif node is not None:
+            self.on_statement(node)
+            # Nenhum nó ainda na pilha do PLY aponta para os compartilhados
+            self._shared.clear()
+        return statements
 
     def p_statements_multiple(self, p):
         """statements : statements statement"""
@@ -63,86 +163,105 @@ class PythonLikeParser:
     # -----------------------
     def p_statement_assign(self, p):
         """statement : NAME '=' expression opt_newline"""
-        node = ASTNode('assign')
-        node.add(ASTNode('var', p[1]))
-        node.add(p[3])
+        if self._partial(p[4]):
+            return
+        node = ASTNode('assign').at(p, 1)
+        node.add(ASTNode('var', p[1]).at(p, 1))
+        node.add(self._place(p[3], node))
         p[0] = node
 
     def p_statement_print(self, p):
         """statement : PRINT '(' expression ')' opt_newline"""
-        node = ASTNode('print')
-        node.add(p[3])
+        if self._partial(p[5]):
+            return
+        node = ASTNode('print').at(p, 1)
+        node.add(self._place(p[3], node))
         p[0] = node
 
+    def _partial(self, newline):
+        """Statement reduzido sem NEWLINE durante a recuperação de um erro.
+
+        O 'error' que o PLY põe como lookahead permite reduzir o opt_newline
+        vazio: em 'x = [2, 4]' o 'x = 2' antes da ',' viraria um statement
+        válido. Ele é descartado (vale o nó de erro da linha).
+        """
+        return self._recovering and not newline
+
     def p_statement_if(self, p):
         """statement : IF expression ':' NEWLINE INDENT statements DEDENT"""
-        node = ASTNode('if')
-        node.add(p[2])
-        block = ASTNode('block')
-        for stmt in p[6]:
-            block.add(stmt)
-        node.add(block)
+        node = ASTNode('if').at(p, 1)
+        node.add(self._place(p[2], node))
+        node.add(ASTNode('block').extend(p[6]))
         p[0] = node
 
     def p_statement_if_else(self, p):
         """statement : IF expression ':' NEWLINE INDENT statements DEDENT ELSE ':' NEWLINE INDENT statements DEDENT"""
-        node = ASTNode('if_else')
-        node.add(p[2])
-        if_block = ASTNode('block')
-        for stmt in p[6]:
-            if_block.add(stmt)
-        node.add(if_block)
-        else_block = ASTNode('block')
-        for stmt in p[12]:
-            else_block.add(stmt)
-        node.add(else_block)
+        node = ASTNode('if_else').at(p, 1)
+        node.add(self._place(p[2], node))
+        node.add(ASTNode('block').extend(p[6]))
+        node.add(ASTNode('block').extend(p[12]))
         p[0] = node
 
     def p_statement_while(self, p):
         """statement : WHILE expression ':' NEWLINE INDENT statements DEDENT"""
-        node = ASTNode('while')
-        node.add(p[2])
-        block = ASTNode('block')
-        for stmt in p[6]:
-            block.add(stmt)
-        node.add(block)
+        node = ASTNode('while').at(p, 1)
+        node.add(self._place(p[2], node))
+        node.add(ASTNode('block').extend(p[6]))
         p[0] = node
 
     # -----------------------
     # Expressões
     # -----------------------
+    def _expression(self, p, index, type_, value, *children):
+        """Nó de expressão, com a posição do token; os filhos são colocados em relação a ele."""
+        node = ASTNode(type_, value).at(p, index)
+        for child in children:
+            node.add(self._place(child, node))
+        return node
+
+    def _place(self, node, parent):
+        """Põe a expressão node (ainda com posição absoluta) sob parent.
+
+        Com share_expressions, node passa a guardar o deslocamento em relação a
+        parent e é trocado por um nó igual já criado, se houver: o deslocamento
+        entra na chave, então cada ocorrência tem o mesmo texto.
+        """
+        if not self.share_expressions:
+            return node
+        offset = node.lexpos - parent.lexpos
+        # O tipo fica na chave: True e 1 (ou '1' e 1) não se confundem
+        key = (node.type, node.value, offset, *[child.id for child in node.children])
+        shared = self._shared.get(key)
+        if shared is None:
+            node.lineno = None
+            node.lexpos = offset
+            shared = self._shared[key] = node
+        return shared
+
     def p_expression_binop(self, p):
         """expression : expression '+' expression
                       | expression '-' expression
                       | expression '*' expression
                       | expression '/' expression"""
-        node = ASTNode('binop', p[2])
-        node.add(p[1])
-        node.add(p[3])
-        p[0] = node
+        p[0] = self._expression(p, 2, 'binop', p[2], p[1], p[3])
 
     def p_expression_number(self, p):
         """expression : NUMBER"""
-        p[0] = ASTNode('number', p[1])
-    
-    def p_expression_string(self, p):
-        """expression : STRING"""
-        p[0] = ASTNode('string', p[1])
-
+        p[0] = self._expression(p, 1, 'number', p[1])
 
     def p_expression_boolean(self, p):
         """expression : TRUE
                       | FALSE"""
-        p[0] = ASTNode('boolean', p[1] == 'True')
+        p[0] = self._expression(p, 1, 'boolean', p[1] == 'True')
 
     def p_expression_string(self, p):
         """expression : STRING"""
     # Removendo as aspas ao redor da string
-        p[0] = ASTNode('string', p[1][1:-1])
+        p[0] = self._expression(p, 1, 'string', p[1][1:-1])
 
     def p_expression_name(self, p):
         """expression : NAME"""
-        p[0] = ASTNode('var', p[1])
+        p[0] = self._expression(p, 1, 'var', p[1])
 
     def p_expression_group(self, p):
         """expression : '(' expression ')'"""
@@ -155,24 +274,43 @@ class PythonLikeParser:
                       | expression GE expression
                       | expression EQ expression
                       | expression NE expression"""
-        node = ASTNode('binop', p[2])
-        node.add(p[1])
-        node.add(p[3])
-        p[0] = node
+        p[0] = self._expression(p, 2, 'binop', p[2], p[1], p[3])
 
     def p_expression_logic(self, p):
         """expression : expression AND expression
                       | expression OR expression"""
-        node = ASTNode('binop', p[2])
-        node.add(p[1])
-        node.add(p[3])
-        p[0] = node
+        p[0] = self._expression(p, 2, 'binop', p[2], p[1], p[3])
 
     def p_expression_not(self, p):
         """expression : NOT expression"""
-        node = ASTNode('unop', p[1])
-        node.add(p[2])
-        p[0] = node
+        p[0] = self._expression(p, 1, 'unop', p[1], p[2])
+
+    # -----------------------
+    # Recuperação de erros (modo pânico)
+    # -----------------------
+    # Depois de um erro o PLY descarta tokens até o próximo NEWLINE; o trecho
+    # vira um nó 'error' e o parse continua no statement seguinte. Um bloco
+    # indentado logo depois (cabeçalho de if/while quebrado, 'else' solto,
+    # indentação inesperada) entra como filho do nó de erro, para que seus
+    # statements ainda sejam analisados.
+    def p_statement_error(self, p):
+        """statement : error NEWLINE"""
+        p[0] = self._error_node(p)
+
+    def p_statement_error_block(self, p):
+        """statement : error NEWLINE INDENT statements DEDENT
+                     | error INDENT statements DEDENT"""
+        p[0] = self._error_node(p).add(ASTNode('block').extend(p[len(p) - 2]))
+
+    def _error_node(self, p):
+        tok = p[1]  # token em que o erro foi detectado
+        value = tok.type if tok.type in _LAYOUT_TOKENS else tok.value
+        node = ASTNode('error', value).at(p, 1)
+        node.error = True
+        self._recovering = False
+        # Sem isso o PLY só voltaria a reportar erros depois de 3 tokens aceitos
+        p.parser.errok()
+        return node
 
     def p_statement_newline(self, p):
         """statement : NEWLINE"""
@@ -182,31 +320,119 @@ class PythonLikeParser:
     def p_opt_newline(self, p):
         """opt_newline : NEWLINE
                        | """
-        p[0] = None
-    
+        p[0] = len(p) > 1  # se o NEWLINE estava lá
+
 
     # -----------------------
     # Erro
     # -----------------------
     def p_error(self, p):
-        GREEN = '\033[38;2;8;126;108m'
-        RESET = '\033[0m'
         self.error = True
+        self._recovering = True
 
         if p:
-            print(f"{GREEN}Erro no parser: token não esperado{RESET}")
-            print(f"{GREEN}  Tipo: {p.type}{RESET}")
-            print(f"{GREEN}  Valor: {p.value!r}{RESET}")
-            print(f"{GREEN}  Linha: {p.lineno}{RESET}")
-            print(f"{GREEN}  Posição: {p.lexpos}{RESET}")
-            rest = p.lexer.lexdata[p.lexpos:p.lexpos + 20]
-            print(f"{GREEN}  Resto da linha: {rest!r}{RESET}")
+            # A recuperação pode devolver ao PLY o mesmo token que causou o erro
+            # (ex.: 'else' solto antes de um bloco); ele é relatado uma vez só
+            if p.lexpos == self._last_error_pos:
+                return
+            self._last_error_pos = p.lexpos
+            self.diagnostics.error(
+                'parser', 'unexpected-token', "Erro no parser: token não esperado",
+                {'type': p.type, 'value': p.value, 'rest': self.lexer.text_at(p.lexpos)},
+                line=p.lineno, offset=p.lexpos, fields=_TOKEN_ERROR_FIELDS)
         else:
-            print(f"{GREEN}Erro no parser: final inesperado do arquivo{RESET}")
+            self.diagnostics.error('parser', 'unexpected-eof',
+                                   "Erro no parser: final inesperado do arquivo", {})
 
     # -----------------------
     # Parse
     # -----------------------
     def parse(self, code):
+        """Analisa o código (string) ou, se não for string, uma fonte de streaming.
+
+        Com erros de sintaxe, self.error fica True e o resultado é a AST parcial
+        (com nós 'error' no lugar dos statements quebrados), ou None se não
+        houve como recuperar (ex.: arquivo terminando no meio de um bloco).
+        """
+        if not isinstance(code, str):
+            return self.parse_stream(code)
+        # O mesmo objeto pode ser usado para várias entradas seguidas
+        self.reset()
         # Use o wrapper do lexer para que INDENT/DEDENT sejam emitidos corretamente
-        return self.parser.parse(code, lexer=self.lexer)
+        self.lexer.input(code)
+        return self._parse(iter(self.lexer.token, None))
+
+    def parse_stream(self, source, chunk_size=DEFAULT_CHUNK_SIZE):
+        """Analisa um caminho, arquivo ou mmap sem carregar o texto inteiro na memória."""
+        self.reset()
+        return self._parse(self.lexer.tokenize_stream(source, chunk_size))
+
+    def parse_statements(self, code, on_statement):
+        """Como parse(), mas entrega cada statement de nível superior a on_statement(nó)
+        assim que ele é reconhecido, sem guardá-lo.
+
+        O nó 'program' devolvido fica sem filhos (ou None, como em parse()); a
+        memória usada não cresce com o número de statements.
+        """
+        self.on_statement = on_statement
+        try:
+            return self.parse(code)
+        finally:
+            self.on_statement = None
+
+    def parse_tokens(self, tokens):
+        """Analisa tokens já produzidos (ex.: um TokenBuffer ou um gerador do lexer)."""
+        self.reset()
+        self.lexer.input('')  # não há texto-fonte para os diagnósticos
+        return self._parse(tokens)
+
+    def _parse(self, tokens):
+        tokens = _leading_newline(iter(tokens))
+        return self.parser.parse(lexer=self.lexer, tokenfunc=lambda: next(tokens, None))
+
+
+def prepare_tables(lexer_backend='ply'):
+    """Gera e grava no cache as tabelas do lexer e do parser, se ainda não estiverem lá.
+
+    Chamado antes de subir um pool de processos: só este processo gera as
+    tabelas, e os do pool apenas as carregam.
+    """
+    PythonLikeParser(lexer_backend, Diagnostics())
+
+
+def child_lexpos(child, parent_lexpos):
+    """Posição de child na ocorrência em que o pai está em parent_lexpos.
+
+    Sem share_expressions o nó já guarda a posição absoluta; com ele, um nó de
+    expressão guarda o deslocamento em relação ao pai (e lineno None). Uma
+    expressão fica toda na linha do seu statement. Nós montados à mão podem
+    não ter posição nenhuma.
+    """
+    lexpos = child.lexpos
+    if child.lineno is None and lexpos is not None:
+        return parent_lexpos + lexpos
+    return lexpos
+
+
+def _leading_newline(tokens):
+    """Repassa os tokens precedidos de um NEWLINE (uma linha vazia, ignorada pela gramática).
+
+    Com a pilha do PLY vazia não há recuperação de erro, só descarte de
+    tokens: o NEWLINE inicial dá ao primeiro statement onde se recuperar. O
+    fim da entrada (NEWLINE da última linha e DEDENT dos blocos) vem do lexer.
+    """
+    first = next(tokens, None)
+    if first is None:
+        return
+    yield _synthetic_token('NEWLINE', '\n', first)
+    yield first
+    yield from tokens
+
+
+def _synthetic_token(type_, value, after):
+    tok = lex.LexToken()
+    tok.type = type_
+    tok.value = value
+    tok.lineno = after.lineno
+    tok.lexpos = after.lexpos
+    return tok
@@ -0,0 +1,218 @@
+# pipeline_stats.py
+# Estatísticas de execução do pipeline: tempo de parede e de CPU por etapa,
+# contadores (tokens, nós, símbolos...), pico de memória (tracemalloc) e,
+# opcionalmente, um perfil do cProfile gravado em arquivo.
+#
+# As etapas são marcadas no código com stage('nome') e os contadores com
+# count()/counted(); enquanto nenhum coletor estiver ativo essas chamadas não
+# fazem nada. Para coletar:
+#
+#     stats = PipelineStats(trace_memory=True)
+#     stats.add_hook(lambda event, stage, record: ...)  # 'start' / 'end'
+#     with collecting(stats):
+#         run_full(...)
+#     stats.render()
+import contextlib
+import cProfile
+import json
+import sys
+import time
+import tracemalloc
+
+# Ordem de exibição das etapas conhecidas (as demais vêm depois)
+STAGE_ORDER = ('tables', 'cache', 'lexer', 'parse', 'optimize', 'semantic', 'compile', 'execute',
+               'dot', 'graphviz')
+
+_active = None
+
+
+class PipelineStats:
+    def __init__(self, trace_memory=False, profile_file=None):
+        self.trace_memory = trace_memory
+        self.profile_file = profile_file
+        self.stages = {}    # nome -> {'wall', 'cpu', 'calls', 'peak_kb'}
+        self.counters = {}  # nome -> valor
+        self.hooks = []
+        self.wall = None
+        self.cpu = None
+        self.peak_kb = None
+        self._frames = []   # etapas abertas: [pico das etapas internas]
+        self._max_peak = 0  # maior pico visto antes de algum reset_peak()
+        self._t0 = None
+        self._started_tracing = False
+        self._profiler = None
+
+    def add_hook(self, hook):
+        """Registra hook(event, stage, record), chamado com event 'start' (record None) e 'end'."""
+        self.hooks.append(hook)
+
+    # ---------------------------
+    # Coleta
+    # ---------------------------
+    def start(self):
+        if self.trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracing = True
+        if self.profile_file:
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+        self._t0 = (time.perf_counter(), time.process_time())
+
+    def stop(self):
+        wall0, cpu0 = self._t0
+        self.wall = time.perf_counter() - wall0
+        self.cpu = time.process_time() - cpu0
+        if self._profiler is not None:
+            self._profiler.disable()
+            self._profiler.dump_stats(self.profile_file)
+            self._profiler = None
+        if self.trace_memory and tracemalloc.is_tracing():
+            self.peak_kb = max(self._max_peak, tracemalloc.get_traced_memory()[1]) / 1024
+            if self._started_tracing:
+                tracemalloc.stop()
+                self._started_tracing = False
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        for hook in self.hooks:
+            hook('start', name, None)
+        tracing = self.trace_memory and tracemalloc.is_tracing()
+        if tracing:
+            # O pico de uma etapa interna não pode apagar o da etapa que a contém
+            peak = tracemalloc.get_traced_memory()[1]
+            self._max_peak = max(self._max_peak, peak)
+            if self._frames:
+                self._frames[-1][0] = max(self._frames[-1][0], peak)
+            tracemalloc.reset_peak()
+        self._frames.append([0])
+        wall0 = time.perf_counter()
+        cpu0 = time.process_time()
+        try:
+            yield
+        finally:
+            wall = time.perf_counter() - wall0
+            cpu = time.process_time() - cpu0
+            inner_peak = self._frames.pop()[0]
+            record = self.stages.get(name)
+            if record is None:
+                record = self.stages[name] = {'wall': 0.0, 'cpu': 0.0, 'calls': 0, 'peak_kb': None}
+            record['wall'] += wall
+            record['cpu'] += cpu
+            record['calls'] += 1
+            if tracing:
+                peak = max(inner_peak, tracemalloc.get_traced_memory()[1])
+                self._max_peak = max(self._max_peak, peak)
+                record['peak_kb'] = max(record['peak_kb'] or 0, peak / 1024)
+                if self._frames:
+                    self._frames[-1][0] = max(self._frames[-1][0], peak)
+            for hook in self.hooks:
+                hook('end', name, record)
+
+    def count(self, name, n=1):
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def set(self, name, value):
+        self.counters[name] = value
+
+    def counted(self, name, iterable):
+        """Repassa os itens de iterable contando-os em counters[name]."""
+        n = 0
+        try:
+            for item in iterable:
+                n += 1
+                yield item
+        finally:
+            self.count(name, n)
+
+    # ---------------------------
+    # Saída
+    # ---------------------------
+    def ordered_stages(self):
+        known = [name for name in STAGE_ORDER if name in self.stages]
+        return known + [name for name in self.stages if name not in STAGE_ORDER]
+
+    def to_dict(self):
+        return {
+            'wall': self.wall,
+            'cpu': self.cpu,
+            'peak_kb': self.peak_kb,
+            'stages': {name: dict(self.stages[name]) for name in self.ordered_stages()},
+            'counters': dict(self.counters),
+            'profile': self.profile_file,
+        }
+
+    def to_json(self, indent=None):
+        return json.dumps(self.to_dict(), indent=indent, ensure_ascii=False)
+
+    def save_json(self, filename):
+        with open(filename, "w") as f:
+            f.write(self.to_json(indent=2))
+
+    def render(self, out=None):
+        out = out or sys.stderr
+        memory = self.trace_memory
+        header = f"{'etapa':<10} {'parede (ms)':>12} {'CPU (ms)':>10} {'chamadas':>9}"
+        print("Estatísticas do pipeline", file=out)
+        print("  " + header + (f" {'pico (KiB)':>11}" if memory else ''), file=out)
+        for name in self.ordered_stages():
+            record = self.stages[name]
+            line = (f"{name:<10} {record['wall'] * 1000:12.2f} {record['cpu'] * 1000:10.2f} "
+                    f"{record['calls']:9d}")
+            if memory:
+                peak = record['peak_kb']
+                line += f" {peak:11.0f}" if peak is not None else f" {'-':>11}"
+            print("  " + line, file=out)
+        if self.wall is not None:
+            line = f"{'total':<10} {self.wall * 1000:12.2f} {self.cpu * 1000:10.2f} {'':9}"
+            if memory and self.peak_kb is not None:
+                line += f" {self.peak_kb:11.0f}"
+            print("  " + line, file=out)
+        if self.counters:
+            print("  " + "  ".join(f"{name}: {value}" for name, value in self.counters.items()),
+                  file=out)
+        if self.profile_file:
+            print(f"  Perfil do cProfile gravado em {self.profile_file}", file=out)
+
+
+# ---------------------------
+# Coletor ativo
+# ---------------------------
+@contextlib.contextmanager
+def collecting(stats):
+    """Ativa o coletor durante o bloco (coletores podem ser aninhados)."""
+    global _active
+    previous = _active
+    _active = stats
+    stats.start()
+    try:
+        yield stats
+    finally:
+        stats.stop()
+        _active = previous
+
+
+def active():
+    return _active
+
+
+def stage(name):
+    """Marca uma etapa no coletor ativo (sem coletor, não faz nada)."""
+    if _active is None:
+        return contextlib.nullcontext()
+    return _active.stage(name)
+
+
+def count(name, n=1):
+    if _active is not None:
+        _active.count(name, n)
+
+
+def set_counter(name, value):
+    if _active is not None:
+        _active.set(name, value)
+
+
+def counted(name, iterable):
+    if _active is None:
+        return iterable
+    return _active.counted(name, iterable)
@@ -0,0 +1,166 @@
+# program_generator.py
+# Gerador de programas válidos (sintaxe e tipos) para benchmarks.
+#
+# O gerador é determinístico para uma semente e escala em quatro eixos:
+#   statements  - número de statements no nível superior (tamanho do programa)
+#   depth       - aninhamento máximo de if/if_else/while
+#   expr_size   - número de folhas de cada expressão
+#   identifiers - quantidade de nomes de variáveis distintos
+# Toda variável é atribuída antes de ser lida e mantém o mesmo tipo, então o
+# SemanticAnalyzer não reporta erros nos programas gerados.
+#
+# Com loop_limit o programa também pode ser executado (--exec, vm.py) sem erros
+# e em tempo limitado:
+#   - todas as variáveis recebem um valor inicial logo no começo;
+#   - cada while ganha um contador próprio (w0, w1, ...) e roda no máximo
+#     loop_limit vezes a cada entrada;
+#   - atribuições numéricas terminam em '/ literal' e '*' e '/' têm um literal
+#     à direita: as variáveis guardam float (no máximo viram inf/nan), nunca
+#     há divisão por zero nem inteiros crescendo sem limite;
+#   - atribuições de string usam só literais, então as strings não crescem.
+import random
+
+_TYPES = ('number', 'string', 'boolean')
+_ARITHMETIC = ('+', '-', '*', '/')
+_COMPARISON = ('<', '>', '<=', '>=', '==', '!=')
+
+
+class ProgramGenerator:
+    def __init__(self, statements=100, depth=2, expr_size=4, identifiers=20, seed=0,
+                 loop_limit=None):
+        self.statements = statements
+        self.depth = depth
+        self.expr_size = max(1, expr_size)
+        self.identifiers = max(1, identifiers)
+        self.loop_limit = loop_limit
+        self.rng = random.Random(seed)
+        # Cada nome tem um tipo fixo (v0 número, v1 string, v2 booleano, ...)
+        self.names = [f"v{i}" for i in range(self.identifiers)]
+        self.declared = {t: [] for t in _TYPES}
+        self._is_declared = set()
+        self._loops = 0
+        self._literals_only = False
+
+    def generate(self):
+        lines = []
+        if self.loop_limit is not None:
+            self._initialize(lines)
+        for _ in range(self.statements):
+            self._statement(lines, 0)
+        return '\n'.join(lines) + '\n'
+
+    def _initialize(self, lines):
+        """Valor inicial de todas as variáveis (modo executável)."""
+        rng = self.rng
+        for index, name in enumerate(self.names):
+            type_ = _TYPES[index % 3]
+            if type_ == 'number':
+                lines.append(f"{name} = {rng.randint(1, 1000)} / {rng.randint(1, 1000)}")
+            else:
+                lines.append(f"{name} = {self._leaf(type_)}")
+            self._is_declared.add(name)
+            self.declared[type_].append(name)
+
+    # ---------------------------
+    # Statements
+    # ---------------------------
+    def _statement(self, lines, level):
+        rng = self.rng
+        indent = '    ' * level
+        if level < self.depth and rng.random() < 0.3:
+            kind = rng.choice(('if', 'if_else', 'while'))
+            if kind == 'while' and self.loop_limit is not None:
+                self._bounded_while(lines, level)
+                return
+            keyword = 'while' if kind == 'while' else 'if'
+            lines.append(f"{indent}{keyword} {self._expression('boolean', self.expr_size)}:")
+            self._block(lines, level + 1)
+            if kind == 'if_else':
+                lines.append(f"{indent}else:")
+                self._block(lines, level + 1)
+        elif rng.random() < 0.2 and any(self.declared.values()):
+            type_ = rng.choice([t for t in _TYPES if self.declared[t]])
+            lines.append(f"{indent}print({self._expression(type_, self.expr_size)})")
+        else:
+            index = rng.randrange(self.identifiers)
+            name = self.names[index]
+            type_ = _TYPES[index % 3]
+            lines.append(f"{indent}{name} = {self._assigned_value(type_)}")
+            if name not in self._is_declared:
+                self._is_declared.add(name)
+                self.declared[type_].append(name)
+
+    def _block(self, lines, level):
+        for _ in range(self.rng.randint(1, 3)):
+            self._statement(lines, level)
+
+    def _bounded_while(self, lines, level):
+        indent = '    ' * level
+        counter = f"w{self._loops}"
+        self._loops += 1
+        lines.append(f"{indent}{counter} = 0")
+        lines.append(f"{indent}while ({counter} < {self.loop_limit}) and "
+                     f"{self._expression('boolean', self.expr_size)}:")
+        self._block(lines, level + 1)
+        lines.append(f"{indent}    {counter} = {counter} + 1")
+
+    def _assigned_value(self, type_):
+        if self.loop_limit is None:
+            return self._expression(type_, self.expr_size)
+        if type_ == 'number':
+            return f"{self._expression('number', self.expr_size)} / {self.rng.randint(1, 1000)}"
+        if type_ == 'string':
+            self._literals_only = True
+            try:
+                return self._expression('string', self.expr_size)
+            finally:
+                self._literals_only = False
+        return self._expression(type_, self.expr_size)
+
+    # ---------------------------
+    # Expressões
+    # ---------------------------
+    def _expression(self, type_, leaves):
+        """Expressão do tipo pedido com aproximadamente 'leaves' folhas."""
+        if leaves <= 1:
+            return self._leaf(type_)
+        rng = self.rng
+        left = rng.randint(1, leaves - 1)
+        right = leaves - left
+        if type_ == 'number':
+            op = rng.choice(_ARITHMETIC)
+            if self.loop_limit is not None and op in ('*', '/'):
+                # Modo executável: multiplica/divide só por literal (nunca zero)
+                text = f"{self._expression('number', leaves - 1)} {op} {rng.randint(1, 1000)}"
+            else:
+                text = f"{self._expression('number', left)} {op} {self._expression('number', right)}"
+        elif type_ == 'string':
+            text = f"{self._expression('string', left)} + {self._expression('string', right)}"
+        else:
+            choice = rng.random()
+            if choice < 0.5:
+                op = rng.choice(_COMPARISON)
+                text = f"{self._expression('number', left)} {op} {self._expression('number', right)}"
+            elif choice < 0.9:
+                op = rng.choice(('and', 'or'))
+                text = f"{self._expression('boolean', left)} {op} {self._expression('boolean', right)}"
+            else:
+                text = f"not {self._expression('boolean', leaves - 1)}"
+        return f"({text})"
+
+    def _leaf(self, type_):
+        rng = self.rng
+        if self.declared[type_] and not self._literals_only and rng.random() < 0.6:
+            return rng.choice(self.declared[type_])
+        if type_ == 'number':
+            return str(rng.randint(1, 1000))
+        if type_ == 'string':
+            return f'"s{rng.randint(0, 999)}"'
+        return rng.choice(('True', 'False'))
+
+
+def generate_program(statements=100, depth=2, expr_size=4, identifiers=20, seed=0,
+                     loop_limit=None):
+    """Atalho: gera o texto de um programa com as dimensões pedidas."""
+    return ProgramGenerator(statements, depth, expr_size, identifiers, seed,
+                            loop_limit).generate()
@@ -0,0 +1,241 @@
+# result_cache.py
+# Cache em disco dos resultados do pipeline (AST, tabela de símbolos,
+# diagnósticos, DOT e imagens), endereçado pelo conteúdo do arquivo-fonte.
+#
+# A chave é o sha256 dos bytes do fonte junto com um carimbo de versão (hash
+# dos módulos que determinam o resultado), então mudar a gramática ou o
+# analisador invalida todas as entradas. Cada entrada é um arquivo pickle no
+# diretório results/ do cache; o tempo de modificação marca o último uso e,
+# quando o total passa do limite, as entradas usadas há mais tempo são
+# apagadas (LRU).
+import hashlib
+import os
+import pickle
+import tempfile
+
+from diagnostics import ERROR, WARNING, INFO
+from parser_ast import ASTNode
+from table_cache import cache_dir
+
+RESULT_CACHE_VERSION = 3
+
+# Limite padrão do diretório (MB); pode ser trocado por PYTHONLIKE_RESULT_CACHE_MB
+DEFAULT_MAX_MB = 256
+
+# Módulos cujo código determina o conteúdo de uma entrada
+_STAMP_MODULES = ('mylexer.py', 'indentation.py', 'parser_ast.py', 'semantic_analyzer.py',
+                  'symbol_table.py', 'diagnostics.py', 'visitor.py', 'optimizer.py', 'dataflow.py',
+                  'ast_to_dot.py', 'ast_binary.py', 'main.py', 'result_cache.py')
+
+_READ_SIZE = 1 << 20
+
+_stamp = None
+
+
+def pipeline_stamp():
+    """Hash da versão do cache e do código do lexer/parser/analisador/DOT."""
+    global _stamp
+    if _stamp is None:
+        h = hashlib.sha256(f"results-v{RESULT_CACHE_VERSION}".encode('utf-8'))
+        base = os.path.dirname(os.path.abspath(__file__))
+        for name in _STAMP_MODULES:
+            h.update(name.encode('utf-8'))
+            try:
+                with open(os.path.join(base, name), 'rb') as f:
+                    h.update(f.read())
+            except OSError:
+                pass
+        _stamp = h.digest()
+    return _stamp
+
+
+# ---------------------------
+# Conversões para o pickle
+# ---------------------------
+def flatten_ast(root):
+    """AST em pré-ordem como lista de tuplas (sem recursão, ao contrário do pickle)."""
+    records = []
+    stack = [root]
+    while stack:
+        node = stack.pop()
+        records.append((node.type, node.value, node.error, node.lineno, node.lexpos,
+                        len(node.children)))
+        stack.extend(reversed(node.children))
+    return records
+
+
+def rebuild_ast(records):
+    """Refaz os ASTNode a partir da lista gerada por flatten_ast."""
+    root = None
+    pending = []  # [nó, filhos que ainda faltam]
+    for type_, value, error, lineno, lexpos, count in records:
+        node = ASTNode(type_, value)
+        node.error = error
+        node.lineno = lineno
+        node.lexpos = lexpos
+        if pending:
+            top = pending[-1]
+            top[0].add(node)
+            top[1] -= 1
+            if not top[1]:
+                pending.pop()
+        else:
+            root = node
+        if count:
+            pending.append([node, count])
+    return root
+
+
+def dump_diagnostics(records):
+    return [(r.severity, r.stage, r.code, r.template, r.args, r.line, r.offset, r.fields)
+            for r in records]
+
+
+def replay_diagnostics(items, diagnostics):
+    """Reenvia os registros guardados ao coletor (com eco, se ele imprimir)."""
+    for severity, stage, code, template, args, line, offset, fields in items:
+        diagnostics.add(severity, stage, code, template, args, line, offset, fields)
+
+
+def wanted_severities(diagnostics):
+    return tuple(s for s in (ERROR, WARNING, INFO) if diagnostics.wants(s))
+
+
+def new_entry(diagnostics):
+    return {
+        'severities': wanted_severities(diagnostics),
+        'parse_failed': False,     # sem AST nenhuma (nem parcial)
+        'syntax_error': False,     # erros do lexer/parser, com AST parcial
+        'parse_diagnostics': [],
+        'ast': None,               # flatten_ast(...) ou None se o parse falhou
+        'symbol_table': None,      # preenchidos quando o modo --run passa por aqui
+        'semantic_error': False,
+        'semantic_diagnostics': [],
+        'dot': None,
+        'images': {},              # formato ('png', 'svg', 'plain') -> bytes
+    }
+
+
+# ---------------------------
+# Cache
+# ---------------------------
+class ResultCache:
+    """Entradas <chave>.pickle em um diretório, com limite de tamanho (LRU)."""
+
+    def __init__(self, directory, max_bytes=None):
+        if max_bytes is None:
+            max_mb = os.environ.get('PYTHONLIKE_RESULT_CACHE_MB')
+            max_bytes = int(float(max_mb) * 1024 * 1024) if max_mb else DEFAULT_MAX_MB * 1024 * 1024
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.written = 0  # bytes gravados por este processo desde o último prune()
+        self.hits = 0
+        self.misses = 0
+
+    @classmethod
+    def default(cls):
+        """Cache no diretório padrão, ou None se ele não puder ser usado."""
+        base = cache_dir()
+        if base is None:
+            return None
+        directory = os.path.join(base, 'results')
+        try:
+            os.makedirs(directory, exist_ok=True)
+        except OSError:
+            return None
+        return cls(directory)
+
+    def key_for(self, code, variant=''):
+        """Chave do fonte (string, bytes, mmap ou arquivo aberto, que volta ao início).
+
+        variant distingue execuções do mesmo fonte com opções que mudam o resultado.
+        """
+        h = hashlib.sha256(pipeline_stamp())
+        h.update(variant.encode('utf-8') + b'\0')
+        if isinstance(code, str):
+            h.update(code.encode('utf-8'))
+        elif hasattr(code, 'read'):
+            raw = getattr(code, 'buffer', code)  # arquivo texto: lê os bytes por baixo
+            for data in iter(lambda: raw.read(_READ_SIZE), b''):
+                h.update(data)
+            code.seek(0)
+        else:
+            h.update(code)
+        return h.hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + '.pickle')
+
+    def load(self, key, diagnostics):
+        """Entrada da chave, se existir e tiver sido gravada com ao menos o nível pedido."""
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                entry = pickle.load(f)
+        except Exception:
+            # inexistente ou corrompida (ex.: gravação interrompida): será refeita
+            self.misses += 1
+            return None
+        if not set(wanted_severities(diagnostics)) <= set(entry['severities']):
+            self.misses += 1
+            return None
+        try:
+            os.utime(path)  # marca o uso para o LRU
+        except OSError:
+            pass
+        self.hits += 1
+        return entry
+
+    def store(self, key, entry):
+        data = pickle.dumps(entry, protocol=pickle.HIGHEST_PROTOCOL)
+        try:
+            fd, tmp = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp, self._path(key))  # atômico: outro processo nunca lê pela metade
+        except OSError:
+            return
+        self.written += len(data)
+        # Evita varrer o diretório a cada gravação: só quando já escrevemos bastante
+        if self.written > self.max_bytes // 8:
+            self.prune()
+
+    def add_image(self, key, fmt, data):
+        """Acrescenta a uma entrada já gravada uma imagem gerada depois (modo lote)."""
+        try:
+            with open(self._path(key), 'rb') as f:
+                entry = pickle.load(f)
+        except Exception:
+            return
+        entry['images'][fmt] = data
+        self.store(key, entry)
+
+    def prune(self):
+        """Apaga as entradas usadas há mais tempo até o total caber no limite."""
+        self.written = 0
+        entries = []
+        total = 0
+        try:
+            with os.scandir(self.directory) as it:
+                for item in it:
+                    if not item.name.endswith('.pickle'):
+                        continue
+                    try:
+                        st = item.stat()
+                    except OSError:
+                        continue
+                    entries.append((st.st_mtime, st.st_size, item.path))
+                    total += st.st_size
+        except OSError:
+            return
+        if total <= self.max_bytes:
+            return
+        entries.sort()
+        for _, size, path in entries:
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            if total <= self.max_bytes:
+                break
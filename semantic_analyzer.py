@@ -1,29 +1,64 @@
 import json
 
+from dataflow import analyze_dataflow
+from diagnostics import Diagnostics, INFO
+from parser_ast import child_lexpos
+from symbol_table import SymbolTable
+from visitor import NodeVisitor, dispatch_table
+
+# Folhas que entram no pool de literais (tipo do nó -> tipo do literal)
+_LITERAL_NODES = {'number': 'number', 'string': 'string', 'boolean': 'boolean'}
+_EXPRESSION_NODES = frozenset(('binop', 'unop', 'var', *_LITERAL_NODES))
+
+
 class SemanticAnalyzer:
-    RED = "\033[38;2;220;20;60m"  # vermelho visivel para erros
-    RESET = "\033[0m"
-
-    def __init__(self):
-        # A tabela agora é explicativa:
-        # name -> {
-        #   'category': 'variable' | 'operator' | 'builtin-function' | 'literal-value',
-        #   'data_type': 'number' | 'string' | 'operator' | 'builtin' | ...
-        #   'description': texto explicando o símbolo
-        # }
-        self.symbol_table = {}
-
-    def _build_description(self, name, category, data_type):
-        if category == "variable":
-            return f"User-defined variable '{name}' of type {data_type}"
-        elif category == "operator":
-            return f"Operator '{name}' used in expressions"
-        elif category == "builtin-function":
-            return f"Builtin function '{name}'"
-        elif category == "literal-value":
-            return f"Literal value of type {data_type}"
-        else:
-            return f"Symbol '{name}' of category {category}"
+    def __init__(self, diagnostics=None, memoize_types=False, dataflow=False,
+                 record_assignments=False):
+        # Símbolos por nome (category: 'variable' | 'operator' | 'builtin-function')
+        # e literais no pool de constantes; ver symbol_table.SymbolTable
+        self.symbol_table = SymbolTable()
+        self.error = False  # indica se houve erro semantico
+
+        # Sem coletor explícito, imprime as mensagens assim que ocorrem (como antes)
+        self._owns_diagnostics = diagnostics is None
+        self.diagnostics = diagnostics if diagnostics is not None else Diagnostics(echo=True)
+
+        # Percursos iterativos com despacho por tipo de nó (sem recursão)
+        self._type_visitor = NodeVisitor(dispatch_table(self, '_infer_'), self._infer_other)
+        self._statement_visitor = NodeVisitor(dispatch_table(self, '_analyze_'), self._analyze_other)
+
+        # Memoização dos tipos de binop/unop, útil quando a AST é um DAG
+        # (PythonLikeParser com share_expressions=True): cada nó compartilhado é
+        # inferido uma vez e as outras ocorrências só reaplicam seus literais e
+        # reemitem seus erros. Uma entrada vale enquanto as variáveis que ela lê
+        # não mudam de tipo.
+        self.memoize_types = memoize_types
+        self._type_memo = {}     # id do nó -> (tipo, ((variável, versão), ...), {literal: ocorrências}, erros)
+        self._var_versions = {}  # nome -> quantas vezes o tipo do símbolo mudou
+        # Erros da expressão atual: (code, template, args, posição)
+        self._error_log = []
+        # Ocorrência da expressão em análise: linha do statement e posição do
+        # pai do nó atual (os nós não precisam guardar a posição absoluta; ver
+        # parser_ast.child_lexpos)
+        self._line = None
+        self._parent_lexpos = None
+
+        # Análises de fluxo de dados sobre o CFG depois do percurso (ver dataflow.py)
+        self.dataflow = dataflow
+        # Tipo de cada atribuição, usado pelo fluxo de dados e pelo índice de
+        # símbolos (symbol_index.py)
+        self.record_assignments = dataflow or record_assignments
+        self.assign_types = {}  # id do nó assign -> tipo da expressão atribuída
+
+    def reset(self):
+        """Limpa a tabela e o estado de erro para analisar outro programa."""
+        self.symbol_table = SymbolTable()
+        self.error = False
+        self._type_memo = {}
+        self._var_versions = {}
+        self.assign_types = {}
+        if self._owns_diagnostics:
+            self.diagnostics.clear()
 
     def add_to_symbol_table(self, name, data_type=None, category='variable'):
         """Adiciona um símbolo com nomes mais descritivos:
@@ -40,45 +75,79 @@ class SemanticAnalyzer:
         }
         category = category_map.get(category, category)
 
-        if name in self.symbol_table:
-            entry = self.symbol_table[name]
-            if data_type and (entry.get('data_type') in (None, 'unknown')):
-                entry['data_type'] = data_type
-                entry['description'] = self._build_description(name, entry['category'], data_type)
-                print(f"Atualizado: O símbolo '{name}' agora tem tipo '{data_type}'.")
-        else:
-            description = self._build_description(name, category, data_type)
+        if category == 'literal-value':
+            # Literais vão para o pool de constantes; o tipo faz parte da chave
+            if self.symbol_table.add_literal(data_type, name) and self.diagnostics.wants(INFO):
+                self.diagnostics.info('semantic', 'symbol-declared',
+                                      "Declaração: '{name}' adicionado (category={category}, data_type={data_type}).",
+                                      {'name': name, 'category': category, 'data_type': data_type})
+            return
 
-            self.symbol_table[name] = {
-                'category': category,
-                'data_type': data_type,
-                'description': description
-            }
-            print(f"Declaração: '{name}' adicionado (category={category}, data_type={data_type}).")
+        symbol = self.symbol_table.lookup(name)
+        if symbol is not None:
+            if data_type and symbol.data_type in (None, 'unknown'):
+                self.symbol_table.set_type(symbol, data_type)
+                if self.memoize_types:
+                    self._bump_version(name)
+                if self.diagnostics.wants(INFO):
+                    self.diagnostics.info('semantic', 'symbol-updated',
+                                          "Atualizado: O símbolo '{name}' agora tem tipo '{data_type}'.",
+                                          {'name': name, 'data_type': data_type})
+        else:
+            self.symbol_table.define(name, category, data_type)
+            if self.memoize_types:
+                self._bump_version(name)
+            if self.diagnostics.wants(INFO):
+                self.diagnostics.info('semantic', 'symbol-declared',
+                                      "Declaração: '{name}' adicionado (category={category}, data_type={data_type}).",
+                                      {'name': name, 'category': category, 'data_type': data_type})
 
     def lookup_symbol(self, name):
-        return self.symbol_table.get(name)
+        return self.symbol_table.lookup(name)
 
     def get_type(self, name):
-        entry = self.lookup_symbol(name)
-        return entry.get('data_type') if entry else None
-
-    def _print_error(self, message):
-        print(f"{self.RED}{message}{self.RESET}")
+        symbol = self.symbol_table.lookup(name)
+        return symbol.data_type if symbol is not None else None
 
-    def _report_type_error(self, operator, left_type, right_type, detail):
-        self._print_error(f"Erro semantico: {detail} na operacao '{operator}' (tipos: {left_type} e {right_type})")
-
-    def _validate_condition(self, expr_type, context):
+    def _report_error(self, code, template, args, node=None):
+        if node is None:
+            line = offset = None
+        elif node.type in _EXPRESSION_NODES:
+            # Nó de expressão: vale a ocorrência em análise
+            self._expression_error(code, template, args, child_lexpos(node, self._parent_lexpos))
+            return
+        else:
+            line, offset = node.lineno, node.lexpos
+        self.error = True
+        self.diagnostics.error('semantic', code, template, args, line=line, offset=offset)
+
+    def _expression_error(self, code, template, args, offset):
+        self.error = True
+        if self.memoize_types:
+            self._error_log.append((code, template, args, offset))
+        self.diagnostics.error('semantic', code, template, args, line=self._line, offset=offset)
+
+    def _report_type_error(self, operator, left_type, right_type, detail, node=None, code='invalid-operand-types'):
+        # detail é um template: pode usar {operator}, {left_type} e {right_type}
+        self._report_error(code, "Erro semantico: " + detail + " na operacao '{operator}' (tipos: {left_type} e {right_type})",
+                           {'operator': operator, 'left_type': left_type, 'right_type': right_type}, node)
+
+    def _report_undeclared(self, node):
+        self._report_error('undeclared-variable', "Erro semantico: A variavel '{name}' nao foi declarada.",
+                           {'name': node.value}, node)
+
+    def _validate_condition(self, expr_type, context, node=None):
         if expr_type not in ('boolean', 'unknown'):
-            self._print_error(f"Erro semantico: condicao de {context} deve ser booleana, recebeu {expr_type}")
+            self._report_error('non-boolean-condition',
+                               "Erro semantico: condicao de {context} deve ser booleana, recebeu {expr_type}",
+                               {'context': context, 'expr_type': expr_type}, node)
 
-    def resolve_binop_type(self, left_type, right_type, operator):
+    def resolve_binop_type(self, left_type, right_type, operator, node=None):
         """Retorna o tipo resultante de uma operacao binaria ou 'unknown' em caso de erro."""
         numeric_types = {'number', 'int', 'float'}
 
         if left_type in (None, 'unknown') or right_type in (None, 'unknown'):
-            self._report_type_error(operator, left_type, right_type, "tipo desconhecido")
+            self._report_type_error(operator, left_type, right_type, "tipo desconhecido", node, 'unknown-operand-type')
             return 'unknown'
 
         if operator == '+':
@@ -86,133 +155,250 @@ class SemanticAnalyzer:
                 return 'number'
             if left_type == 'string' and right_type == 'string':
                 return 'string'
-            self._report_type_error(operator, left_type, right_type, "soma requer dois numeros ou duas strings")
+            self._report_type_error(operator, left_type, right_type, "soma requer dois numeros ou duas strings", node)
             return 'unknown'
 
         if operator in ('-', '*', '/'):
             if left_type in numeric_types and right_type in numeric_types:
                 return 'number'
-            self._report_type_error(operator, left_type, right_type, f"operador '{operator}' aceita apenas tipos numericos")
+            self._report_type_error(operator, left_type, right_type, "operador '{operator}' aceita apenas tipos numericos", node)
             return 'unknown'
 
         if operator in ('<', '>', '<=', '>='):
             if left_type in numeric_types and right_type in numeric_types:
                 return 'boolean'
-            self._report_type_error(operator, left_type, right_type, f"operador '{operator}' aceita apenas comparacao numerica")
+            self._report_type_error(operator, left_type, right_type, "operador '{operator}' aceita apenas comparacao numerica", node)
             return 'unknown'
 
         if operator in ('==', '!='):
             if (left_type in numeric_types and right_type in numeric_types) or (left_type == right_type):
                 return 'boolean'
-            self._report_type_error(operator, left_type, right_type, "comparacao exige tipos compatíveis")
+            self._report_type_error(operator, left_type, right_type, "comparacao exige tipos compatíveis", node)
             return 'unknown'
 
         if operator in ('and', 'or'):
             if left_type == 'boolean' and right_type == 'boolean':
                 return 'boolean'
-            self._report_type_error(operator, left_type, right_type, "operador logico requer booleanos")
+            self._report_type_error(operator, left_type, right_type, "operador logico requer booleanos", node)
             return 'unknown'
 
-        self._report_type_error(operator, left_type, right_type, f"operador '{operator}' nao possui regra de tipos")
+        self._report_type_error(operator, left_type, right_type, "operador '{operator}' nao possui regra de tipos",
+                                node, 'no-type-rule')
         return 'unknown'
 
-    def infer_type(self, node):
-        if node is None:
-            return None
-
-        if node.type == 'number':
-            self.add_to_symbol_table(node.value, data_type='number', category='literal')
-            return 'number'
-
-        elif node.type == 'boolean':
-            self.add_to_symbol_table(node.value, data_type='boolean', category='literal')
-            return 'boolean'
-
-        elif node.type == 'string':
-            self.add_to_symbol_table(node.value, data_type='string', category='literal')
-            return 'string'
-
-        elif node.type == 'var':
-            var_name = node.value
-            var_type = self.get_type(var_name)
-            if var_type is None:
-                self._print_error(f"Erro semantico: A variavel '{var_name}' nao foi declarada.")
-                return 'unknown'
-            return var_type
-
-        elif node.type == 'binop':
-            left_type = self.infer_type(node.children[0])
-            right_type = self.infer_type(node.children[1])
-            operator = node.value
-
-            self.add_to_symbol_table(operator, data_type='operator', category='operator')
-
-            return self.resolve_binop_type(left_type, right_type, operator)
-
-        elif node.type == 'block':
-            return None
-
-        elif node.type == 'unop':
-            operand_type = self.infer_type(node.children[0])
-            operator = node.value
-            self.add_to_symbol_table(operator, data_type='operator', category='operator')
-            if operator == 'not':
-                if operand_type == 'boolean':
-                    return 'boolean'
-                self._print_error(f"Erro semantico: operador 'not' requer boolean, recebeu {operand_type}")
-                return 'unknown'
-            self._print_error(f"Erro semantico: operador unario '{operator}' nao possui regra de tipos")
+    # ---------------------------
+    # Inferência de tipos (expressões)
+    # ---------------------------
+    # Handlers _infer_<tipo>; binop/unop são geradores que fazem "yield filho"
+    # para receber o tipo do filho (ver visitor.NodeVisitor). Enquanto visitam
+    # os filhos, _parent_lexpos é a posição da própria ocorrência.
+    def _infer_number(self, node):
+        self.add_to_symbol_table(node.value, data_type='number', category='literal')
+        return 'number'
+
+    def _infer_boolean(self, node):
+        self.add_to_symbol_table(node.value, data_type='boolean', category='literal')
+        return 'boolean'
+
+    def _infer_string(self, node):
+        self.add_to_symbol_table(node.value, data_type='string', category='literal')
+        return 'string'
+
+    def _infer_var(self, node):
+        var_name = node.value
+        var_type = self.get_type(var_name)
+        if var_type is None:
+            self._report_undeclared(node)
             return 'unknown'
-
+        return var_type
+
+    def _infer_binop(self, node):
+        parent_lexpos = self._parent_lexpos
+        lexpos = child_lexpos(node, parent_lexpos)
+        if self.memoize_types:
+            cached = self._memo_lookup(node, lexpos)
+            if cached is not None:
+                return cached
+            errors = len(self._error_log)
+        self._parent_lexpos = lexpos
+        left_type = yield node.children[0]
+        right_type = yield node.children[1]
+        self._parent_lexpos = parent_lexpos
+        operator = node.value
+
+        self.add_to_symbol_table(operator, data_type='operator', category='operator')
+
+        result = self.resolve_binop_type(left_type, right_type, operator, node)
+        if self.memoize_types:
+            self._memoize(node, result, errors, lexpos)
+        return result
+
+    def _infer_block(self, node):
+        return None
+
+    def _infer_unop(self, node):
+        parent_lexpos = self._parent_lexpos
+        lexpos = child_lexpos(node, parent_lexpos)
+        if self.memoize_types:
+            cached = self._memo_lookup(node, lexpos)
+            if cached is not None:
+                return cached
+            errors = len(self._error_log)
+        self._parent_lexpos = lexpos
+        operand_type = yield node.children[0]
+        self._parent_lexpos = parent_lexpos
+        result = self._resolve_unop_type(operand_type, node)
+        if self.memoize_types:
+            self._memoize(node, result, errors, lexpos)
+        return result
+
+    def _resolve_unop_type(self, operand_type, node):
+        operator = node.value
+        self.add_to_symbol_table(operator, data_type='operator', category='operator')
+        if operator == 'not':
+            if operand_type == 'boolean':
+                return 'boolean'
+            self._report_error('invalid-operand-types',
+                               "Erro semantico: operador 'not' requer boolean, recebeu {operand_type}",
+                               {'operand_type': operand_type}, node)
+            return 'unknown'
+        self._report_error('no-type-rule', "Erro semantico: operador unario '{operator}' nao possui regra de tipos",
+                           {'operator': operator}, node)
         return 'unknown'
 
-    def analyze(self, node):
-        if node is None:
-            return
-
-        if node.type == 'program':
-            for child in node.children:
-                self.analyze(child)
-
-        elif node.type == 'assign':
-            var_name = node.children[0].value
-            expr_type = self.infer_type(node.children[1])
-            self.add_to_symbol_table(var_name, expr_type, category='var')
-
-        elif node.type == 'print':
-            self.add_to_symbol_table('print', data_type='builtin', category='builtin')
-            if len(node.children) > 0:
-                self.infer_type(node.children[0])
+    def _infer_other(self, node):
+        return 'unknown'
 
-        elif node.type in ('if', 'if_else', 'while'):
-            cond_type = self.infer_type(node.children[0])
-            self._validate_condition(cond_type, node.type)
-            if len(node.children) > 1:
-                self.analyze(node.children[1])
-            if node.type == 'if_else' and len(node.children) > 2:
-                self.analyze(node.children[2])
+    def infer_type(self, node, statement=None):
+        """Tipo da expressão node; statement é o nó em que ela está (posição dos erros)."""
+        if self.memoize_types:
+            self._error_log.clear()
+        if statement is None:
+            self._line, self._parent_lexpos = node.lineno, None
+        else:
+            self._line, self._parent_lexpos = statement.lineno, statement.lexpos
+        return self._type_visitor.visit(node)
+
+    # ---------------------------
+    # Memoização dos tipos (memoize_types=True)
+    # ---------------------------
+    def _bump_version(self, name):
+        self._var_versions[name] = self._var_versions.get(name, 0) + 1
+
+    def _memo_lookup(self, node, lexpos):
+        """Tipo memoizado do nó, se ainda válido; reaplica seus literais e erros (nó em lexpos)."""
+        entry = self._type_memo.get(node.id)
+        if entry is None:
+            return None
+        result, dependencies, literals, errors = entry
+        versions = self._var_versions
+        for name, version in dependencies:
+            if versions.get(name, 0) != version:
+                return None
+        # Operadores e literais já estão na tabela: só as contagens crescem
+        self.symbol_table.literals.apply(literals)
+        for code, template, args, offset in errors:
+            self._expression_error(code, template, args, lexpos + offset)
+        return result
+
+    def _memoize(self, node, result, errors, lexpos):
+        """Guarda o tipo do nó com as variáveis (e versões), os literais e os erros da subárvore.
+
+        errors: tamanho de _error_log antes de inferir os filhos. A posição de
+        cada erro fica relativa à do nó (lexpos), para valer em qualquer ocorrência.
+        """
+        versions = self._var_versions
+        dependencies = {}
+        literals = {}
+        for child in node.children:
+            child_type = child.type
+            if child_type == 'var':
+                dependencies[child.value] = versions.get(child.value, 0)
+            elif child_type in _LITERAL_NODES:
+                key = (_LITERAL_NODES[child_type], child.value)
+                literals[key] = literals.get(key, 0) + 1
+            else:
+                entry = self._type_memo.get(child.id)
+                if entry is None:
+                    continue
+                dependencies.update(entry[1])
+                for key, count in entry[2].items():
+                    literals[key] = literals.get(key, 0) + count
+        self._type_memo[node.id] = (result, tuple(dependencies.items()), literals,
+                                    tuple((code, template, args, offset - lexpos)
+                                          for code, template, args, offset in self._error_log[errors:]))
+
+    # ---------------------------
+    # Análise de statements
+    # ---------------------------
+    def _analyze_program(self, node):
+        for child in node.children:
+            yield child
+
+    _analyze_block = _analyze_program
+    # Statement com erro de sintaxe: só o bloco que o parser recuperou junto é analisado
+    _analyze_error = _analyze_program
+
+    def _analyze_assign(self, node):
+        var_name = node.children[0].value
+        expr_type = self.infer_type(node.children[1], node)
+        if self.record_assignments:
+            self.assign_types[node.id] = expr_type
+        self.add_to_symbol_table(var_name, expr_type, category='var')
+
+    def _analyze_print(self, node):
+        self.add_to_symbol_table('print', data_type='builtin', category='builtin')
+        if len(node.children) > 0:
+            self.infer_type(node.children[0], node)
+
+    def _analyze_if(self, node):
+        cond_type = self.infer_type(node.children[0], node)
+        self._validate_condition(cond_type, node.type, node)
+        if len(node.children) > 1:
+            yield node.children[1]
+        if node.type == 'if_else' and len(node.children) > 2:
+            yield node.children[2]
+
+    _analyze_if_else = _analyze_if
+    _analyze_while = _analyze_if
+
+    def _analyze_binop(self, node):
+        self.infer_type(node)
+
+    def _analyze_var(self, node):
+        var_name = node.value
+        if self.lookup_symbol(var_name) is None:
+            self._line, self._parent_lexpos = node.lineno, None
+            self._report_undeclared(node)
+
+    def _analyze_other(self, node):
+        return None
 
-        elif node.type == 'block':
-            for child in node.children:
-                self.analyze(child)
+    def analyze(self, node):
+        self._statement_visitor.visit(node)
+        if self.dataflow and node is not None:
+            analyze_dataflow(node, self.diagnostics, self.assign_types)
 
-        elif node.type == 'binop':
-            self.infer_type(node)
+    def analyze_statement(self, node):
+        """Analisa um statement de nível superior, mantendo a tabela (modo streaming).
 
-        elif node.type == 'var':
-            var_name = node.value
-            if self.lookup_symbol(var_name) is None:
-                self._print_error(f"Erro semantico: A variavel '{var_name}' nao foi declarada.")
+        Os tipos memoizados só valem para os nós deste statement (o parser não
+        compartilha nós entre statements nesse modo) e são descartados; o fluxo
+        de dados precisa do programa inteiro e não roda aqui.
+        """
+        self._statement_visitor.visit(node)
+        self._type_memo.clear()
 
     def save_symbol_table(self, filename="symbol_table.json"):
         with open(filename, "w") as f:
-            json.dump(self.symbol_table, f, indent=4)
+            # Visão plana no formato antigo; as descrições são montadas aqui
+            json.dump(self.symbol_table.to_dict(), f, indent=4)
             print(f"Tabela de símbolos salva em {filename}")
 
     def load_symbol_table(self, filename="symbol_table.json"):
         try:
             with open(filename, "r") as f:
-                self.symbol_table = json.load(f)
+                self.symbol_table = SymbolTable.from_dict(json.load(f))
                 print(f"Tabela carregada de {filename}")
         except FileNotFoundError:
             print(f"{filename} não encontrado. Criando tabela vazia.")
@@ -0,0 +1,265 @@
+# server.py
+# Modo servidor: um processo de longa duração que mantém o lexer, o parser e o
+# analisador semântico prontos (tabelas carregadas uma vez) e atende pedidos em
+# JSON Lines, pela entrada/saída padrão ou por um socket Unix local.
+#
+# Cada linha é um pedido e recebe exatamente uma linha de resposta:
+#
+#   {"id": 1, "source": "x = 1\n", "outputs": ["tokens", "ast", "symbols"]}
+#   {"id": 2, "path": "testes/exemplo.txt", "outputs": ["diagnostics", "dot"],
+#    "optimize": true, "max_nodes": 500}
+#   {"id": 3, "op": "ping"}        {"op": "shutdown"}
+#
+# Saídas possíveis: tokens, ast, symbols, diagnostics (padrão) e dot. A resposta
+# traz o mesmo "id", "ok" (sem erros no programa), a contagem de diagnósticos
+# por severidade e um campo por saída pedida. Pedidos inválidos recebem
+# {"id": ..., "ok": false, "error": "..."} e o servidor continua atendendo.
+import contextlib
+import json
+import os
+import socket
+import socketserver
+import stat
+import sys
+import threading
+import time
+
+from ast_to_dot import ast_to_dot
+from diagnostics import Diagnostics, ERROR
+from main import parse_and_optimize, analyze
+from mylexer import create_lexer
+from parser_ast import PythonLikeParser
+from semantic_analyzer import SemanticAnalyzer
+
+OUTPUTS = ('tokens', 'ast', 'symbols', 'diagnostics', 'dot')
+DEFAULT_OUTPUTS = ('diagnostics',)
+
+
+class RequestError(Exception):
+    """Pedido malformado (respondido com ok=false, sem derrubar o servidor)."""
+
+
+# ---------------------------
+# Conversões para JSON
+# ---------------------------
+def ast_to_json(root):
+    """AST como dicionários aninhados {type, value, line, pos, children} (sem recursão)."""
+    def convert(node):
+        item = {'type': node.type, 'value': node.value, 'line': node.lineno, 'pos': node.lexpos}
+        if node.error:
+            item['error'] = True
+        return item
+
+    result = convert(root)
+    stack = [(root, result)]
+    while stack:
+        node, item = stack.pop()
+        children = item['children'] = []
+        for child in node.children:
+            child_item = convert(child)
+            children.append(child_item)
+            stack.append((child, child_item))
+    return result
+
+
+def _tokens_to_json(tokens):
+    return [{'type': tok.type, 'value': tok.value, 'lineno': tok.lineno, 'lexpos': tok.lexpos}
+            for tok in tokens]
+
+
+# ---------------------------
+# Serviço
+# ---------------------------
+class AnalysisService:
+    """Atende pedidos (dicionários) reaproveitando as mesmas instâncias a cada chamada.
+
+    Não é seguro para threads: os transportes abaixo serializam as chamadas.
+    """
+
+    def __init__(self, lexer_backend='ply'):
+        self.diagnostics = Diagnostics()
+        self.parser = PythonLikeParser(lexer_backend, self.diagnostics)
+        self.analyzer = SemanticAnalyzer(self.diagnostics)
+        # Lexer à parte para a saída 'tokens': seus erros já aparecem no parse
+        self.token_lexer = create_lexer(lexer_backend, Diagnostics(level=ERROR))
+        self.requests = 0
+
+    def handle(self, request):
+        """Processa um pedido e devolve a resposta (nunca levanta por causa do pedido)."""
+        request_id = request.get('id') if isinstance(request, dict) else None
+        start = time.perf_counter()
+        try:
+            response = self._dispatch(request)
+        except RequestError as e:
+            response = {'ok': False, 'error': str(e)}
+        except Exception as e:  # um bug em um pedido não pode derrubar o servidor
+            response = {'ok': False, 'error': f"{type(e).__name__}: {e}"}
+        self.requests += 1
+        response = dict({'id': request_id}, **response)
+        response['elapsed_ms'] = round((time.perf_counter() - start) * 1000, 3)
+        return response
+
+    def _dispatch(self, request):
+        if not isinstance(request, dict):
+            raise RequestError("O pedido deve ser um objeto JSON")
+        op = request.get('op', 'analyze')
+        if op == 'ping':
+            return {'ok': True, 'requests': self.requests}
+        if op == 'shutdown':
+            return {'ok': True, 'shutdown': True}
+        if op != 'analyze':
+            raise RequestError(f"Operação desconhecida: {op!r}")
+        return self.analyze(request)
+
+    def analyze(self, request):
+        outputs = request.get('outputs', DEFAULT_OUTPUTS)
+        outputs = [outputs] if isinstance(outputs, str) else list(outputs)
+        unknown = [name for name in outputs if name not in OUTPUTS]
+        if unknown:
+            raise RequestError(f"Saída desconhecida: {', '.join(map(str, unknown))}")
+        code = self._source(request)
+
+        self.diagnostics.clear()
+        response = {}
+        if 'tokens' in outputs:
+            self.token_lexer.reset()
+            response['tokens'] = _tokens_to_json(self.token_lexer.tokenize_segment(code))
+
+        if outputs == ['tokens']:
+            failed = self.token_lexer.error
+        else:
+            ast_root = parse_and_optimize(code, self.parser, bool(request.get('optimize')))
+            # Com erros de sintaxe a AST é parcial (nós 'error'); sem AST só há diagnósticos
+            parsed = ast_root is not None
+            failed = not parsed or bool(self.parser.lexer.error or self.parser.error)
+            if parsed and ('symbols' in outputs or 'diagnostics' in outputs):
+                analyze(ast_root, self.analyzer)
+                failed = failed or self.analyzer.error
+            if 'ast' in outputs:
+                response['ast'] = ast_to_json(ast_root) if parsed else None
+            if 'dot' in outputs:
+                response['dot'] = (ast_to_dot(ast_root, request.get('max_nodes'),
+                                              request.get('max_depth')) if parsed else None)
+            if 'symbols' in outputs:
+                response['symbols'] = self.analyzer.symbol_table.to_dict() if parsed else None
+
+        response['ok'] = not failed
+        response['counts'] = self.diagnostics.counts()
+        if 'diagnostics' in outputs:
+            response['diagnostics'] = [r.to_dict() for r in self.diagnostics.records]
+        return response
+
+    @staticmethod
+    def _source(request):
+        if 'source' in request:
+            source = request['source']
+            if not isinstance(source, str):
+                raise RequestError("'source' deve ser texto")
+            return source
+        path = request.get('path')
+        if not isinstance(path, str):
+            raise RequestError("Informe 'source' ou 'path'")
+        try:
+            with open(path, "r") as f:
+                return f.read()
+        except OSError as e:
+            raise RequestError(f"Não foi possível ler {path}: {e.strerror}") from None
+
+
+# ---------------------------
+# Transportes
+# ---------------------------
+def handle_line(service, line):
+    """(resposta em JSON, pedido de shutdown) para uma linha; (None, False) se ela for vazia."""
+    line = line.strip()
+    if not line:
+        return None, False
+    try:
+        request = json.loads(line)
+    except ValueError as e:
+        response = {'id': None, 'ok': False, 'error': f"JSON inválido: {e}"}
+    else:
+        response = service.handle(request)
+    return json.dumps(response, ensure_ascii=False), bool(response.get('shutdown'))
+
+
+def serve_stdio(service, infile=None, outfile=None):
+    """Atende pedidos da entrada padrão até o fim da entrada ou um 'shutdown'."""
+    infile = infile or sys.stdin
+    outfile = outfile or sys.stdout
+    # Só as respostas vão para a saída: qualquer print perdido iria para o stderr
+    with contextlib.redirect_stdout(sys.stderr):
+        for line in infile:
+            text, stop = handle_line(service, line)
+            if text is None:
+                continue
+            outfile.write(text + '\n')
+            outfile.flush()
+            if stop:
+                break
+    return 0
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    def handle(self):
+        server = self.server
+        for raw in self.rfile:
+            with server.lock:
+                text, stop = handle_line(server.service, raw.decode('utf-8', 'replace'))
+            if text is None:
+                continue
+            self.wfile.write(text.encode('utf-8') + b'\n')
+            self.wfile.flush()
+            if stop:
+                # shutdown() espera o serve_forever, então precisa de outra thread
+                threading.Thread(target=server.shutdown, daemon=True).start()
+                return
+
+
+def remove_stale_socket(path):
+    """Apaga o socket deixado em path por uma execução anterior.
+
+    Devolve False (sem apagar nada) se path existe e não é um socket: um
+    caminho errado no --socket não pode apagar um arquivo comum.
+    """
+    try:
+        mode = os.lstat(path).st_mode
+    except FileNotFoundError:
+        return True
+    if not stat.S_ISSOCK(mode):
+        return False
+    os.unlink(path)
+    return True
+
+
+def serve_unix(service, path):
+    """Atende conexões em um socket Unix (uma thread por conexão, pedidos em fila)."""
+    if not hasattr(socket, 'AF_UNIX'):
+        print("Sockets Unix não são suportados nesta plataforma; use a entrada padrão.")
+        return 1
+    if not remove_stale_socket(path):
+        print(f"{path} já existe e não é um socket; escolha outro caminho para o --socket.",
+              file=sys.stderr)
+        return 1
+    server = socketserver.ThreadingUnixStreamServer(path, _Handler)
+    server.daemon_threads = True
+    server.service = service
+    server.lock = threading.Lock()  # o serviço não é seguro para threads
+    print(f"Servidor ouvindo em {path}", file=sys.stderr)
+    try:
+        with contextlib.redirect_stdout(sys.stderr):
+            server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        with contextlib.suppress(OSError):
+            os.unlink(path)
+    return 0
+
+
+def run_server(socket_path=None, lexer_backend='ply'):
+    service = AnalysisService(lexer_backend)
+    if socket_path:
+        return serve_unix(service, socket_path)
+    return serve_stdio(service)
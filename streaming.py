@@ -0,0 +1,123 @@
+# streaming.py
+# Pipeline statement a statement (--stream) para entradas enormes.
+#
+# O parser entrega cada statement de nível superior assim que ele é reconhecido
+# (PythonLikeParser.parse_statements); o statement passa na hora pela análise
+# semântica e pelo DOT e é descartado. A AST inteira nunca existe na memória:
+# o que cresce é só a tabela de símbolos (nomes e literais distintos), não o
+# número de statements.
+#
+# Saídas, escritas à medida que o arquivo é lido:
+#   - DOT: a raiz 'program' e depois a subárvore de cada statement (DotStream);
+#   - deltas da tabela de símbolos em JSON Lines: uma linha por statement que
+#     criou/alterou símbolos ou registrou literais;
+#   - diagnósticos: ecoados no terminal pelo coletor (ou gravados em JSON
+#     Lines) e descartados em seguida.
+# No fim, a tabela completa vai para o symbol_table.json, como no --run.
+#
+# Diferenças em relação ao pipeline normal: o fluxo de dados (--dataflow) e a
+# AST binária (--ast-out) precisam do programa inteiro e não rodam aqui; com
+# -O cada statement é otimizado sozinho, enquanto não houver erro de sintaxe.
+import json
+
+import pipeline_stats
+from ast_to_dot import DotStream, subtree_size
+from optimizer import ASTOptimizer
+from parser_ast import ASTNode
+
+
+class StreamingPipeline:
+    """Liga parser, analisador (opcional) e saídas, um statement por vez.
+
+    dot:             arquivo texto para o DOT (ou None), limitado por max_nodes
+                     e max_depth como no write_dot;
+    deltas:          arquivo texto para os deltas da tabela (ou None);
+    diagnostics_out: arquivo para os diagnósticos em JSON Lines (ou None, quando
+                     o coletor já ecoa no terminal).
+    """
+
+    def __init__(self, parser, semantic_analyzer=None, dot=None, deltas=None,
+                 diagnostics_out=None, max_nodes=None, max_depth=None, optimize=False):
+        self.parser = parser
+        self.semantic_analyzer = semantic_analyzer
+        self.diagnostics = parser.diagnostics
+        self.deltas = deltas
+        self.diagnostics_out = diagnostics_out
+        self.optimizer = ASTOptimizer(parser.diagnostics, parser.share_expressions) if optimize else None
+        self.root = ASTNode('program')  # raiz do DOT (o parser devolve a sua no fim)
+        self.dot = DotStream(dot, self.root, max_nodes, max_depth) if dot is not None else None
+        self.statements = 0
+        self.nodes = 1
+
+    def run(self, code):
+        """Processa a entrada inteira; devolve o nó 'program' (sem filhos) ou None."""
+        analyzer = self.semantic_analyzer
+        if analyzer is not None:
+            analyzer.reset()
+            analyzer.symbol_table.journal = {}
+            analyzer.symbol_table.literals.journal = {}
+        try:
+            with pipeline_stats.stage('parse'):
+                root = self.parser.parse_statements(code, self._statement)
+        finally:
+            if analyzer is not None:
+                analyzer.symbol_table.journal = None
+                analyzer.symbol_table.literals.journal = None
+        self._flush_diagnostics()
+        if self.dot is not None:
+            with pipeline_stats.stage('dot'):
+                self.dot.close()
+        pipeline_stats.set_counter('statements', self.statements)
+        if pipeline_stats.active() is not None:
+            pipeline_stats.set_counter('nodes', self.nodes)
+        return root
+
+    def _statement(self, node):
+        self.statements += 1
+        lineno = node.lineno
+        statements = [node]
+        if self.optimizer is not None and not (self.parser.lexer.error or self.parser.error):
+            with pipeline_stats.stage('optimize'):
+                statements = self.optimizer.optimize(ASTNode('program').extend(statements)).children
+        if pipeline_stats.active() is not None:
+            self.nodes += sum(subtree_size(stmt) for stmt in statements)
+
+        analyzer = self.semantic_analyzer
+        if analyzer is not None:
+            with pipeline_stats.stage('semantic'):
+                for stmt in statements:
+                    analyzer.analyze_statement(stmt)
+            self._write_delta(lineno)
+        if self.dot is not None:
+            with pipeline_stats.stage('dot'):
+                for stmt in statements:
+                    self.dot.add(stmt)
+        self._flush_diagnostics()
+
+    def _write_delta(self, lineno):
+        table = self.semantic_analyzer.symbol_table
+        symbols, literals = table.journal, table.literals.journal
+        if not symbols and not literals:
+            return
+        if self.deltas is not None:
+            delta = {'statement': self.statements, 'line': lineno}
+            if symbols:
+                delta['symbols'] = {name: {'category': s.category, 'data_type': s.data_type}
+                                    for name, s in symbols.items()}
+            if literals:
+                delta['literals'] = [[data_type, value, count]
+                                     for (data_type, value), count in literals.items()]
+            self.deltas.write(json.dumps(delta, ensure_ascii=False) + '\n')
+        table.journal = {}
+        table.literals.journal = {}
+
+    def _flush_diagnostics(self):
+        """Grava (se pedido) e descarta os diagnósticos acumulados até aqui."""
+        records = self.diagnostics.records
+        if not records:
+            return
+        if self.diagnostics_out is not None:
+            write = self.diagnostics_out.write
+            for record in records:
+                write(json.dumps(record.to_dict(), ensure_ascii=False) + '\n')
+        self.diagnostics.clear()
@@ -0,0 +1,412 @@
+# symbol_index.py
+# Índice persistente de símbolos em SQLite, para consultas entre arquivos sem
+# reanalisar nada ("quais arquivos atribuem uma string a x?").
+#
+#   python symbol_index.py index simbolos.db scripts/ -j 8
+#   python symbol_index.py query simbolos.db x --kind assign --type string
+#   python symbol_index.py symbols simbolos.db 'tot*' --category variable
+#
+# - Para cada arquivo o índice guarda a tabela de símbolos final (nome,
+#   categoria, tipo; os literais ficam de fora) e as ocorrências de variáveis:
+#   atribuições (com o tipo da expressão atribuída) e leituras, com linha e
+#   coluna.
+# - A reindexação só reanalisa o que mudou: tamanho e mtime iguais aos gravados
+#   pulam o arquivo sem lê-lo; se mudaram, o sha256 do conteúdo (junto com o
+#   carimbo do lexer/parser/analisador, ver result_cache.pipeline_stamp) decide.
+#   Arquivos que não existem mais saem do índice.
+# - A análise roda em um pool de processos (como no modo lote); o processo
+#   principal grava os resultados em lotes, com executemany e uma transação
+#   por lote.
+import argparse
+import glob
+import hashlib
+import os
+import sqlite3
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from batch import collect_inputs
+from diagnostics import Diagnostics, WARNING
+from mylexer import LEXER_BACKENDS
+from parser_ast import PythonLikeParser, prepare_tables
+from result_cache import pipeline_stamp
+from semantic_analyzer import SemanticAnalyzer
+
+INDEX_VERSION = 1
+
+# Arquivos analisados gravados por transação
+COMMIT_BATCH = 256
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key   TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS files (
+    id             INTEGER PRIMARY KEY,
+    path           TEXT NOT NULL UNIQUE,
+    size           INTEGER NOT NULL,
+    mtime_ns       INTEGER NOT NULL,
+    hash           TEXT NOT NULL,
+    syntax_error   INTEGER NOT NULL,
+    semantic_error INTEGER NOT NULL,
+    indexed_at     REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS symbols (
+    file_id   INTEGER NOT NULL REFERENCES files(id) ON DELETE CASCADE,
+    name      TEXT NOT NULL,
+    category  TEXT NOT NULL,
+    data_type TEXT
+);
+CREATE TABLE IF NOT EXISTS occurrences (
+    file_id   INTEGER NOT NULL REFERENCES files(id) ON DELETE CASCADE,
+    name      TEXT NOT NULL,
+    kind      TEXT NOT NULL,  -- 'assign' ou 'use'
+    data_type TEXT,           -- tipo atribuído (só em 'assign')
+    line      INTEGER,
+    col       INTEGER
+);
+CREATE INDEX IF NOT EXISTS symbols_name ON symbols(name, category, data_type);
+CREATE INDEX IF NOT EXISTS symbols_file ON symbols(file_id);
+CREATE INDEX IF NOT EXISTS occurrences_name ON occurrences(name, kind, data_type);
+CREATE INDEX IF NOT EXISTS occurrences_file ON occurrences(file_id);
+"""
+
+OCCURRENCE_KINDS = ('assign', 'use')
+
+# Estado de cada processo do pool (preenchido pelo initializer)
+_worker = {}
+
+
+# ---------------------------
+# Banco
+# ---------------------------
+class SymbolIndex:
+    """Banco SQLite do índice; use como gerenciador de contexto (ou chame close())."""
+
+    def __init__(self, filename):
+        self.conn = sqlite3.connect(filename)
+        self.conn.execute("PRAGMA foreign_keys = ON")
+        self.conn.execute("PRAGMA journal_mode = WAL")
+        self.conn.execute("PRAGMA synchronous = NORMAL")
+        with self.conn:
+            self.conn.executescript(_SCHEMA)
+            self._check_stamp()
+
+    def _check_stamp(self):
+        """Com outra versão do índice ou do pipeline, todo arquivo precisa ser reanalisado."""
+        stamp = f"{INDEX_VERSION}:{pipeline_stamp().hex()}"
+        row = self.conn.execute("SELECT value FROM meta WHERE key = 'stamp'").fetchone()
+        if row is not None and row[0] == stamp:
+            return
+        self.conn.execute("UPDATE files SET mtime_ns = -1, hash = ''")
+        self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('stamp', ?)", (stamp,))
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # -----------------------
+    # Escrita
+    # -----------------------
+    def known_files(self):
+        """caminho -> (tamanho, mtime_ns, hash) de cada arquivo indexado."""
+        return {path: (size, mtime_ns, digest) for path, size, mtime_ns, digest
+                in self.conn.execute("SELECT path, size, mtime_ns, hash FROM files")}
+
+    def store(self, results):
+        """Grava (substituindo) os arquivos analisados, em uma transação só.
+
+        Cada resultado é (caminho, tamanho, mtime_ns, hash, erro sintático,
+        erro semântico, [(nome, categoria, tipo)], [(nome, tipo de ocorrência,
+        tipo, linha, coluna)]).
+        """
+        now = time.time()
+        symbols, occurrences = [], []
+        with self.conn:
+            for path, size, mtime_ns, digest, syntax_error, semantic_error, syms, occs in results:
+                self.conn.execute(
+                    "INSERT INTO files (path, size, mtime_ns, hash, syntax_error, semantic_error,"
+                    " indexed_at) VALUES (?, ?, ?, ?, ?, ?, ?) ON CONFLICT(path) DO UPDATE SET"
+                    " size = excluded.size, mtime_ns = excluded.mtime_ns, hash = excluded.hash,"
+                    " syntax_error = excluded.syntax_error,"
+                    " semantic_error = excluded.semantic_error, indexed_at = excluded.indexed_at",
+                    (path, size, mtime_ns, digest, syntax_error, semantic_error, now))
+                file_id, = self.conn.execute("SELECT id FROM files WHERE path = ?",
+                                             (path,)).fetchone()
+                self.conn.execute("DELETE FROM symbols WHERE file_id = ?", (file_id,))
+                self.conn.execute("DELETE FROM occurrences WHERE file_id = ?", (file_id,))
+                symbols.extend((file_id,) + row for row in syms)
+                occurrences.extend((file_id,) + row for row in occs)
+            self.conn.executemany("INSERT INTO symbols VALUES (?, ?, ?, ?)", symbols)
+            self.conn.executemany("INSERT INTO occurrences VALUES (?, ?, ?, ?, ?, ?)", occurrences)
+
+    def touch(self, entries):
+        """Atualiza tamanho/mtime de arquivos cujo conteúdo não mudou: [(caminho, tamanho, mtime_ns)]."""
+        with self.conn:
+            self.conn.executemany("UPDATE files SET size = ?, mtime_ns = ? WHERE path = ?",
+                                  [(size, mtime_ns, path) for path, size, mtime_ns in entries])
+
+    def remove(self, paths):
+        with self.conn:
+            self.conn.executemany("DELETE FROM files WHERE path = ?", [(path,) for path in paths])
+
+    # -----------------------
+    # Consultas
+    # -----------------------
+    @staticmethod
+    def _name_filter(column, name):
+        # Nome com curingas (*, ?, [...]) vira GLOB, que ainda usa o índice pelo prefixo
+        return (f"{column} GLOB ?" if glob.has_magic(name) else f"{column} = ?"), name
+
+    def find(self, name, kind=None, data_type=None):
+        """Ocorrências da variável: [(caminho, linha, coluna, tipo de ocorrência, tipo, nome)]."""
+        condition, value = self._name_filter('o.name', name)
+        conditions, params = [condition], [value]
+        if kind is not None:
+            conditions.append("o.kind = ?")
+            params.append(kind)
+        if data_type is not None:
+            conditions.append("o.data_type = ?")
+            params.append(data_type)
+        return self.conn.execute(
+            "SELECT f.path, o.line, o.col, o.kind, o.data_type, o.name FROM occurrences o"
+            " JOIN files f ON f.id = o.file_id WHERE " + " AND ".join(conditions) +
+            " ORDER BY f.path, o.line, o.col", params).fetchall()
+
+    def find_symbols(self, name=None, category=None, data_type=None):
+        """Símbolos da tabela final de cada arquivo: [(caminho, nome, categoria, tipo)]."""
+        conditions, params = [], []
+        if name is not None:
+            condition, value = self._name_filter('s.name', name)
+            conditions.append(condition)
+            params.append(value)
+        if category is not None:
+            conditions.append("s.category = ?")
+            params.append(category)
+        if data_type is not None:
+            conditions.append("s.data_type = ?")
+            params.append(data_type)
+        where = " WHERE " + " AND ".join(conditions) if conditions else ""
+        return self.conn.execute(
+            "SELECT f.path, s.name, s.category, s.data_type FROM symbols s"
+            " JOIN files f ON f.id = s.file_id" + where + " ORDER BY f.path, s.name",
+            params).fetchall()
+
+    def counts(self):
+        return {table: self.conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+                for table in ('files', 'symbols', 'occurrences')}
+
+
+# ---------------------------
+# Análise (processos do pool)
+# ---------------------------
+def _init_worker(lexer_backend='ply'):
+    # Só erros e avisos são registrados (sem as mensagens informativas da tabela)
+    diagnostics = Diagnostics(level=WARNING)
+    _worker['diagnostics'] = diagnostics
+    _worker['parser'] = PythonLikeParser(lexer_backend, diagnostics)
+    _worker['analyzer'] = SemanticAnalyzer(diagnostics, record_assignments=True)
+    _worker['stamp'] = pipeline_stamp()
+
+
+def _occurrences(root, assign_types, text):
+    """(nome, 'assign'/'use', tipo, linha, coluna) de cada variável da AST, sem recursão."""
+    rows = []
+
+    def column(lexpos):
+        return None if lexpos is None else lexpos - text.rfind('\n', 0, lexpos)
+
+    stack = [root]
+    while stack:
+        node = stack.pop()
+        if node.type == 'assign':
+            target, expr = node.children
+            rows.append((target.value, 'assign', assign_types.get(node.id), target.lineno,
+                         column(target.lexpos)))
+            stack.append(expr)
+        elif node.type == 'var':
+            rows.append((node.value, 'use', None, node.lineno, column(node.lexpos)))
+        elif node.children:
+            stack.extend(node.children)
+    return rows
+
+
+def _analyze_file(task):
+    """Analisa um arquivo; devolve o resultado para SymbolIndex.store ou, se o conteúdo
+    não mudou (mesmo hash), (caminho, tamanho, mtime_ns, None)."""
+    path, old_hash = task
+    try:
+        st = os.stat(path)
+        with open(path, 'rb') as f:
+            data = f.read()
+    except OSError:
+        return path, None, None, None
+    digest = hashlib.sha256(_worker['stamp'] + data).hexdigest()
+    if digest == old_hash:
+        return path, st.st_size, st.st_mtime_ns, None
+
+    parser = _worker['parser']
+    analyzer = _worker['analyzer']
+    _worker['diagnostics'].clear()
+    text = data.decode('utf-8', 'replace')
+    root = parser.parse(text)
+    analyzer.reset()
+    symbols, occurrences = [], []
+    if root is not None:
+        analyzer.analyze(root)
+        symbols = [(str(s.name), s.category, s.data_type) for s in analyzer.symbol_table.symbols()]
+        occurrences = _occurrences(root, analyzer.assign_types, text)
+    syntax_error = root is None or bool(parser.lexer.error or parser.error)
+    return (path, st.st_size, st.st_mtime_ns, digest, int(syntax_error), int(analyzer.error),
+            symbols, occurrences)
+
+
+# ---------------------------
+# Indexação
+# ---------------------------
+def index_files(index, specs, files_from=None, jobs=None, lexer_backend='ply'):
+    """Indexa (ou atualiza) os arquivos; devolve as contagens da execução."""
+    known = index.known_files()
+    counts = {'indexados': 0, 'sem mudança': 0, 'removidos': 0}
+
+    # Arquivos indexados que não existem mais
+    missing = [path for path in known if not os.path.isfile(path)]
+    if missing:
+        index.remove(missing)
+        counts['removidos'] = len(missing)
+
+    tasks = []
+    for path, _ in collect_inputs(specs, files_from):
+        path = os.path.abspath(path)
+        try:
+            st = os.stat(path)
+        except OSError:
+            continue
+        entry = known.get(path)
+        if entry is not None and entry[:2] == (st.st_size, st.st_mtime_ns):
+            counts['sem mudança'] += 1
+            continue
+        tasks.append((path, entry[2] if entry is not None else None))
+    if not tasks:
+        return counts
+
+    jobs = max(1, min(jobs or os.cpu_count() or 1, len(tasks)))
+    if jobs == 1:
+        _init_worker(lexer_backend)
+        results = map(_analyze_file, tasks)
+        executor = None
+    else:
+        # Com o cache frio, os processos do pool gerariam as mesmas tabelas ao mesmo tempo
+        prepare_tables(lexer_backend)
+        chunksize = max(1, min(64, len(tasks) // (jobs * 8)))
+        executor = ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker,
+                                       initargs=(lexer_backend,))
+        results = executor.map(_analyze_file, tasks, chunksize=chunksize)
+    try:
+        pending, unchanged = [], []
+        for result in results:
+            if result[1] is None:
+                continue  # sumiu ou ficou ilegível entre o stat e a leitura
+            if result[3] is None:
+                unchanged.append(result[:3])
+                continue
+            pending.append(result)
+            if len(pending) >= COMMIT_BATCH:
+                index.store(pending)
+                counts['indexados'] += len(pending)
+                pending = []
+        if pending:
+            index.store(pending)
+            counts['indexados'] += len(pending)
+        if unchanged:
+            index.touch(unchanged)
+            counts['sem mudança'] += len(unchanged)
+    finally:
+        if executor is not None:
+            executor.shutdown()
+    return counts
+
+
+# ---------------------------
+# CLI
+# ---------------------------
+def build_arg_parser():
+    parser = argparse.ArgumentParser(description='Índice de símbolos em SQLite')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    index = sub.add_parser('index', help='Indexa arquivos (só os que mudaram desde a última vez)')
+    index.add_argument('database', help='Arquivo SQLite do índice (criado se não existir)')
+    index.add_argument('inputs', nargs='*', help='Arquivos, diretórios ou globs')
+    index.add_argument('--files-from', metavar='LISTA',
+                       help='Arquivo com um caminho por linha (somado às entradas)')
+    index.add_argument('-j', '--jobs', type=int, default=None,
+                       help='Processos em paralelo (padrão: número de CPUs)')
+    index.add_argument('--lexer', choices=sorted(LEXER_BACKENDS), default='ply',
+                       help='Backend do lexer (padrão: ply)')
+
+    query = sub.add_parser('query', help='Ocorrências de uma variável em todos os arquivos')
+    query.add_argument('database')
+    query.add_argument('name', help="Nome da variável (aceita curingas: 'tot*')")
+    query.add_argument('--kind', choices=OCCURRENCE_KINDS,
+                       help='Só atribuições (assign) ou só leituras (use)')
+    query.add_argument('--type', dest='data_type', help='Tipo atribuído (number, string, ...)')
+    query.add_argument('--files', action='store_true', help='Lista só os arquivos')
+
+    symbols = sub.add_parser('symbols', help='Símbolos da tabela final de cada arquivo')
+    symbols.add_argument('database')
+    symbols.add_argument('name', nargs='?', help='Nome do símbolo (aceita curingas)')
+    symbols.add_argument('--category', help='variable, operator, builtin-function')
+    symbols.add_argument('--type', dest='data_type', help='Tipo do símbolo')
+    symbols.add_argument('--files', action='store_true', help='Lista só os arquivos')
+    return parser
+
+
+def _print_rows(rows, files_only, format_row):
+    if files_only:
+        for path in dict.fromkeys(row[0] for row in rows):
+            print(path)
+    else:
+        for row in rows:
+            print(format_row(row))
+
+
+def main(argv=None):
+    arg_parser = build_arg_parser()
+    args = arg_parser.parse_args(argv)
+
+    if args.command == 'index':
+        if not args.inputs and args.files_from is None:
+            arg_parser.error("informe os arquivos a indexar")
+        start = time.perf_counter()
+        with SymbolIndex(args.database) as index:
+            counts = index_files(index, args.inputs, args.files_from, args.jobs, args.lexer)
+            totals = index.counts()
+        print(f"Índice atualizado em {time.perf_counter() - start:.2f}s: "
+              + ", ".join(f"{n} {label}" for label, n in counts.items()))
+        print(f"  {totals['files']} arquivo(s), {totals['symbols']} símbolo(s), "
+              f"{totals['occurrences']} ocorrência(s) em {args.database}")
+        return 0
+
+    if not os.path.isfile(args.database):
+        print(f"Índice não encontrado: {args.database}")
+        return 1
+    with SymbolIndex(args.database) as index:
+        if args.command == 'query':
+            rows = index.find(args.name, args.kind, args.data_type)
+            _print_rows(rows, args.files, lambda row: "{}:{}:{}  {} {}{}".format(
+                row[0], row[1], row[2], row[3], row[5], f" ({row[4]})" if row[4] else ""))
+        else:
+            rows = index.find_symbols(args.name, args.category, args.data_type)
+            _print_rows(rows, args.files, lambda row: f"{row[0]}  {row[1]}  {row[2]}  {row[3]}")
+    return 0 if rows else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
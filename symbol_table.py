@@ -0,0 +1,249 @@
+# symbol_table.py
+# Tabela de símbolos e pool de literais.
+#
+# - Símbolos (variáveis, operadores, funções embutidas) ficam em um dicionário
+#   por nome. A linguagem não tem escopos: blocos de if/while não criam um.
+# - Os nomes são internados (sys.intern): nomes repetidos em milhares de nós
+#   compartilham a mesma string.
+# - Literais não são símbolos: vão para um pool deduplicado por (tipo, valor),
+#   com a contagem de ocorrências. Com o tipo na chave, True e 1 não colidem.
+# - A descrição textual só é montada na exportação (to_dict / JSON), que
+#   mantém o formato antigo: nome -> {category, data_type, description}, com
+#   símbolos e literais na ordem em que apareceram.
+import sys
+
+
+def build_description(name, category, data_type):
+    if category == "variable":
+        return f"User-defined variable '{name}' of type {data_type}"
+    elif category == "operator":
+        return f"Operator '{name}' used in expressions"
+    elif category == "builtin-function":
+        return f"Builtin function '{name}'"
+    elif category == "literal-value":
+        return f"Literal value of type {data_type}"
+    else:
+        return f"Symbol '{name}' of category {category}"
+
+
+def _json_key(value):
+    # Mesma chave que o json.dump geraria para o antigo dicionário plano
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    return str(value)
+
+
+class Symbol:
+    __slots__ = ('name', 'category', 'data_type')
+
+    def __init__(self, name, category, data_type=None):
+        self.name = name
+        self.category = category
+        self.data_type = data_type
+
+    @property
+    def description(self):
+        return build_description(self.name, self.category, self.data_type)
+
+    def to_dict(self):
+        return {'category': self.category, 'data_type': self.data_type,
+                'description': self.description}
+
+    def __repr__(self):
+        return f"Symbol({self.name!r}, {self.category!r}, {self.data_type!r})"
+
+
+class LiteralPool:
+    """Literais distintos por (tipo, valor), na ordem da primeira ocorrência, com contagem."""
+    __slots__ = ('counts', 'journal')
+
+    def __init__(self, counts=None):
+        self.counts = counts if counts is not None else {}  # (tipo, valor) -> ocorrências
+        self.journal = None  # se for um dict, também recebe as ocorrências (ver incremental.py)
+
+    def add(self, data_type, value):
+        """Registra uma ocorrência; devolve True se o literal ainda não estava no pool."""
+        key = (data_type, value)
+        count = self.counts.get(key, 0)
+        self.counts[key] = count + 1
+        journal = self.journal
+        if journal is not None:
+            journal[key] = journal.get(key, 0) + 1
+        return count == 0
+
+    def apply(self, counts, sign=1):
+        """Soma (ou subtrai, com sign=-1) contagens; literais que chegam a zero saem."""
+        journal = self.journal
+        for key, n in counts.items():
+            total = self.counts.get(key, 0) + sign * n
+            if total > 0:
+                self.counts[key] = total
+            else:
+                self.counts.pop(key, None)
+            if journal is not None:
+                journal[key] = journal.get(key, 0) + sign * n
+
+    def copy(self):
+        return LiteralPool(dict(self.counts))
+
+    def __contains__(self, key):
+        return key in self.counts
+
+    def __len__(self):
+        return len(self.counts)
+
+    def __iter__(self):
+        """(tipo, valor, ocorrências) de cada literal."""
+        for (data_type, value), count in self.counts.items():
+            yield data_type, value, count
+
+
+class SymbolTable:
+    def __init__(self):
+        self._symbols = {}    # nome -> Symbol, na ordem em que os nomes apareceram
+        self._marks = {}      # nome -> literais no pool quando o nome foi definido (to_dict)
+        self.literals = LiteralPool()
+        self.journal = None   # se for um dict, recebe os símbolos criados/alterados (ver streaming.py)
+        self.order = None     # se for uma lista, recebe a ordem de símbolos e literais (ver reorder)
+
+    # ---------------------------
+    # Símbolos
+    # ---------------------------
+    def lookup(self, name):
+        """Símbolo com esse nome, ou None."""
+        return self._symbols.get(name)
+
+    def define(self, name, category, data_type=None):
+        """Cria o símbolo (substitui um de mesmo nome, se houver)."""
+        if isinstance(name, str):
+            name = sys.intern(name)
+        symbol = Symbol(name, category, data_type)
+        if name not in self._symbols:
+            self._marks[name] = len(self.literals)
+            if self.order is not None:
+                self.order.append(('symbol', name))
+        self._symbols[name] = symbol
+        if self.journal is not None:
+            self.journal[name] = symbol
+        return symbol
+
+    def set_type(self, symbol, data_type):
+        """Troca o tipo de um símbolo já definido."""
+        symbol.data_type = data_type
+        if self.journal is not None:
+            self.journal[symbol.name] = symbol
+
+    def symbols(self):
+        """Símbolos, na ordem em que os nomes apareceram."""
+        return list(self._symbols.values())
+
+    def variables(self):
+        """Nomes das variáveis (usado para numerar os slots da VM)."""
+        return [symbol.name for symbol in self._symbols.values() if symbol.category == 'variable']
+
+    def __contains__(self, name):
+        return name in self._symbols
+
+    def __len__(self):
+        return len(self._symbols) + len(self.literals)
+
+    # ---------------------------
+    # Literais
+    # ---------------------------
+    def add_literal(self, data_type, value):
+        if self.order is not None:
+            self.order.append(('literal', (data_type, value)))
+        return self.literals.add(data_type, value)
+
+    # ---------------------------
+    # Cópia e comparação
+    # ---------------------------
+    def copy(self):
+        table = SymbolTable()
+        table._symbols = {name: Symbol(s.name, s.category, s.data_type)
+                          for name, s in self._symbols.items()}
+        table._marks = dict(self._marks)
+        table.literals = self.literals.copy()
+        return table
+
+    def same_symbols(self, other):
+        """Mesmos símbolos (nome, categoria, tipo); o pool de literais não entra."""
+        if len(self._symbols) != len(other._symbols):
+            return False
+        for name, a in self._symbols.items():
+            b = other._symbols.get(name)
+            if b is None or a.category != b.category or a.data_type != b.data_type:
+                return False
+        return True
+
+    def reorder(self, order):
+        """Refaz a ordem de exportação a partir de ('symbol', nome) e ('literal', chave),
+        na ordem em que apareceram no programa (repetições são ignoradas).
+
+        Usado pela análise incremental, que monta a tabela final fora de ordem.
+        """
+        symbols, marks, counts = {}, {}, {}
+        literals = self.literals.counts
+        for kind, key in order:
+            if kind == 'symbol':
+                if key not in symbols:
+                    symbols[key] = self._symbols[key]
+                    marks[key] = len(counts)
+            elif key not in counts:
+                counts[key] = literals[key]
+        self._symbols = symbols
+        self._marks = marks
+        self.literals.counts = counts
+
+    # ---------------------------
+    # Exportação (formato JSON antigo)
+    # ---------------------------
+    def to_dict(self):
+        """Visão plana do JSON antigo, na mesma ordem: símbolos e literais como
+        apareceram no programa; literais ganham 'occurrences'."""
+        result = {}
+        literals = list(self.literals)
+        done = 0
+        for symbol in self._symbols.values():
+            # Literais registrados antes deste nome vêm antes dele
+            mark = min(self._marks[symbol.name], len(literals))
+            for data_type, value, count in literals[done:mark]:
+                _add_literal_entry(result, data_type, value, count)
+            done = max(done, mark)
+            # Como no dicionário antigo, o primeiro registrado com a mesma chave fica
+            result.setdefault(_json_key(symbol.name), symbol.to_dict())
+        for data_type, value, count in literals[done:]:
+            _add_literal_entry(result, data_type, value, count)
+        return result
+
+    @classmethod
+    def from_dict(cls, data):
+        """Reconstrói a tabela a partir do JSON (formato antigo ou gerado por to_dict)."""
+        table = cls()
+        for key, entry in data.items():
+            category = entry.get('category')
+            data_type = entry.get('data_type')
+            if category == 'literal-value':
+                table.literals.counts[(data_type, _literal_from_key(key, data_type))] = \
+                    entry.get('occurrences', 1)
+            else:
+                table.define(key, category, data_type)
+        return table
+
+
+def _add_literal_entry(result, data_type, value, count):
+    result.setdefault(_json_key(value), {
+        'category': 'literal-value', 'data_type': data_type,
+        'description': build_description(value, 'literal-value', data_type),
+        'occurrences': count})
+
+
+def _literal_from_key(key, data_type):
+    if data_type == 'boolean':
+        return key in ('true', 'True')
+    if data_type == 'number':
+        try:
+            return int(key)
+        except ValueError:
+            return float(key)
+    return key
@@ -0,0 +1,86 @@
+# table_cache.py
+# Cache em disco das tabelas geradas pelo PLY (lextab/parsetab).
+#
+# As tabelas ficam em um diretório versionado (versão do cache + versão do
+# PLY) e cada arquivo leva no nome um hash das definições de tokens/regras,
+# então qualquer mudança na gramática gera um arquivo novo em vez de
+# reaproveitar uma tabela desatualizada. Uma tabela nova é gerada em um
+# diretório temporário e movida para o lugar com os.replace: quem lê o cache
+# nunca vê um arquivo pela metade.
+import contextlib
+import hashlib
+import importlib.util
+import os
+import shutil
+import sys
+import tempfile
+
+import ply
+
+CACHE_VERSION = 1
+
+# Atributos de classe que também influenciam as tabelas geradas
+_TABLE_ATTRS = ('tokens', 'literals', 'precedence', 'keywords', 'start')
+
+
+def cache_dir():
+    """Retorna o diretório do cache (criando se preciso) ou None se não for gravável.
+
+    O local pode ser trocado pela variável de ambiente PYTHONLIKE_CACHE_DIR.
+    """
+    base = os.environ.get('PYTHONLIKE_CACHE_DIR')
+    if not base:
+        base = os.path.join(os.path.expanduser('~'), '.cache', 'pythonlike')
+    path = os.path.join(base, f"v{CACHE_VERSION}-ply{ply.__version__}")
+    try:
+        os.makedirs(path, exist_ok=True)
+    except OSError:
+        return None
+    if not os.access(path, os.W_OK):
+        return None
+    return path
+
+
+@contextlib.contextmanager
+def staging_dir(outputdir):
+    """Diretório temporário dentro de outputdir para o PLY gravar uma tabela nova.
+
+    O PLY grava direto no arquivo final; uma execução interrompida ou dois
+    processos gerando a mesma tabela deixariam um arquivo truncado. Ao sair sem
+    erro, os arquivos gerados vão para outputdir com os.replace (atômico).
+    """
+    staging = tempfile.mkdtemp(prefix='.tmp-', dir=outputdir)
+    try:
+        yield staging
+        for name in os.listdir(staging):
+            if name != '__pycache__':
+                os.replace(os.path.join(staging, name), os.path.join(outputdir, name))
+    finally:
+        shutil.rmtree(staging, ignore_errors=True)
+
+
+def definitions_hash(cls, prefix):
+    """Hash das definições PLY de uma classe (regras com o prefixo dado + tokens/precedência)."""
+    h = hashlib.sha256()
+    for name in sorted(dir(cls)):
+        if not (name.startswith(prefix) or name in _TABLE_ATTRS):
+            continue
+        value = getattr(cls, name)
+        if callable(value):
+            # A ordem das regras-função depende da linha em que estão definidas;
+            # a regex pode vir do docstring ou do decorador @TOKEN (atributo regex)
+            value = (getattr(value, 'regex', value.__doc__), value.__code__.co_firstlineno)
+        h.update(name.encode('utf-8'))
+        h.update(repr(value).encode('utf-8'))
+    return h.hexdigest()[:16]
+
+
+def load_table_module(name, path):
+    """Importa um lextab gerado a partir do caminho, sem depender do sys.path."""
+    if name in sys.modules:
+        return sys.modules[name]
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    sys.modules[name] = module
+    return module
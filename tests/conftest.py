@@ -0,0 +1,9 @@
+# conftest.py
+# Os módulos do projeto ficam na raiz do repositório (sem pacote); os testes
+# os importam direto de lá.
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
@@ -0,0 +1,113 @@
+# test_ast_binary.py
+# Formato binário da AST (ast_binary.py): gravar e ler de volta dá a mesma
+# árvore, pela leitura preguiçosa e por to_ast(), inclusive com nós
+# compartilhados (share_expressions) e constantes dobradas pelo otimizador.
+import glob
+import os
+
+import pytest
+
+from ast_binary import AST_MAGIC, load_ast, save_ast
+from diagnostics import Diagnostics
+from optimizer import ASTOptimizer
+from parser_ast import ASTNode, PythonLikeParser
+
+TESTES = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'testes')
+
+
+def _parse(code, share=False):
+    return PythonLikeParser(diagnostics=Diagnostics(), share_expressions=share).parse(code)
+
+
+def _dump(root):
+    """Nós em pré-ordem; um nó já visto (compartilhado) vira só uma referência."""
+    seen = {}
+    out = []
+    stack = [root]
+    while stack:
+        node = stack.pop()
+        if node.id in seen:
+            out.append(('ref', seen[node.id]))
+            continue
+        seen[node.id] = len(seen)
+        out.append((node.type, node.value.__class__, node.value, node.error, node.lineno,
+                    node.lexpos, len(node.children)))
+        stack.extend(reversed(node.children))
+    return out
+
+
+def _round_trip(root, tmp_path):
+    path = str(tmp_path / 'ast.plas')
+    count = save_ast(root, path)
+    with load_ast(path) as tree:
+        assert len(tree) == count
+        return _dump(tree.root), _dump(tree.to_ast())
+
+
+@pytest.mark.parametrize('share', [False, True], ids=['arvore', 'dag'])
+@pytest.mark.parametrize('path', sorted(glob.glob(os.path.join(TESTES, '*.txt'))),
+                         ids=os.path.basename)
+def test_round_trip_testes(path, share, tmp_path):
+    with open(path) as f:
+        root = _parse(f.read(), share)
+    if root is None:
+        pytest.skip('sem AST')
+    lazy, rebuilt = _round_trip(root, tmp_path)
+    assert lazy == rebuilt == _dump(root)
+
+
+def test_shared_nodes_stay_shared(tmp_path):
+    code = 'a = 1\nx = (a + 1) * (a + 1)\ny = (a + 1) * (a + 1)\n'
+    root = _parse(code, share=True)
+    expected = _dump(root)
+    assert any(item[0] == 'ref' for item in expected)
+    lazy, rebuilt = _round_trip(root, tmp_path)
+    assert lazy == rebuilt == expected
+    path = str(tmp_path / 'ast.plas')
+    with load_ast(path) as tree:
+        first, second = (stmt.children[1] for stmt in tree.to_ast().children[1:])
+        assert first is second
+
+
+def test_values_keep_their_types(tmp_path):
+    code = 'x = 1 / 2\ny = 1 == 1\nz = "1" + "2"\nw = 3 - 5\nv = 99999999999999999999 * 1\n'
+    diagnostics = Diagnostics()
+    root = ASTOptimizer(diagnostics).optimize(_parse(code))
+    values = [stmt.children[1].value for stmt in root.children]
+    assert values == [0.5, True, '12', -2, 99999999999999999999]
+    lazy, rebuilt = _round_trip(root, tmp_path)
+    assert lazy == rebuilt == _dump(root)
+
+
+def test_nodes_without_position(tmp_path):
+    root = ASTNode('program').add(ASTNode('print').add(ASTNode('number', 0)))
+    lazy, rebuilt = _round_trip(root, tmp_path)
+    assert lazy == rebuilt == _dump(root)
+    assert lazy[-1][4:6] == (None, None)
+
+
+@pytest.mark.parametrize('data, message', [
+    (b'', 'vazio'),
+    (AST_MAGIC, 'cabeçalho'),
+    (b'XXXX' + bytes(200), 'assinatura'),
+], ids=['vazio', 'cabecalho', 'assinatura'])
+def test_invalid_files(data, message, tmp_path):
+    path = tmp_path / 'ruim.plas'
+    path.write_bytes(data)
+    with pytest.raises(ValueError, match=message):
+        load_ast(str(path))
+
+
+def test_truncated_and_other_version(tmp_path):
+    path = str(tmp_path / 'ast.plas')
+    save_ast(_parse('x = 1\nprint(x)\n'), path)
+    with open(path, 'rb') as f:
+        data = f.read()
+    truncated = tmp_path / 'curto.plas'
+    truncated.write_bytes(data[:-4])
+    with pytest.raises(ValueError, match='truncado'):
+        load_ast(str(truncated))
+    other = tmp_path / 'versao.plas'
+    other.write_bytes(data[:4] + b'\x63\x00' + data[6:])
+    with pytest.raises(ValueError, match='Versão'):
+        load_ast(str(other))
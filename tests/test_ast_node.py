@@ -0,0 +1,26 @@
+# test_ast_node.py
+# ASTNode: filhos em lista em qualquer nó, folhas inclusive.
+from diagnostics import Diagnostics
+from parser_ast import ASTNode, PythonLikeParser
+
+
+def test_leaf_children_is_a_list():
+    leaf = ASTNode('number', 1)
+    assert leaf.children == []
+    leaf.children.append(ASTNode('number', 2))
+    assert [child.value for child in leaf.children] == [2]
+    # Cada nó tem a sua lista
+    assert ASTNode('var', 'x').children == []
+
+
+def test_parsed_leaves_accept_append():
+    root = PythonLikeParser(diagnostics=Diagnostics()).parse('x = 1\n')
+    number = root.children[0].children[1]
+    assert number.type == 'number'
+    number.children.append(ASTNode('string', 'a'))
+    assert len(number.children) == 1
+
+
+def test_add_skips_none():
+    node = ASTNode('block').add(None).extend([ASTNode('number', 1), None])
+    assert len(node.children) == 1
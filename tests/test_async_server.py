@@ -0,0 +1,66 @@
+# test_async_server.py
+# Servidor concorrente (async_server.py): vagas de pedidos que estouraram o
+# tempo e o diretório de image_file.
+import asyncio
+import os
+import time
+
+import pytest
+
+from async_server import AsyncAnalysisService, serve_unix
+from program_generator import generate_program
+from server import RequestError
+
+
+def test_image_file_needs_image_dir():
+    service = AsyncAnalysisService(workers=1)
+    try:
+        with pytest.raises(RequestError):
+            service._image_path('ast.png')
+    finally:
+        service.close()
+
+
+def test_image_file_stays_in_image_dir(tmp_path):
+    service = AsyncAnalysisService(workers=1, image_dir=str(tmp_path))
+    try:
+        assert service._image_path('ast.png') == os.path.join(os.path.realpath(tmp_path), 'ast.png')
+        for name in ('../ast.png', '/tmp/ast.png', 'sub/ast.png', '.', 7):
+            with pytest.raises(RequestError):
+                service._image_path(name)
+    finally:
+        service.close()
+
+
+def test_socket_path_must_be_a_socket(tmp_path):
+    path = tmp_path / 'notas.txt'
+    path.write_text('importante')
+    service = AsyncAnalysisService(workers=1)
+    try:
+        assert asyncio.run(serve_unix(service, str(path))) == 1
+    finally:
+        service.close()
+    assert path.read_text() == 'importante'
+
+
+def test_timed_out_job_keeps_its_slot():
+    source = generate_program(4000, depth=3, seed=1)
+
+    async def scenario():
+        service = AsyncAnalysisService(workers=1, max_queue=0, timeout=0.05)
+        try:
+            await service.start()
+            response = await service.handle({'id': 1, 'source': source})
+            assert response['timeout'] is True
+            # O processo ainda analisa o pedido: a vaga continua ocupada
+            assert service.inflight == 1
+            busy = await service.handle({'id': 2, 'source': 'x = 1\n'})
+            assert busy['busy'] is True
+            deadline = time.monotonic() + 60
+            while service.inflight and time.monotonic() < deadline:
+                await asyncio.sleep(0.05)
+            assert service.inflight == 0
+        finally:
+            service.close()
+
+    asyncio.run(scenario())
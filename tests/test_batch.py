@@ -0,0 +1,32 @@
+# test_batch.py
+# Modo lote (batch.py): as tabelas do PLY são geradas uma vez, antes do pool.
+import os
+import sys
+
+import batch
+import parser_ast
+from mylexer import PythonLikeLexer
+from table_cache import cache_dir, definitions_hash
+
+TESTES = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'testes')
+
+
+def test_cold_cache_tables_built_before_pool(tmp_path, monkeypatch):
+    monkeypatch.setenv('PYTHONLIKE_CACHE_DIR', str(tmp_path / 'cache'))
+    # O lextab importado por outro teste ficaria em sys.modules
+    monkeypatch.delitem(sys.modules, 'lextab_' + definitions_hash(PythonLikeLexer, 't_'), raising=False)
+    calls = []
+
+    def prepare_tables(lexer_backend='ply'):
+        calls.append(lexer_backend)
+        parser_ast.prepare_tables(lexer_backend)
+
+    monkeypatch.setattr(batch, 'prepare_tables', prepare_tables)
+    out_dir = tmp_path / 'saida'
+    batch.run_batch([TESTES], 'run', out_dir=str(out_dir), jobs=2, render_png=False,
+                    use_cache=False)
+    assert calls == ['ply']
+    assert len(os.listdir(cache_dir())) == 2  # lextab e parsetab, sem temporários
+    for name in os.listdir(TESTES):
+        base = os.path.splitext(name)[0]
+        assert (out_dir / (base + '.diagnostics.json')).is_file()
@@ -0,0 +1,72 @@
+# test_dataflow.py
+# Análises de fluxo de dados (dataflow.py, --dataflow): forma do CFG e avisos de
+# atribuição não usada, variável possivelmente sem valor e tipos por caminho
+# em if/while.
+import pytest
+
+from dataflow import ControlFlowGraph
+from diagnostics import Diagnostics, WARNING
+from parser_ast import PythonLikeParser
+from semantic_analyzer import SemanticAnalyzer
+
+
+def _parse(code):
+    root = PythonLikeParser(diagnostics=Diagnostics()).parse(code)
+    assert root is not None
+    return root
+
+
+def _warnings(code):
+    diagnostics = Diagnostics(level=WARNING)
+    SemanticAnalyzer(diagnostics, dataflow=True).analyze(_parse(code))
+    return [(r.code, r.line, r.args['name']) for r in diagnostics.records if r.stage == 'dataflow']
+
+
+def _edges(code):
+    cfg = ControlFlowGraph(_parse(code))
+    return [[succ.index for succ in block.succs] for block in cfg.blocks]
+
+
+def test_cfg_of_if_and_if_else():
+    # if: a condição falsa segue direto para o bloco seguinte
+    assert _edges('x = 1\nif x > 0:\n    y = 2\nprint(y)\n') == [[1, 2], [2], []]
+    assert _edges('x = 1\nif x > 0:\n    y = 2\nelse:\n    y = 3\nprint(y)\n') == \
+        [[1, 2], [3], [3], []]
+
+
+def test_cfg_of_while_has_back_edge():
+    cfg = ControlFlowGraph(_parse('i = 0\nwhile i < 3:\n    i = i + 1\nprint(i)\n'))
+    entry, header, body, after = cfg.blocks
+    assert [b.index for b in header.succs] == [body.index, after.index]
+    assert body.succs == [header]
+    assert cfg.exit is after
+    assert [b.index for b in cfg.reverse_postorder()] == [0, 1, 2, 3]
+
+
+@pytest.mark.parametrize('code, expected', [
+    # y só recebe valor em um dos caminhos
+    ('x = 1\nif x > 0:\n    y = 2\nprint(y)\n', [('maybe-unassigned', 4, 'y')]),
+    ('x = 1\nif x > 0:\n    y = 2\nelse:\n    y = 3\nprint(y)\n', []),
+    # z é lido no if antes de receber valor na primeira volta
+    ('i = 0\nwhile i < 3:\n    if i > 1:\n        print(z)\n    z = i\n    i = i + 1\n',
+     [('maybe-unassigned', 4, 'z')]),
+    # O valor de z chega à volta seguinte do laço
+    ('i = 0\nz = 0\nwhile i < 3:\n    print(z)\n    z = i\n    i = i + 1\n', []),
+    ('i = 0\nwhile i < 3:\n    i = i + 1\n', []),
+    # Atribuições que nenhum caminho lê
+    ('x = 1\nx = 2\nprint(x)\n', [('unused-assignment', 1, 'x')]),
+    ('i = 0\nt = 0\nwhile i < 3:\n    t = i\n    i = i + 1\nprint(i)\n',
+     [('unused-assignment', 2, 't'), ('unused-assignment', 4, 't')]),
+    ('x = 1\nif x > 0:\n    x = 2\nelse:\n    y = 3\n    print(y)\n',
+     [('unused-assignment', 3, 'x')]),
+    ('x = 1\nif x > 0:\n    y = 2\nelse:\n    y = "a"\nprint(y)\n',
+     [('type-differs-by-path', 6, 'y')]),
+])
+def test_warnings(code, expected):
+    assert _warnings(code) == expected
+
+
+def test_without_dataflow_no_warnings():
+    diagnostics = Diagnostics(level=WARNING)
+    SemanticAnalyzer(diagnostics).analyze(_parse('x = 1\nx = 2\nprint(x)\n'))
+    assert not [r for r in diagnostics.records if r.stage == 'dataflow']
@@ -0,0 +1,122 @@
+# test_deep_nesting.py
+# Árvores muito profundas (dezenas de milhares de níveis) não podem estourar a
+# pilha do Python: análise semântica, DOT, compilador da VM e otimizador
+# percorrem a AST de forma iterativa.
+import io
+import sys
+
+import pytest
+
+from ast_to_dot import write_dot
+from diagnostics import Diagnostics
+from optimizer import ASTOptimizer
+from parser_ast import ASTNode, PythonLikeParser
+from semantic_analyzer import SemanticAnalyzer
+from vm import Compiler
+
+DEPTH = 30000
+
+
+def _nested_blocks(kind, depth):
+    """program -> if/while -> block -> if/while -> ... com depth níveis."""
+    inner = ASTNode('assign').extend((ASTNode('var', 'y'), ASTNode('var', 'x')))
+    for _ in range(depth):
+        inner = ASTNode(kind).extend((ASTNode('var', 'x'), ASTNode('block').add(inner)))
+    init = ASTNode('assign').extend((ASTNode('var', 'x'), ASTNode('boolean', True)))
+    return ASTNode('program').extend((init, inner))
+
+
+def _left_chain(length):
+    """x = a + a + ... + a (árvore profunda à esquerda, como o parser monta)."""
+    expr = ASTNode('var', 'a')
+    for _ in range(length):
+        expr = ASTNode('binop', '+').extend((expr, ASTNode('var', 'a')))
+    return expr
+
+
+def _right_chain(length):
+    """x = 1 + (1 + (1 + ...)) (profunda à direita)."""
+    expr = ASTNode('number', 1)
+    for _ in range(length):
+        expr = ASTNode('binop', '+').extend((ASTNode('number', 1), expr))
+    return expr
+
+
+def _program(expr):
+    init = ASTNode('assign').extend((ASTNode('var', 'a'), ASTNode('number', 2)))
+    return ASTNode('program').extend(
+        (init, ASTNode('assign').extend((ASTNode('var', 'x'), expr))))
+
+
+def _run_pipeline(root):
+    """Análise semântica, DOT, bytecode e otimizador; devolve os diagnósticos da análise."""
+    diagnostics = Diagnostics(level='error')
+    analyzer = SemanticAnalyzer(diagnostics)
+    analyzer.analyze(root)
+    errors = list(diagnostics.records)
+
+    out = io.StringIO()
+    assert write_dot(root, out) > 0
+    assert out.getvalue().endswith('}\n')
+
+    assert Compiler(analyzer.symbol_table).compile(root).code
+
+    ASTOptimizer(Diagnostics(level='error')).optimize(root)
+    return errors
+
+
+@pytest.fixture(autouse=True)
+def _small_recursion_limit():
+    # Com o limite padrão, uma travessia recursiva falharia bem antes de DEPTH
+    # níveis; o limite baixo garante que nada dependa da pilha do Python.
+    limit = sys.getrecursionlimit()
+    sys.setrecursionlimit(1000)
+    try:
+        yield
+    finally:
+        sys.setrecursionlimit(limit)
+
+
+@pytest.mark.parametrize('kind', ['if', 'while'])
+def test_deep_blocks(kind):
+    assert _run_pipeline(_nested_blocks(kind, DEPTH)) == []
+
+
+def test_deep_if_else():
+    inner = ASTNode('print').add(ASTNode('number', 1))
+    for _ in range(DEPTH):
+        inner = ASTNode('if_else').extend((ASTNode('boolean', True), ASTNode('block').add(inner),
+                                           ASTNode('block').add(ASTNode('print').add(
+                                               ASTNode('number', 0)))))
+    assert _run_pipeline(ASTNode('program').add(inner)) == []
+
+
+def test_long_left_chain():
+    assert _run_pipeline(_program(_left_chain(DEPTH))) == []
+
+
+def test_long_right_chain():
+    root = _program(_right_chain(DEPTH))
+    assert _run_pipeline(root) == []
+    # O otimizador dobra a cadeia inteira de constantes em um único número
+    assert root.children[1].children[1].type == 'number'
+    assert root.children[1].children[1].value == DEPTH + 1
+
+
+def test_deep_chain_with_type_error():
+    expr = ASTNode('binop', '+').extend((_left_chain(DEPTH), ASTNode('string', 's')))
+    errors = _run_pipeline(_program(expr))
+    assert [error.code for error in errors] == ['invalid-operand-types']
+
+
+def test_parsed_long_chain_and_nesting():
+    """O mesmo pelo parser: cadeia longa e aninhamento de blocos vindo do texto."""
+    depth = 1000  # indentação de 1 espaço por nível: o texto cresce com depth²
+    lines = ['x = True', 'a = 2', 'y = ' + ' + '.join(['a'] * DEPTH)]
+    lines += [' ' * level + ('if x:' if level % 2 else 'while x:') for level in range(depth)]
+    lines.append(' ' * depth + 'y = y + a')
+    diagnostics = Diagnostics(level='error')
+    parser = PythonLikeParser(diagnostics=diagnostics)
+    root = parser.parse('\n'.join(lines) + '\n')
+    assert root is not None and not parser.error
+    assert _run_pipeline(root) == []
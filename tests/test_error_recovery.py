@@ -0,0 +1,70 @@
+# test_error_recovery.py
+# Recuperação de erros do parser (modo pânico): cada token inesperado é
+# relatado uma única vez.
+import glob
+import os
+
+import pytest
+
+from diagnostics import Diagnostics
+from parser_ast import PythonLikeParser
+
+TESTES = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'testes')
+
+
+def _parse(path, backend='ply', parser=None):
+    parser = parser or PythonLikeParser(backend, Diagnostics())
+    with open(path) as f:
+        parser.parse(f.read())
+    return parser.diagnostics.records
+
+
+@pytest.mark.parametrize('backend', ['ply', 'fast'])
+def test_input7_diagnostics(backend):
+    records = _parse(os.path.join(TESTES, 'input7.txt'), backend)
+    parser_errors = [(r.code, r.line, r.offset) for r in records if r.stage == 'parser']
+    assert parser_errors == [
+        ('unexpected-token', 1, 0),    # def
+        ('unexpected-token', 2, 35),   # ':' depois de '[]'
+        ('unexpected-token', 4, 58),   # else solto, relatado uma vez só
+        ('unexpected-token', 6, 112),  # ','
+        ('unexpected-token', 7, 130),  # '(' de soma(x)
+    ]
+    assert sum(r.stage == 'lexer' for r in records) == 8
+
+
+def test_reused_parser_reports_again():
+    parser = PythonLikeParser(diagnostics=Diagnostics())
+    path = os.path.join(TESTES, 'input7.txt')
+    first = len(_parse(path, parser=parser))
+    parser.diagnostics.clear()
+    assert len(_parse(path, parser=parser)) == first
+
+
+@pytest.mark.parametrize('path', sorted(glob.glob(os.path.join(TESTES, '*.txt'))),
+                         ids=os.path.basename)
+def test_no_duplicate_parser_errors(path):
+    positions = [(r.line, r.offset) for r in _parse(path) if r.stage == 'parser']
+    assert len(positions) == len(set(positions))
+
+
+def _types(root):
+    return [(child.type, child.value) for child in root.children]
+
+
+@pytest.mark.parametrize('backend', ['ply', 'fast'])
+def test_input7_keeps_no_partial_statement(backend):
+    # 'x = [2, 4, 6]': o 'x = 2' antes da ',' não vira uma atribuição
+    with open(os.path.join(TESTES, 'input7.txt')) as f:
+        root = PythonLikeParser(backend, Diagnostics()).parse(f.read())
+    assert _types(root) == [('error', 'def'), ('error', ','), ('error', '(')]
+
+
+def test_partial_statement_dropped():
+    parser = PythonLikeParser(diagnostics=Diagnostics())
+    root = parser.parse('x = [2, 4]\nprint(1 2)\ny = 1\n')
+    assert _types(root) == [('error', ','), ('error', 2), ('assign', None)]
+    assert root.children[2].children[0].value == 'y'
+    # Sem erro, dois statements na mesma linha continuam válidos
+    root = parser.parse('x = 1 y = 2\n')
+    assert not parser.error and _types(root) == [('assign', None), ('assign', None)]
@@ -0,0 +1,109 @@
+# test_incremental.py
+# Análise incremental (incremental.py): depois de cada edição a AST, os
+# diagnósticos e a tabela de símbolos (inclusive a ordem do JSON) são os mesmos
+# de uma análise do texto inteiro.
+import glob
+import os
+import random
+
+import pytest
+
+import incremental
+from diagnostics import Diagnostics, WARNING
+from incremental import IncrementalParser
+from parser_ast import PythonLikeParser
+from semantic_analyzer import SemanticAnalyzer
+
+TESTES = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'testes')
+
+# Linhas inseridas: novos símbolos, literais repetidos e blocos
+LINES = ['x = 1\n', 'novo = "s" + "t"\n', 'print(7)\n', 'if x == 1:\n    y = 2\n',
+         'while x < 3:\n    x = x + 1\n', 'y = True\n', 'q = y + 1.5\n', '# comentário\n', '\n']
+
+
+def _shape(root):
+    out = []
+    stack = [root]
+    while stack:
+        node = stack.pop()
+        out.append((node.type, node.value, node.lineno, node.lexpos))
+        stack.extend(reversed(node.children))
+    return out
+
+
+def _result(root, table, records):
+    return (_shape(root), list(table.to_dict().items()),
+            [(r.code, r.line, r.offset) for r in records])
+
+
+def _full(text):
+    """Análise do texto inteiro, ou None se ele não for válido."""
+    parser = PythonLikeParser(diagnostics=Diagnostics(level=WARNING))
+    root = parser.parse(text)
+    if root is None or parser.error or parser.lexer.error:
+        return None
+    diagnostics = Diagnostics(level=WARNING)
+    analyzer = SemanticAnalyzer(diagnostics=diagnostics)
+    analyzer.analyze(root)
+    return _result(root, analyzer.symbol_table, diagnostics.records)
+
+
+def _base():
+    texts = []
+    for path in sorted(glob.glob(os.path.join(TESTES, '*.txt'))):
+        with open(path) as f:
+            text = f.read()
+        text = text if text.endswith('\n') else text + '\n'
+        if _full(text) is not None:
+            texts.append(text)
+    return ''.join(texts) * 2
+
+
+def _edit(rng, text):
+    """Edição aleatória: insere ou remove linhas inteiras, ou troca alguns caracteres."""
+    starts = [0] + [i + 1 for i, c in enumerate(text) if c == '\n' and i + 1 < len(text)]
+    kind = rng.random()
+    if kind < 0.4:
+        return rng.choice(starts + [len(text)]), 0, rng.choice(LINES)
+    if kind < 0.8:
+        first = rng.randrange(len(starts))
+        last = min(first + rng.randint(1, 3), len(starts))
+        end = starts[last] if last < len(starts) else len(text)
+        return starts[first], end - starts[first], ''
+    offset = rng.randrange(len(text))
+    return offset, rng.randint(0, min(3, len(text) - offset)), rng.choice(['1', 'x', ' ', '"a"', ''])
+
+
+@pytest.mark.parametrize('interval', [incremental.CHECKPOINT_INTERVAL, 2])
+@pytest.mark.parametrize('seed', range(3))
+def test_random_edits_match_full_analysis(seed, interval, monkeypatch):
+    monkeypatch.setattr(incremental, 'CHECKPOINT_INTERVAL', interval)
+    rng = random.Random(seed)
+    base = text = _base()
+    inc = IncrementalParser().parse(text)
+    compared = 0
+    for _ in range(60):
+        offset, removed, inserted = _edit(rng, text)
+        inc.edit(offset, removed, inserted)
+        text = text[:offset] + inserted + text[offset + removed:]
+        assert inc.text == text
+        expected = _full(text)
+        if expected is None:
+            assert inc.parse_error
+            inc.edit(0, len(text), base)
+            text = base
+            continue
+        assert not inc.parse_error
+        assert _result(inc.ast, inc.symbol_table, inc.diagnostics) == expected
+        compared += 1
+    assert compared > 20
+
+
+def test_early_stop_keeps_table_order(monkeypatch):
+    # A reanálise para no checkpoint do segmento 2; o literal novo fica no lugar dele
+    monkeypatch.setattr(incremental, 'CHECKPOINT_INTERVAL', 2)
+    inc = IncrementalParser().parse('a = 1\nb = 2\nc = 3\nd = 4\n')
+    inc.edit(len('a = 1\nb = '), 1, '9')
+    assert inc.stats['reanalyzed'] == 2  # o segmento anterior também entra na região
+    assert list(inc.symbol_table.to_dict()) == ['1', 'a', '9', 'b', '3', 'c', '4', 'd']
+    assert list(inc.symbol_table.to_dict().items()) == _full(inc.text)[1]
@@ -0,0 +1,90 @@
+# test_lexer_backends.py
+# O FastLexer deve produzir exatamente os mesmos tokens e erros que o lexer do
+# PLY (PythonLikeLexer), inclusive em streaming.
+import glob
+import io
+import os
+
+import pytest
+
+from diagnostics import Diagnostics
+from mylexer import create_lexer
+from program_generator import generate_program
+
+TESTES = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'testes')
+
+SNIPPETS = {
+    'empty': '',
+    'no-final-newline': 'x = 1\nprint(x)',
+    'blank-lines': '\n\n   \nx = 1\n\n\t\n',
+    'comments': '# topo\nx = 1  # fim\n    # só comentário indentado\ny = "# não é comentário"\n',
+    'illegal': 'x = 1 $ 2\ny = [1]\nz = {}\n',
+    'strings': 'a = "dupla"\nb = \'simples\'\nc = ""\nd = "com \'aspas\' dentro"\n',
+    'operators': 'x = a <= b >= c == d != e < f > g\ny = (a + b) * c / d - e\n',
+    'keywords': 'if not True and False or x:\n    while x:\n        pass\nelse:\n    print(x)\n',
+    'dedent-to-unknown-level': 'if x:\n        y = 1\n    z = 2\n',
+    'unexpected-indent': 'x = 1\n    y = 2\n',
+    'tabs': 'if x:\n\ty = 1\n\tif y:\n\t\tz = 2\n',
+    'crlf': 'x = 1\r\nif x:\r\n    y = 2\r\n',
+    'nested-close': 'if a:\n    if b:\n        if c:\n            x = 1',
+}
+
+
+def _sources():
+    for path in sorted(glob.glob(os.path.join(TESTES, '*.txt'))):
+        with open(path) as f:
+            yield os.path.basename(path), f.read()
+    for name, code in SNIPPETS.items():
+        yield name, code
+    for seed in range(5):
+        yield f'gerado-{seed}', generate_program(150, depth=4, expr_size=6, identifiers=25,
+                                                 seed=seed)
+
+
+SOURCES = list(_sources())
+IDS = [name for name, _ in SOURCES]
+
+
+def _tokenize(backend, code, chunk_size=None):
+    """(tokens, erros, flag de erro) de um backend; chunk_size usa tokenize_stream."""
+    diagnostics = Diagnostics()
+    lexer = create_lexer(backend, diagnostics)
+    if chunk_size is None:
+        lexer.input(code)
+        tokens = iter(lexer.token, None)
+    else:
+        tokens = lexer.tokenize_stream(io.BytesIO(code.encode('utf-8')), chunk_size)
+    result = [(tok.type, tok.value, tok.lineno, tok.lexpos) for tok in tokens]
+    errors = [record.to_dict() for record in diagnostics.records]
+    return result, errors, lexer.error
+
+
+@pytest.mark.parametrize('code', [code for _, code in SOURCES], ids=IDS)
+def test_same_tokens_and_errors(code):
+    assert _tokenize('fast', code) == _tokenize('ply', code)
+
+
+@pytest.mark.parametrize('code', [code for _, code in SOURCES], ids=IDS)
+@pytest.mark.parametrize('chunk_size', [7, 64])
+def test_same_tokens_when_streaming(code, chunk_size):
+    ply_stream = _tokenize('ply', code, chunk_size)
+    assert _tokenize('fast', code, chunk_size) == ply_stream
+    # Em streaming o trecho 'rest' das mensagens para no fim do pedaço lido
+    tokens, errors, error = _tokenize('ply', code)
+    assert ply_stream[0] == tokens and ply_stream[2] == error
+    assert ([(e['code'], e['line'], e['offset']) for e in ply_stream[1]]
+            == [(e['code'], e['line'], e['offset']) for e in errors])
+
+
+def test_lexer_reuse():
+    """Um lexer reaproveitado depois de uma entrada com erros volta ao estado limpo."""
+    code = SNIPPETS['keywords']
+    expected = _tokenize('ply', code)
+    for backend in ('ply', 'fast'):
+        diagnostics = Diagnostics()
+        lexer = create_lexer(backend, diagnostics)
+        for text in (SNIPPETS['illegal'], SNIPPETS['dedent-to-unknown-level'], code):
+            diagnostics.clear()
+            lexer.input(text)
+            tokens = [(t.type, t.value, t.lineno, t.lexpos) for t in iter(lexer.token, None)]
+        assert (tokens, [r.to_dict() for r in diagnostics.records], lexer.error) == expected
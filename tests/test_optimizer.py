@@ -0,0 +1,47 @@
+# test_optimizer.py
+# Otimizador (-O): a simplificação algébrica não esconde erros de tipo que a
+# análise semântica reportaria sem otimização.
+import pytest
+
+from diagnostics import Diagnostics
+from optimizer import ASTOptimizer
+from parser_ast import PythonLikeParser
+from semantic_analyzer import SemanticAnalyzer
+
+
+def _run(code, optimize):
+    diagnostics = Diagnostics()
+    root = PythonLikeParser(diagnostics=diagnostics).parse(code)
+    optimizer = ASTOptimizer(diagnostics)
+    if optimize:
+        root = optimizer.optimize(root)
+    SemanticAnalyzer(diagnostics).analyze(root)
+    errors = [(r.code, r.line) for r in diagnostics.records if r.severity == 'error']
+    return errors, optimizer.stats
+
+
+@pytest.mark.parametrize('code', [
+    'y = ("a" - 1) + 0\n',
+    'y = 1 * ("a" * 2)\n',
+    'z = (not 3) and True\n',
+    'w = (1 < "a") or False\n',
+    'v = not not ("a" - 1 < 2)\n',
+    'u = (nunca - 1) - 0\n',
+    'x = "s"\nt = (x - 1) * 1\n',
+])
+def test_simplification_keeps_type_errors(code):
+    errors, _ = _run(code, optimize=True)
+    assert errors == _run(code, optimize=False)[0]
+    assert errors
+
+
+@pytest.mark.parametrize('code', [
+    'y = (1 / 0) + 0\n',
+    'y = 1 * (2 / 0 - 1)\n',
+    'b = (1 / 0 < 2) and True\n',
+    'b = not not (1 / 0 < 2)\n',
+])
+def test_valid_expressions_are_simplified(code):
+    errors, stats = _run(code, optimize=True)
+    assert errors == []
+    assert stats['algebraic-simplified'] == 1
@@ -0,0 +1,40 @@
+# test_server.py
+# Modo servidor (server.py): pedidos em JSON Lines e o caminho do --socket.
+import io
+import json
+import socket
+
+import pytest
+
+from server import AnalysisService, remove_stale_socket, serve_stdio, serve_unix
+
+unix_only = pytest.mark.skipif(not hasattr(socket, 'AF_UNIX'), reason='sem sockets Unix')
+
+
+@unix_only
+def test_regular_file_is_kept(tmp_path, capsys):
+    path = tmp_path / 'notas.txt'
+    path.write_text('importante')
+    assert remove_stale_socket(str(path)) is False
+    assert serve_unix(AnalysisService(), str(path)) == 1
+    assert path.read_text() == 'importante'
+    assert 'não é um socket' in capsys.readouterr().err
+
+
+@unix_only
+def test_stale_socket_is_removed(tmp_path):
+    path = str(tmp_path / 's.sock')
+    with socket.socket(socket.AF_UNIX) as sock:
+        sock.bind(path)
+    assert remove_stale_socket(path) is True
+    assert not (tmp_path / 's.sock').exists()
+    assert remove_stale_socket(path) is True  # nada a apagar
+
+
+def test_stdio_requests():
+    infile = io.StringIO('{"id": 1, "source": "x = 1 + \\"a\\"\\n"}\n{"op": "shutdown"}\n')
+    outfile = io.StringIO()
+    serve_stdio(AnalysisService(), infile, outfile)
+    first, last = (json.loads(line) for line in outfile.getvalue().splitlines())
+    assert first['id'] == 1 and first['ok'] is False
+    assert last['shutdown'] is True
@@ -0,0 +1,133 @@
+# test_share_expressions.py
+# --share-expressions (AST como DAG + tipos memoizados) não muda os
+# diagnósticos: cada ocorrência de um nó compartilhado relata seus erros na
+# própria posição.
+import glob
+import io
+import os
+import random
+
+import pytest
+
+from diagnostics import Diagnostics
+from optimizer import ASTOptimizer
+from parser_ast import PythonLikeParser
+from program_generator import generate_program
+from semantic_analyzer import SemanticAnalyzer
+from vm import VMError, compile_program, execute
+
+TESTES = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'testes')
+
+SNIPPETS = [
+    # Memo hit: o erro de y + x aparece nas três linhas
+    'x = "a"\ny = 1\nz = y + x\nw = y + x\nv = y + x\n',
+    # A primeira ocorrência é válida só depois: o erro fica na linha 3
+    'z = q + 1\nq = "s"\nw = q + 1\n',
+    # Ocorrências em condições, blocos e unários
+    'a = 1\nif (a + "s") == 2:\n    b = a + "s"\nwhile not (a + "s"):\n  print(not (a + "s"))\n',
+    'x = 1\nif x:\n    print(x)\nif x:\n    print(x)\ny = not x\nz = not x\n',
+    # Mesma expressão duas vezes na mesma linha
+    'p = "s" + 1 + ("s" + 1)\nq = "s" + 1\n',
+    # Com -O: expressões dobradas várias vezes e primeira ocorrência num ramo removido
+    'a = not False\nb = not False and (1 + 2 > 2)\nc = 1 + 2 > 2\n',
+    'if False:\n    x = "a" + k\n    y = not False\nz = "a" + k\nw = not False\n',
+    'if True:\n    print(1)\nelse:\n    x = "a" * 2 + 0\nx = "a" * 2 + 0\n',
+    # Mesma expressão em indentações e colunas diferentes
+    'x = "a"\nif True:\n    y = x - 1\ny = x - 1\nlonger = (x - 1) - 0\nwhile not not (x - 1):\n  x = 1\n',
+]
+
+
+def _diagnostics(code, share, dataflow=False, optimize=False):
+    diagnostics = Diagnostics()
+    parser = PythonLikeParser(diagnostics=diagnostics, share_expressions=share)
+    root = parser.parse(code)
+    if optimize:
+        root = ASTOptimizer(diagnostics, share).optimize(root)
+    SemanticAnalyzer(diagnostics, memoize_types=share, dataflow=dataflow).analyze(root)
+    return [record.to_dict() for record in diagnostics.records]
+
+
+def _assert_same(code, **options):
+    expected = _diagnostics(code, False, **options)
+    assert _diagnostics(code, True, **options) == expected
+    return expected
+
+
+@pytest.mark.parametrize('optimize', [False, True])
+@pytest.mark.parametrize('dataflow', [False, True])
+@pytest.mark.parametrize('code', SNIPPETS)
+def test_snippets(code, dataflow, optimize):
+    _assert_same(code, dataflow=dataflow, optimize=optimize)
+
+
+def test_memo_hit_reports_every_occurrence():
+    records = _assert_same(SNIPPETS[0])
+    errors = [(r['line'], r['offset']) for r in records if r['severity'] == 'error']
+    assert errors == [(3, 20), (4, 30), (5, 40)]
+
+
+def test_shared_node_reports_current_position():
+    records = _assert_same(SNIPPETS[1])
+    errors = [(r['code'], r['line']) for r in records if r['severity'] == 'error']
+    assert ('invalid-operand-types', 3) in errors
+
+
+def test_nodes_are_shared():
+    parser = PythonLikeParser(diagnostics=Diagnostics(), share_expressions=True)
+    root = parser.parse(SNIPPETS[0])
+    z, w, v = (statement.children[1] for statement in root.children[2:5])
+    assert z is w is v
+
+
+def test_shared_at_any_indentation():
+    parser = PythonLikeParser(diagnostics=Diagnostics(), share_expressions=True)
+    root = parser.parse(SNIPPETS[-1])
+    inner = root.children[1].children[1].children[0].children[1]
+    outer = root.children[2].children[1]
+    longer = root.children[3].children[1]
+    assert inner is outer
+    # A raiz fica em outro deslocamento do statement, mas os filhos são os mesmos
+    assert longer.children[0] is not outer and longer.children[0].children == outer.children
+    # Nós compartilhados não guardam posição absoluta
+    assert outer.lineno is None
+
+
+def test_runtime_error_line():
+    code = 'a = 1\nprint(1 / a)\na = 0\nprint(1 / a)\n'
+    for share in (False, True):
+        root = PythonLikeParser(diagnostics=Diagnostics(), share_expressions=share).parse(code)
+        analyzer = SemanticAnalyzer(Diagnostics())
+        analyzer.analyze(root)
+        with pytest.raises(VMError) as error:
+            execute(compile_program(root, analyzer.symbol_table), io.StringIO())
+        assert error.value.line == 4
+
+
+@pytest.mark.parametrize('path', sorted(glob.glob(os.path.join(TESTES, '*.txt'))),
+                         ids=os.path.basename)
+def test_testes(path):
+    with open(path) as f:
+        code = f.read()
+    _assert_same(code)
+    _assert_same(code, dataflow=True, optimize=True)
+
+
+def _with_errors(code, seed):
+    """Insere statements com erro (repetidos) antes de linhas de nível superior."""
+    rng = random.Random(seed)
+    wrong = ['e = "e" - 1', 'e = nunca + 1', 'e = not 2', 'print("e" * "e")']
+    lines = []
+    for line in code.splitlines():
+        if line[:1] not in ('', ' ', '\t') and not line.startswith('else') and rng.random() < 0.2:
+            lines.append(rng.choice(wrong))
+        lines.append(line)
+    return '\n'.join(lines) + '\n'
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_generated_programs(seed):
+    # Poucos identificadores: muitas expressões repetidas
+    code = _with_errors(generate_program(300, depth=3, expr_size=3, identifiers=4, seed=seed), seed)
+    records = _assert_same(code, dataflow=True)
+    assert any(r['severity'] == 'error' for r in records)
+    _assert_same(code, optimize=True)
@@ -0,0 +1,71 @@
+# test_streaming.py
+# Pipeline statement a statement (--stream, streaming.py): para os programas de
+# testes/ a tabela de símbolos, os diagnósticos e a árvore do DOT são os mesmos
+# do --run.
+import glob
+import json
+import os
+import re
+
+import pytest
+
+import main
+from program_generator import generate_program
+
+TESTES = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'testes')
+
+_NODE = re.compile(r'^"(\w+)" \[label="((?:[^"\\]|\\.)*)"(.*)\];$')
+_EDGE = re.compile(r'^"(\w+)" -> "(\w+)";$')
+
+
+def _dot_tree(path):
+    """Árvore do DOT como tuplas (rótulo, filhos...), sem depender dos ids dos nós."""
+    labels, edges, targets = {}, {}, set()
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            node, edge = _NODE.match(line), _EDGE.match(line)
+            if node:
+                labels[node.group(1)] = node.group(2) + node.group(3)  # rótulo e cor
+            elif edge:
+                edges.setdefault(edge.group(1), []).append(edge.group(2))
+                targets.add(edge.group(2))
+    root, = (name for name in labels if name not in targets)
+
+    def build(name):
+        return (labels[name],) + tuple(build(child) for child in edges.get(name, ()))
+    return build(root)
+
+
+def _run(argv, capsys):
+    exit_code = main.main(argv)
+    out = capsys.readouterr().out
+    if '--stream' in argv:
+        records = [json.loads(line) for line in out.splitlines() if line.startswith('{')]
+    else:
+        records = json.loads(out[out.index('\n[') + 1:])
+    with open('symbol_table.json') as f:
+        symbols = f.read()
+    return exit_code, records, symbols, _dot_tree('ast.dot')
+
+
+@pytest.mark.parametrize('options', [[], ['--share-expressions'], ['-O']],
+                         ids=['arvore', 'dag', 'otimizado'])
+@pytest.mark.parametrize('path', sorted(glob.glob(os.path.join(TESTES, '*.txt'))),
+                         ids=os.path.basename)
+def test_stream_matches_run(path, options, tmp_path, monkeypatch, capsys):
+    monkeypatch.chdir(tmp_path)
+    common = ['--no-png', '--no-cache', '--diagnostics', 'json'] + options + [path]
+    expected = _run(['--run'] + common, capsys)
+    assert _run(['--run', '--stream'] + common, capsys) == expected
+    assert os.path.exists('symbol_table.jsonl')
+
+
+def test_stream_matches_run_generated(tmp_path, monkeypatch, capsys):
+    monkeypatch.chdir(tmp_path)
+    path = tmp_path / 'gerado.txt'
+    path.write_text(generate_program(300, depth=4, seed=5))
+    common = ['--no-png', '--no-cache', '--diagnostics', 'json', str(path)]
+    expected = _run(['--run'] + common, capsys)
+    assert expected[1]  # o programa gerado produz diagnósticos
+    assert _run(['--run', '--stream'] + common, capsys) == expected
@@ -0,0 +1,140 @@
+# test_symbol_index.py
+# Índice de símbolos em SQLite (symbol_index.py): a reindexação só reanalisa
+# os arquivos que mudaram e tira do índice os que foram apagados.
+import os
+
+import pytest
+
+import symbol_index
+from symbol_index import SymbolIndex, index_files
+
+FILES = {
+    'a.txt': 'x = 1\nprint(x)\n',
+    'b.txt': 'y = "s"\nx = y\n',
+    'c.txt': 'z = True\nif z:\n    w = 2\n',
+}
+
+
+@pytest.fixture
+def corpus(tmp_path):
+    src = tmp_path / 'src'
+    src.mkdir()
+    for name, text in FILES.items():
+        (src / name).write_text(text)
+    return src, str(tmp_path / 'simbolos.db')
+
+
+@pytest.fixture
+def analyzed(monkeypatch):
+    """Arquivos lidos por _analyze_file (só com jobs=1: a função não vai para o pool)."""
+    paths = []
+    analyze = symbol_index._analyze_file
+
+    def spy(task):
+        paths.append(os.path.basename(task[0]))
+        return analyze(task)
+
+    monkeypatch.setattr(symbol_index, '_analyze_file', spy)
+    return paths
+
+
+def _index(db, src, jobs=1):
+    with SymbolIndex(db) as index:
+        return index_files(index, [str(src)], jobs=jobs)
+
+
+def _assigns(db, name):
+    with SymbolIndex(db) as index:
+        return [(os.path.basename(path), line, data_type)
+                for path, line, _, _, data_type, _ in index.find(name, kind='assign')]
+
+
+def _indexed_at(db, name):
+    with SymbolIndex(db) as index:
+        return index.conn.execute("SELECT indexed_at FROM files WHERE path = ?",
+                                  (os.path.join(os.path.dirname(db), 'src', name),)).fetchone()
+
+
+def _bump_mtime(path):
+    st = os.stat(path)
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 10 ** 9))
+
+
+def test_first_index_and_queries(corpus, analyzed):
+    src, db = corpus
+    assert _index(db, src) == {'indexados': 3, 'sem mudança': 0, 'removidos': 0}
+    assert sorted(analyzed) == sorted(FILES)
+    assert _assigns(db, 'x') == [('a.txt', 1, 'number'), ('b.txt', 2, 'string')]
+    with SymbolIndex(db) as index:
+        assert [row[1:] for row in index.find_symbols('[wz]', category='variable')] == \
+            [('w', 'variable', 'number'), ('z', 'variable', 'boolean')]
+        assert index.find('x', kind='use')[0][1:4] == (2, 7, 'use')
+
+
+def test_unchanged_files_are_skipped(corpus, analyzed):
+    src, db = corpus
+    _index(db, src)
+    del analyzed[:]
+    assert _index(db, src) == {'indexados': 0, 'sem mudança': 3, 'removidos': 0}
+    assert analyzed == []
+
+
+def test_only_changed_file_is_reanalyzed(corpus, analyzed):
+    src, db = corpus
+    _index(db, src)
+    del analyzed[:]
+    (src / 'a.txt').write_text('x = "novo"\nprint(x)\n')
+    _bump_mtime(src / 'a.txt')
+    assert _index(db, src) == {'indexados': 1, 'sem mudança': 2, 'removidos': 0}
+    assert analyzed == ['a.txt']
+    assert _assigns(db, 'x') == [('a.txt', 1, 'string'), ('b.txt', 2, 'string')]
+
+
+def test_same_content_new_mtime_keeps_entry(corpus, analyzed):
+    # O arquivo é lido de novo (o mtime mudou), mas o hash igual evita gravar
+    src, db = corpus
+    _index(db, src)
+    before = _indexed_at(db, 'c.txt')
+    del analyzed[:]
+    _bump_mtime(src / 'c.txt')
+    assert _index(db, src) == {'indexados': 0, 'sem mudança': 3, 'removidos': 0}
+    assert analyzed == ['c.txt']
+    assert _indexed_at(db, 'c.txt') == before
+    del analyzed[:]
+    _index(db, src)
+    assert analyzed == []  # o mtime novo foi gravado
+
+
+def test_removed_file_leaves_index(corpus):
+    src, db = corpus
+    _index(db, src)
+    os.remove(src / 'b.txt')
+    assert _index(db, src) == {'indexados': 0, 'sem mudança': 2, 'removidos': 1}
+    assert _assigns(db, 'x') == [('a.txt', 1, 'number')]
+    with SymbolIndex(db) as index:
+        assert index.counts()['files'] == 2
+        # symbols/occurrences saem junto (ON DELETE CASCADE)
+        for table in ('symbols', 'occurrences'):
+            orphans, = index.conn.execute(f"SELECT COUNT(*) FROM {table} WHERE file_id NOT IN"
+                                          " (SELECT id FROM files)").fetchone()
+            assert orphans == 0
+        assert not index.find_symbols('y')
+
+
+def test_new_pipeline_stamp_reindexes_everything(corpus, analyzed, monkeypatch):
+    src, db = corpus
+    _index(db, src)
+    del analyzed[:]
+    monkeypatch.setattr(symbol_index, 'INDEX_VERSION', symbol_index.INDEX_VERSION + 1)
+    assert _index(db, src)['indexados'] == 3
+    assert sorted(analyzed) == sorted(FILES)
+
+
+def test_pool_matches_single_process(corpus, tmp_path):
+    src, db = corpus
+    _index(db, src)
+    pooled = str(tmp_path / 'pool.db')
+    assert _index(pooled, src, jobs=2)['indexados'] == 3
+    with SymbolIndex(db) as single, SymbolIndex(pooled) as pool:
+        assert pool.find_symbols() == single.find_symbols()
+        assert pool.find('*') == single.find('*')
@@ -0,0 +1,54 @@
+# test_symbol_table.py
+# Exportação da tabela de símbolos no formato plano do symbol_table.json.
+import json
+
+from diagnostics import Diagnostics
+from parser_ast import PythonLikeParser
+from semantic_analyzer import SemanticAnalyzer
+from symbol_table import SymbolTable
+
+
+def _table(code):
+    analyzer = SemanticAnalyzer(Diagnostics())
+    analyzer.analyze(PythonLikeParser(diagnostics=Diagnostics()).parse(code))
+    return analyzer.symbol_table
+
+
+def test_to_dict_keeps_order_of_appearance():
+    table = _table('x = 1\ny = "a" + "b"\nprint(x + 2)\nx = 1\n')
+    assert list(table.to_dict()) == ['1', 'x', 'a', 'b', '+', 'y', 'print', '2']
+
+
+def test_to_dict_entries():
+    data = _table('x = 1\nz = 1 + x\nb = True\n').to_dict()
+    assert data['x'] == {'category': 'variable', 'data_type': 'number',
+                         'description': "User-defined variable 'x' of type number"}
+    assert data['1'] == {'category': 'literal-value', 'data_type': 'number',
+                         'description': 'Literal value of type number', 'occurrences': 2}
+    # Com o tipo na chave do pool, True e 1 são literais diferentes
+    assert data['true']['data_type'] == 'boolean'
+
+
+def test_first_registered_key_wins():
+    # A string "x" aparece antes da variável x: fica o literal, como no formato antigo
+    data = _table('y = "x"\nx = 2\n').to_dict()
+    assert data['x']['category'] == 'literal-value'
+    data = _table('x = 2\ny = "x"\n').to_dict()
+    assert data['x']['category'] == 'variable'
+
+
+def test_from_dict_roundtrip():
+    table = _table('a = 3\nif a > 1:\n    s = "t"\nprint(s + "u")\nb = not False\n')
+    data = json.loads(json.dumps(table.to_dict()))
+    rebuilt = SymbolTable.from_dict(data)
+    assert list(rebuilt.to_dict().items()) == list(data.items())
+    assert rebuilt.same_symbols(table)
+
+
+def test_copy_is_independent():
+    table = _table('a = 3\n')
+    copy = table.copy()
+    copy.define('b', 'variable', 'string')
+    copy.set_type(copy.lookup('a'), 'string')
+    assert 'b' not in table and table.lookup('a').data_type == 'number'
+    assert not table.same_symbols(copy)
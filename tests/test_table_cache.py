@@ -0,0 +1,53 @@
+# test_table_cache.py
+# Cache das tabelas do PLY: tabelas truncadas são geradas de novo e nenhuma
+# gravação deixa arquivos temporários para trás.
+import glob
+import os
+import sys
+
+import pytest
+
+from diagnostics import Diagnostics
+from mylexer import PythonLikeLexer
+from parser_ast import PythonLikeParser
+from table_cache import cache_dir, definitions_hash
+
+
+@pytest.fixture
+def empty_cache(tmp_path, monkeypatch):
+    monkeypatch.setenv('PYTHONLIKE_CACHE_DIR', str(tmp_path))
+    # O lextab importado por outro teste ficaria em sys.modules
+    monkeypatch.delitem(sys.modules, 'lextab_' + definitions_hash(PythonLikeLexer, 't_'), raising=False)
+    return cache_dir()
+
+
+def _parse_ok():
+    parser = PythonLikeParser(diagnostics=Diagnostics())
+    root = parser.parse('x = 1\nif x > 0:\n    print(x)\n')
+    assert not parser.error and [child.type for child in root.children] == ['assign', 'if']
+
+
+def _tables(directory):
+    return sorted(glob.glob(os.path.join(directory, 'parsetab_*.pickle')) +
+                  glob.glob(os.path.join(directory, 'lextab_*.py')))
+
+
+def test_tables_are_written_once(empty_cache):
+    _parse_ok()
+    tables = _tables(empty_cache)
+    assert len(tables) == 2
+    assert sorted(os.listdir(empty_cache)) == sorted(os.path.basename(t) for t in tables)
+
+
+@pytest.mark.parametrize('kind', ['parsetab', 'lextab'])
+def test_truncated_table_is_rebuilt(empty_cache, kind, monkeypatch):
+    _parse_ok()
+    table, = glob.glob(os.path.join(empty_cache, kind + '_*'))
+    size = os.path.getsize(table)
+    with open(table, 'r+b') as f:
+        f.truncate(size // 2)
+    monkeypatch.delitem(sys.modules, 'lextab_' + definitions_hash(PythonLikeLexer, 't_'), raising=False)
+    _parse_ok()
+    assert os.path.getsize(table) == size
+    _parse_ok()
+    assert len(os.listdir(empty_cache)) == 2
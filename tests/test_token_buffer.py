@@ -0,0 +1,46 @@
+# test_token_buffer.py
+# Ida e volta do formato binário de tokens (--tokens-format bin).
+import io
+
+from diagnostics import Diagnostics
+from mylexer import create_lexer
+from token_buffer import TokenBuffer, write_tokens
+
+
+def _tokens(code):
+    lexer = create_lexer('ply', Diagnostics())
+    lexer.input(code)
+    return list(iter(lexer.token, None))
+
+
+def _roundtrip(buf):
+    out = io.BytesIO()
+    buf.write_binary(out)
+    out.seek(0)
+    return TokenBuffer.read_binary(out)
+
+
+def _as_tuples(tokens):
+    return [(tok.type, tok.value, tok.lineno, tok.lexpos) for tok in tokens]
+
+
+def test_binary_roundtrip():
+    code = 'x = 1\nif x > 0:\n    print("olá")\ny = -9223372036854775808\n'
+    tokens = _tokens(code)
+    assert _as_tuples(_roundtrip(TokenBuffer(tokens))) == _as_tuples(tokens)
+
+
+def test_binary_roundtrip_numbers_beyond_64_bits():
+    code = 'x = 99999999999999999999\ny = 9223372036854775807\nz = 9223372036854775808\n'
+    tokens = _tokens(code)
+    buf = _roundtrip(TokenBuffer(tokens))
+    assert _as_tuples(buf) == _as_tuples(tokens)
+    numbers = [tok.value for tok in buf if tok.type == 'NUMBER']
+    assert numbers == [99999999999999999999, 2 ** 63 - 1, 2 ** 63]
+
+
+def test_write_tokens_bin_accepts_big_numbers():
+    out = io.BytesIO()
+    write_tokens(iter(_tokens('x = 99999999999999999999\n')), out, 'bin')
+    out.seek(0)
+    assert 99999999999999999999 in TokenBuffer.read_binary(out).values
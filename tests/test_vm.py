@@ -0,0 +1,76 @@
+# test_vm.py
+# A VM de bytecode e o TreeInterpreter executam os programas gerados (modo
+# executável do gerador) com a mesma saída; o Program fica em cache por AST.
+import io
+
+import pytest
+
+import benchmark
+from diagnostics import Diagnostics, ERROR
+from parser_ast import PythonLikeParser
+from program_generator import generate_program
+from semantic_analyzer import SemanticAnalyzer
+from vm import VMError, compile_program, execute, TreeInterpreter
+
+
+def _analyze(code):
+    diagnostics = Diagnostics(level=ERROR)
+    parser = PythonLikeParser(diagnostics=diagnostics)
+    ast = parser.parse(code)
+    analyzer = SemanticAnalyzer(diagnostics)
+    analyzer.analyze(ast)
+    assert not parser.error and not diagnostics.records
+    return ast, analyzer.symbol_table
+
+
+@pytest.mark.parametrize('seed', range(4))
+@pytest.mark.parametrize('params', [dict(statements=80, depth=2, expr_size=4, identifiers=10),
+                                    dict(statements=40, depth=5, expr_size=8, identifiers=30)],
+                         ids=['raso', 'profundo'])
+def test_vm_matches_tree_interpreter(params, seed):
+    ast, symbol_table = _analyze(generate_program(seed=seed, loop_limit=5, **params))
+    vm_out, tree_out = io.StringIO(), io.StringIO()
+    execute(compile_program(ast, symbol_table), vm_out)
+    TreeInterpreter(tree_out).run(ast)
+    assert vm_out.getvalue() == tree_out.getvalue()
+    assert vm_out.getvalue()
+
+
+def test_loop_limit_bounds_iterations():
+    code = generate_program(statements=30, depth=3, seed=1, loop_limit=3)
+    assert 'while (w0 < 3) and ' in code
+    ast, symbol_table = _analyze(code)
+    execute(compile_program(ast, symbol_table), io.StringIO())
+
+
+def test_generator_default_unchanged_by_loop_limit_option():
+    code = generate_program(statements=50, depth=3, seed=2)
+    assert 'w0' not in code
+    assert code == generate_program(statements=50, depth=3, seed=2, loop_limit=None)
+
+
+def test_benchmark_exec_stages():
+    out = io.StringIO()
+    data = benchmark.run_benchmarks(['base'], ['compile', 'exec', 'interp'], repeat=1, scale=0.1,
+                                    out=out, loop_limit=3)
+    assert set(data['results']) == {'compile/base', 'exec/base', 'interp/base'}
+    assert data['meta']['loop_limit'] == 3
+
+
+def test_program_cached_per_ast():
+    code = generate_program(statements=30, depth=3, seed=3, loop_limit=3)
+    ast, symbol_table = _analyze(code)
+    program = compile_program(ast, symbol_table)
+    assert compile_program(ast, symbol_table) is program
+    other, other_table = _analyze(code)
+    assert compile_program(other, other_table) is not program
+    assert compile_program(other, other_table).code == program.code
+
+
+def test_runtime_error_line_in_while_condition():
+    code = 'x = 0\nwhile x < 3:\n    x = x + 1\ny = 1\nwhile (y / 0) > x:\n    y = 2\n'
+    ast, symbol_table = _analyze(code)
+    out = io.StringIO()
+    with pytest.raises(VMError) as info:
+        execute(compile_program(ast, symbol_table), out)
+    assert (info.value.code, info.value.line) == ('division-by-zero', 5)
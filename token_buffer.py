@@ -0,0 +1,238 @@
+# token_buffer.py
+# Sequência compacta de tokens e formatos de saída em lote para o modo --tokens.
+#
+# Em vez de uma lista de LexToken (um objeto com __dict__ por token), o
+# TokenBuffer guarda arrays paralelos: id do tipo, id do valor, linha e posição.
+# Tipos e valores ficam em tabelas internadas, então NAME 'x' repetido mil vezes
+# ocupa uma única entrada na tabela de valores.
+import json
+import struct
+import sys
+from array import array
+
+from mylexer import Token
+
+# ---------------------------
+# Formato binário (little-endian)
+# ---------------------------
+#   magic b'PLTK', versão u16
+#   tabela de tipos:   u32 n, n x (u16 tamanho + utf-8)
+#   tabela de valores: u32 n, n x (u8 tipo: 0=None, 1=int, 2=str, 3=inteiro
+#                      fora de 64 bits em decimal + dados)
+#   u32 quantidade de tokens, depois os arrays: tipos (u16), valores (u32),
+#   linhas (u32) e posições (u32)
+BINARY_MAGIC = b'PLTK'
+BINARY_VERSION = 1
+
+_VALUE_NONE = 0
+_VALUE_INT = 1
+_VALUE_STR = 2
+_VALUE_BIGINT = 3
+
+_INT64 = (-(1 << 63), (1 << 63) - 1)
+
+# Formatos aceitos por write_tokens (e pela opção --tokens-format do CLI)
+TOKEN_FORMATS = ('text', 'tsv', 'jsonl', 'bin')
+
+
+class TokenBuffer:
+    """Tokens guardados em arrays paralelos (tipo, valor, linha, posição)."""
+
+    def __init__(self, tokens=None):
+        self.type_names = []     # id -> nome do tipo
+        self._type_ids = {}
+        self.values = []         # id -> valor (str, int ou None)
+        self._value_ids = {}
+        self.type_ids = array('H')
+        self.value_ids = array('I')
+        self.linenos = array('I')
+        self.lexpos = array('I')
+        if tokens is not None:
+            self.extend(tokens)
+
+    # ---------------------------
+    # Construção
+    # ---------------------------
+    def _intern_type(self, type_):
+        type_id = self._type_ids.get(type_)
+        if type_id is None:
+            type_id = self._type_ids[type_] = len(self.type_names)
+            self.type_names.append(type_)
+        return type_id
+
+    def _intern_value(self, value):
+        # (tipo, valor) para que 1 e '1' não virem a mesma entrada
+        key = (value.__class__, value)
+        value_id = self._value_ids.get(key)
+        if value_id is None:
+            value_id = self._value_ids[key] = len(self.values)
+            self.values.append(value)
+        return value_id
+
+    def append(self, tok):
+        self.type_ids.append(self._intern_type(tok.type))
+        self.value_ids.append(self._intern_value(tok.value))
+        self.linenos.append(tok.lineno)
+        self.lexpos.append(tok.lexpos)
+
+    def extend(self, tokens):
+        for tok in tokens:
+            self.append(tok)
+
+    # ---------------------------
+    # Acesso
+    # ---------------------------
+    def __len__(self):
+        return len(self.type_ids)
+
+    def __getitem__(self, i):
+        return Token(self.type_names[self.type_ids[i]], self.values[self.value_ids[i]],
+                     self.linenos[i], self.lexpos[i])
+
+    def __iter__(self):
+        type_names = self.type_names
+        values = self.values
+        for type_id, value_id, lineno, lexpos in zip(self.type_ids, self.value_ids,
+                                                     self.linenos, self.lexpos):
+            yield Token(type_names[type_id], values[value_id], lineno, lexpos)
+
+    def type_of(self, i):
+        return self.type_names[self.type_ids[i]]
+
+    def value_of(self, i):
+        return self.values[self.value_ids[i]]
+
+    # ---------------------------
+    # Serialização binária
+    # ---------------------------
+    def write_binary(self, out):
+        """Grava o buffer no formato binário em um arquivo aberto em modo 'wb'."""
+        out.write(BINARY_MAGIC)
+        out.write(struct.pack('<H', BINARY_VERSION))
+
+        out.write(struct.pack('<I', len(self.type_names)))
+        for name in self.type_names:
+            data = name.encode('utf-8')
+            out.write(struct.pack('<H', len(data)))
+            out.write(data)
+
+        out.write(struct.pack('<I', len(self.values)))
+        for value in self.values:
+            if value is None:
+                out.write(struct.pack('<B', _VALUE_NONE))
+            elif isinstance(value, int) and _INT64[0] <= value <= _INT64[1]:
+                out.write(struct.pack('<Bq', _VALUE_INT, value))
+            elif isinstance(value, int):
+                data = str(value).encode('ascii')
+                out.write(struct.pack('<BI', _VALUE_BIGINT, len(data)))
+                out.write(data)
+            else:
+                data = value.encode('utf-8')
+                out.write(struct.pack('<BI', _VALUE_STR, len(data)))
+                out.write(data)
+
+        out.write(struct.pack('<I', len(self)))
+        for arr in (self.type_ids, self.value_ids, self.linenos, self.lexpos):
+            if sys.byteorder == 'big':
+                arr = array(arr.typecode, arr)
+                arr.byteswap()
+            arr.tofile(out)
+
+    @classmethod
+    def read_binary(cls, f):
+        """Lê um buffer gravado por write_binary de um arquivo aberto em modo 'rb'."""
+        def read(fmt):
+            size = struct.calcsize(fmt)
+            return struct.unpack(fmt, f.read(size))
+
+        if f.read(4) != BINARY_MAGIC:
+            raise ValueError("Arquivo de tokens inválido (assinatura incorreta)")
+        version, = read('<H')
+        if version != BINARY_VERSION:
+            raise ValueError(f"Versão de arquivo de tokens não suportada: {version}")
+
+        buf = cls()
+        count, = read('<I')
+        for _ in range(count):
+            size, = read('<H')
+            buf._intern_type(f.read(size).decode('utf-8'))
+
+        count, = read('<I')
+        for _ in range(count):
+            kind, = read('<B')
+            if kind == _VALUE_NONE:
+                buf._intern_value(None)
+            elif kind == _VALUE_INT:
+                buf._intern_value(read('<q')[0])
+            elif kind == _VALUE_BIGINT:
+                size, = read('<I')
+                buf._intern_value(int(f.read(size)))
+            else:
+                size, = read('<I')
+                buf._intern_value(f.read(size).decode('utf-8'))
+
+        count, = read('<I')
+        for arr in (buf.type_ids, buf.value_ids, buf.linenos, buf.lexpos):
+            arr.fromfile(f, count)
+            if sys.byteorder == 'big':
+                arr.byteswap()
+        return buf
+
+
+# ---------------------------
+# Saída em lote (--tokens)
+# ---------------------------
+def _tsv_escape(text):
+    return text.replace('\\', '\\\\').replace('\t', '\\t').replace('\n', '\\n')
+
+
+def _text_lines(tokens):
+    yield "Tokens:\n"
+    for tok in tokens:
+        yield f"{tok.type}\t{tok.value!r}\t(lineno={tok.lineno}, pos={tok.lexpos})\n"
+
+
+def _tsv_lines(tokens):
+    yield "type\tvalue\tlineno\tlexpos\n"
+    for tok in tokens:
+        value = tok.value
+        value = '' if value is None else _tsv_escape(str(value))
+        yield f"{tok.type}\t{value}\t{tok.lineno}\t{tok.lexpos}\n"
+
+
+def _jsonl_lines(tokens):
+    encode = json.JSONEncoder(ensure_ascii=False).encode
+    for tok in tokens:
+        yield (f'{{"type": {encode(tok.type)}, "value": {encode(tok.value)}, '
+               f'"lineno": {tok.lineno}, "lexpos": {tok.lexpos}}}\n')
+
+
+_LINE_FORMATS = {'text': _text_lines, 'tsv': _tsv_lines, 'jsonl': _jsonl_lines}
+
+# Quantidade de linhas juntadas em cada write()
+_WRITE_BATCH = 4096
+
+
+def write_tokens(tokens, out, fmt='text'):
+    """Escreve os tokens no formato pedido.
+
+    Os formatos de texto são escritos à medida que os tokens chegam (sem guardar
+    a lista), em blocos de linhas; 'bin' monta um TokenBuffer e exige um arquivo
+    binário em out.
+    """
+    if fmt == 'bin':
+        buf = tokens if isinstance(tokens, TokenBuffer) else TokenBuffer(tokens)
+        buf.write_binary(out)
+        return
+    try:
+        lines = _LINE_FORMATS[fmt](tokens)
+    except KeyError:
+        raise ValueError(f"Formato de tokens desconhecido: {fmt!r}") from None
+    batch = []
+    for line in lines:
+        batch.append(line)
+        if len(batch) >= _WRITE_BATCH:
+            out.write(''.join(batch))
+            batch.clear()
+    if batch:
+        out.write(''.join(batch))
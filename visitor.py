@@ -0,0 +1,63 @@
+# visitor.py
+# Percurso iterativo da AST com despacho por tabela (tipo do nó -> handler).
+#
+# Um handler recebe o nó e pode:
+#   - devolver o resultado diretamente (função comum, ex.: folhas);
+#   - ser um gerador que faz "yield filho" para visitar um filho e recebe o
+#     resultado dessa visita como valor do yield; o "return" do gerador é o
+#     resultado do nó.
+# O NodeVisitor mantém os geradores em uma pilha explícita, então a
+# profundidade da árvore não depende do limite de recursão do Python.
+from types import GeneratorType
+
+
+def dispatch_table(obj, prefix):
+    """Monta {tipo do nó: método} a partir dos métodos obj.<prefix><tipo>."""
+    return {
+        name[len(prefix):]: getattr(obj, name)
+        for name in dir(obj)
+        if name.startswith(prefix) and callable(getattr(obj, name))
+    }
+
+
+class NodeVisitor:
+    prefix = 'visit_'
+
+    def __init__(self, handlers=None, default=None):
+        # Sem tabela explícita, usa os métodos visit_<tipo> da própria classe
+        self.handlers = handlers if handlers is not None else dispatch_table(self, self.prefix)
+        self.default = default if default is not None else self.generic_visit
+
+    def generic_visit(self, node):
+        """Handler padrão: visita os filhos em ordem e não produz resultado."""
+        for child in node.children:
+            yield child
+
+    def visit(self, node):
+        if node is None:
+            return None
+        handlers = self.handlers
+        default = self.default
+
+        result = handlers.get(node.type, default)(node)
+        if type(result) is not GeneratorType:
+            return result
+
+        stack = [result]
+        result = None
+        while stack:
+            try:
+                child = stack[-1].send(result)
+            except StopIteration as stop:
+                stack.pop()
+                result = stop.value
+                continue
+
+            if child is None:
+                result = None
+                continue
+            result = handlers.get(child.type, default)(child)
+            if type(result) is GeneratorType:
+                stack.append(result)
+                result = None
+        return result
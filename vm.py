@@ -0,0 +1,536 @@
+# vm.py
+# Compilador de bytecode e máquina virtual de pilha para os programas já
+# analisados (modo --exec).
+#
+# O bytecode é uma lista de instruções já decodificadas, tuplas
+# (opcode, a, b, c, d) de tamanho fixo:
+#   - constantes ficam em um pool (Program.consts) e são referenciadas pelo índice;
+#   - variáveis são resolvidas em tempo de compilação para um índice de slot,
+#     a partir das variáveis da tabela de símbolos;
+#   - operadores binários já vêm como a função do módulo operator;
+#   - if/while viram saltos (JUMP, JUMP_IF_FALSE, ...) com destino absoluto
+#     (índice da instrução).
+# Junto com o código vai uma tabela pc -> linha, usada só nas mensagens de erro.
+# O Program fica em cache por AST (compile_program): executar de novo a mesma
+# AST não compila outra vez.
+#
+# TreeInterpreter é um interpretador ingênuo que percorre a AST; serve de
+# referência para conferir e comparar o desempenho da VM (etapas exec e interp
+# do benchmark.py).
+import operator
+import sys
+
+from visitor import dispatch_table
+
+# ---------------------------
+# Opcodes
+# ---------------------------
+# Cada instrução tem o opcode e até 4 argumentos (os que sobram valem 0).
+# Operandos são índices no "frame" da execução: primeiro os slots das
+# variáveis, depois o pool de constantes. As operações binárias com um operando
+# folha (variável ou constante) leem a folha direto do frame (BINARY_L,
+# BINARY_R, BINARY_LR), sem passar pela pilha, e os casos mais comuns em laços
+# viram uma instrução só: atribuição de folha (MOVE), "x = a op b"
+# (BINARY_LR_STORE) e condição "a op b" seguida do salto (BINARY_LR_JUMP_IF_*).
+(LOAD, STORE, MOVE, BINARY, BINARY_L, BINARY_R, BINARY_LR, BINARY_LR_STORE, NOT, JUMP,
+ JUMP_IF_FALSE, JUMP_IF_TRUE, BINARY_LR_JUMP_IF_FALSE, BINARY_LR_JUMP_IF_TRUE,
+ JUMP_IF_FALSE_OR_POP, JUMP_IF_TRUE_OR_POP, PRINT, HALT) = range(18)
+
+OPCODE_NAMES = ('LOAD', 'STORE', 'MOVE', 'BINARY', 'BINARY_L', 'BINARY_R', 'BINARY_LR',
+                'BINARY_LR_STORE', 'NOT', 'JUMP', 'JUMP_IF_FALSE', 'JUMP_IF_TRUE',
+                'BINARY_LR_JUMP_IF_FALSE', 'BINARY_LR_JUMP_IF_TRUE', 'JUMP_IF_FALSE_OR_POP',
+                'JUMP_IF_TRUE_OR_POP', 'PRINT', 'HALT')
+
+_JUMPS = {JUMP, JUMP_IF_FALSE, JUMP_IF_TRUE, JUMP_IF_FALSE_OR_POP, JUMP_IF_TRUE_OR_POP}
+_BINARY_LR_OPS = {BINARY_LR, BINARY_LR_STORE, BINARY_LR_JUMP_IF_FALSE, BINARY_LR_JUMP_IF_TRUE}
+
+# Operadores binários: o argumento a de BINARY* é a própria função
+OPERATOR_SYMBOLS = ('+', '-', '*', '/', '<', '>', '<=', '>=', '==', '!=')
+_OPERATORS = (operator.add, operator.sub, operator.mul, operator.truediv, operator.lt,
+              operator.gt, operator.le, operator.ge, operator.eq, operator.ne)
+_OPERATOR_FUNCTIONS = dict(zip(OPERATOR_SYMBOLS, _OPERATORS))
+_OPERATOR_NAMES = dict(zip(_OPERATORS, OPERATOR_SYMBOLS))
+
+_LEAVES = ('var', 'number', 'string', 'boolean')
+
+# Programas compilados por AST: id(raiz) -> (raiz, slots, Program)
+_PROGRAM_CACHE_SIZE = 8
+_program_cache = {}
+
+
+class VMError(Exception):
+    """Erro em tempo de execução (divisão por zero, variável sem valor, ...)."""
+
+    def __init__(self, code, template, args, line=None):
+        super().__init__(template.format(**args))
+        self.code = code
+        self.template = template
+        self.args_ = args
+        self.line = line
+
+
+class _Unassigned(Exception):
+    def __init__(self, name):
+        self.name = name
+
+
+class _Unset:
+    """Valor inicial de uma variável: qualquer uso (operação, teste, print) falha.
+
+    Assim a VM não precisa conferir cada leitura de variável; o erro só aparece
+    quando o valor é de fato usado.
+    """
+    __slots__ = ('name',)
+
+    def __init__(self, name):
+        self.name = name
+
+    def _fail(self, *args):
+        raise _Unassigned(self.name)
+
+    __add__ = __radd__ = __sub__ = __rsub__ = __mul__ = __rmul__ = _fail
+    __truediv__ = __rtruediv__ = __lt__ = __gt__ = __le__ = __ge__ = _fail
+    __eq__ = __ne__ = __bool__ = __format__ = __str__ = _fail
+    __hash__ = object.__hash__
+
+
+class Program:
+    """Bytecode compilado: código, pool de constantes, nomes dos slots e linhas."""
+
+    def __init__(self, code, consts, names, lines):
+        self.code = code
+        self.consts = consts
+        self.names = names    # slot -> nome da variável
+        self.lines = lines    # (pc, linha) em ordem crescente de pc
+
+    def line_at(self, pc):
+        line = None
+        for start, lineno in self.lines:
+            if start > pc:
+                break
+            line = lineno
+        return line
+
+    def operand_repr(self, index):
+        if index < len(self.names):
+            return self.names[index]
+        return repr(self.consts[index - len(self.names)])
+
+
+# ---------------------------
+# Compilador
+# ---------------------------
+# Ações na pilha de trabalho do compilador (além dos nós a compilar):
+#   (_EMIT, instrução, linha)          emite a instrução
+#   (_EMIT_AT, instrução, linha, pos)  emite um salto e guarda o pc em pos
+#   (_PATCH, pos)                      o salto em pos[0] vai para o pc atual
+#   (_LINE, linha)                     o código seguinte é da linha
+_EMIT, _EMIT_AT, _PATCH, _LINE = range(4)
+
+_NOT = (NOT, 0, 0, 0, 0)
+_PRINT = (PRINT, 0, 0, 0, 0)
+
+
+class Compiler:
+    """Gera um Program a partir da AST verificada e da tabela de símbolos.
+
+    A compilação é um laço sobre uma pilha explícita: cada handler
+    _compile_<tipo> emite o que já pode e empilha, em ordem inversa, os filhos
+    e as ações que vêm depois deles.
+    """
+
+    def __init__(self, symbol_table):
+        self.slots = {}
+        for name in symbol_table.variables():
+            self.slots[name] = len(self.slots)
+        self._handlers = dispatch_table(self, '_compile_')
+
+    def compile(self, ast_root):
+        self.code = code = []
+        self.consts = []
+        self._const_index = {}
+        self.lines = []
+        self._work = work = [ast_root]
+        handlers = self._handlers
+        pop = work.pop
+        while work:
+            item = pop()
+            if item.__class__ is not tuple:
+                handlers.get(item.type, self._compile_other)(item)
+            elif item[0] == _PATCH:
+                self._patch(item[1][0])
+            elif item[0] == _LINE:
+                self._mark_line(item[1])
+            else:
+                self._mark_line(item[2])
+                if item[0] == _EMIT_AT:
+                    item[3].append(len(code))
+                code.append(item[1])
+        self._emit((HALT, 0, 0, 0, 0))
+        names = [None] * len(self.slots)
+        for name, slot in self.slots.items():
+            names[slot] = name
+        return Program(code, self.consts, names, self.lines)
+
+    # Emissão
+    def _emit(self, instruction, lineno=None):
+        self._mark_line(lineno)
+        self.code.append(instruction)
+        return len(self.code) - 1  # pc da instrução (para corrigir saltos)
+
+    def _mark_line(self, lineno):
+        """A partir daqui o código é da linha lineno.
+
+        Os statements marcam a linha antes do código da expressão: com
+        share_expressions os nós de expressão não têm linha.
+        """
+        if lineno is not None and (not self.lines or self.lines[-1][1] != lineno):
+            self.lines.append((len(self.code), lineno))
+
+    def _patch(self, pc):
+        """O salto em pc passa a ir para o pc atual (o destino é o último argumento usado)."""
+        instruction = self.code[pc]
+        if instruction[0] in _JUMPS:
+            self.code[pc] = (instruction[0], len(self.code), 0, 0, 0)
+        else:
+            self.code[pc] = instruction[:4] + (len(self.code),)
+
+    def _operand(self, node):
+        """Índice no frame de uma folha (variável ou constante)."""
+        if node.type == 'var':
+            try:
+                return self.slots[node.value]
+            except KeyError:
+                raise VMError('undeclared-variable',
+                              "Variável '{name}' não está na tabela de símbolos",
+                              {'name': node.value}, node.lineno) from None
+        # (tipo, valor): True e 1 não podem virar a mesma constante
+        key = (node.value.__class__, node.value)
+        index = self._const_index.get(key)
+        if index is None:
+            index = self._const_index[key] = len(self.consts)
+            self.consts.append(node.value)
+        return len(self.slots) + index
+
+    def _leaf_binop(self, node):
+        """(função, esquerdo, direito) se node for 'folha op folha' (sem and/or)."""
+        if node.type != 'binop' or node.value not in _OPERATOR_FUNCTIONS:
+            return None
+        left, right = node.children
+        if left.type not in _LEAVES or right.type not in _LEAVES:
+            return None
+        return _OPERATOR_FUNCTIONS[node.value], self._operand(left), self._operand(right)
+
+    # Statements
+    def _compile_program(self, node):
+        self._work.extend(reversed(node.children))
+
+    _compile_block = _compile_program
+
+    def _condition_jump(self, cond, jump_if, target, node, at):
+        """Ações (em ordem) da condição seguida do salto; at recebe o pc do salto."""
+        fused = self._leaf_binop(cond)
+        if fused:
+            op = BINARY_LR_JUMP_IF_TRUE if jump_if else BINARY_LR_JUMP_IF_FALSE
+            return [(_EMIT_AT, (op, *fused, target), node.lineno, at)]
+        jump = (JUMP_IF_TRUE if jump_if else JUMP_IF_FALSE, target, 0, 0, 0)
+        return [(_LINE, node.lineno), cond, (_EMIT_AT, jump, node.lineno, at)]
+
+    def _compile_assign(self, node):
+        self._mark_line(node.lineno)
+        target = self._operand(node.children[0])
+        expr = node.children[1]
+        fused = self._leaf_binop(expr)
+        if fused:
+            self._emit((BINARY_LR_STORE, *fused, target), node.lineno)
+        elif expr.type in _LEAVES:
+            self._emit((MOVE, self._operand(expr), target, 0, 0), node.lineno)
+        else:
+            self._work.append((_EMIT, (STORE, target, 0, 0, 0), node.lineno))
+            self._work.append(expr)
+
+    def _compile_print(self, node):
+        self._mark_line(node.lineno)
+        if node.children:
+            self._work.append((_EMIT, _PRINT, node.lineno))
+            self._work.append(node.children[0])
+
+    def _compile_if(self, node):
+        work = self._work
+        to_else = []
+        if node.type == 'if_else':
+            to_end = []
+            work.append((_PATCH, to_end))
+            work.append(node.children[2])
+            work.append((_PATCH, to_else))
+            work.append((_EMIT_AT, (JUMP, 0, 0, 0, 0), None, to_end))
+        else:
+            work.append((_PATCH, to_else))
+        work.append(node.children[1])
+        self._mark_line(node.lineno)
+        work.extend(reversed(self._condition_jump(node.children[0], False, 0, node, to_else)))
+
+    _compile_if_else = _compile_if
+
+    def _compile_while(self, node):
+        # Condição no fim do laço: um único salto por iteração. O corpo começa
+        # logo depois do JUMP, então o destino do salto de volta já é conhecido.
+        to_cond = self._emit((JUMP, 0, 0, 0, 0), node.lineno)
+        work = self._work
+        work.extend(reversed(self._condition_jump(node.children[0], True, len(self.code), node, [])))
+        work.append((_PATCH, [to_cond]))
+        work.append(node.children[1])
+
+    # Expressões
+    def _compile_number(self, node):
+        self._emit((LOAD, self._operand(node), 0, 0, 0), node.lineno)
+
+    _compile_string = _compile_number
+    _compile_boolean = _compile_number
+    _compile_var = _compile_number
+
+    def _compile_binop(self, node):
+        op = node.value
+        left, right = node.children
+        work = self._work
+        if op in ('and', 'or'):
+            jump = []
+            work.append((_PATCH, jump))
+            work.append(right)
+            work.append((_EMIT_AT, (JUMP_IF_FALSE_OR_POP if op == 'and' else JUMP_IF_TRUE_OR_POP,
+                                    0, 0, 0, 0), node.lineno, jump))
+            work.append(left)
+            return
+        function = _OPERATOR_FUNCTIONS[op]
+        if right.type in _LEAVES:
+            if left.type in _LEAVES:
+                self._emit((BINARY_LR, function, self._operand(left), self._operand(right), 0),
+                           node.lineno)
+            else:
+                work.append((_EMIT, (BINARY_R, function, self._operand(right), 0, 0), node.lineno))
+                work.append(left)
+        elif left.type in _LEAVES:
+            # A folha só é lida depois do lado direito; como ler uma variável
+            # nunca falha (o erro vem do uso, ver _Unset), o resultado é o mesmo
+            work.append((_EMIT, (BINARY_L, function, self._operand(left), 0, 0), node.lineno))
+            work.append(right)
+        else:
+            work.append((_EMIT, (BINARY, function, 0, 0, 0), node.lineno))
+            work.append(right)
+            work.append(left)
+
+    def _compile_unop(self, node):
+        self._work.append((_EMIT, _NOT, node.lineno))
+        self._work.append(node.children[0])
+
+    def _compile_other(self, node):
+        raise VMError('unsupported-node', "Nó '{type}' não pode ser compilado",
+                      {'type': node.type}, node.lineno)
+
+
+def compile_program(ast_root, symbol_table):
+    """Program da AST, compilado só na primeira vez.
+
+    O cache guarda a própria raiz (o id não é reaproveitado enquanto ela
+    existir) e os slots da tabela de símbolos; a AST não deve ser alterada
+    depois de compilada.
+    """
+    slots = tuple(symbol_table.variables())
+    key = id(ast_root)
+    cached = _program_cache.get(key)
+    if cached is not None and cached[0] is ast_root and cached[1] == slots:
+        return cached[2]
+    program = Compiler(symbol_table).compile(ast_root)
+    if len(_program_cache) >= _PROGRAM_CACHE_SIZE and key not in _program_cache:
+        del _program_cache[next(iter(_program_cache))]
+    _program_cache[key] = (ast_root, slots, program)
+    return program
+
+
+# ---------------------------
+# Máquina virtual
+# ---------------------------
+def execute(program, out=None):
+    """Executa o Program; a saída de print vai para out (padrão: sys.stdout)."""
+    code = program.code
+    frame = [_Unset(name) for name in program.names] + list(program.consts)
+    stack = []
+    push = stack.append
+    pop = stack.pop
+    write = (out or sys.stdout).write
+    pc = 0
+    try:
+        # Opcodes mais frequentes primeiro. pc já aponta para a próxima
+        # instrução: no erro, a instrução atual é pc - 1.
+        while True:
+            op, a, b, c, d = code[pc]
+            pc += 1
+            if op == BINARY_LR:
+                push(a(frame[b], frame[c]))
+            elif op == BINARY_R:
+                stack[-1] = a(stack[-1], frame[b])
+            elif op == BINARY:
+                right = pop()
+                stack[-1] = a(stack[-1], right)
+            elif op == LOAD:
+                push(frame[a])
+            elif op == BINARY_L:
+                stack[-1] = a(frame[b], stack[-1])
+            elif op == BINARY_LR_STORE:
+                frame[d] = a(frame[b], frame[c])
+            elif op == STORE:
+                frame[a] = pop()
+            elif op == JUMP_IF_FALSE_OR_POP:
+                if stack[-1]:
+                    pop()
+                else:
+                    pc = a
+            elif op == JUMP_IF_TRUE:
+                if pop():
+                    pc = a
+            elif op == BINARY_LR_JUMP_IF_TRUE:
+                if a(frame[b], frame[c]):
+                    pc = d
+            elif op == BINARY_LR_JUMP_IF_FALSE:
+                if not a(frame[b], frame[c]):
+                    pc = d
+            elif op == MOVE:
+                frame[b] = frame[a]
+            elif op == JUMP_IF_FALSE:
+                if not pop():
+                    pc = a
+            elif op == JUMP:
+                pc = a
+            elif op == JUMP_IF_TRUE_OR_POP:
+                if stack[-1]:
+                    pc = a
+                else:
+                    pop()
+            elif op == NOT:
+                stack[-1] = not stack[-1]
+            elif op == PRINT:
+                write(f"{pop()}\n")
+            elif op == HALT:
+                return
+            else:
+                raise VMError('bad-opcode', "Opcode inválido: {op}", {'op': op})
+    except VMError as e:
+        e.line = program.line_at(pc - 1)
+        raise
+    except _Unassigned as e:
+        raise VMError('unassigned-variable',
+                      "Erro de execução: a variável '{name}' ainda não tem valor",
+                      {'name': e.name}, program.line_at(pc - 1)) from None
+    except ZeroDivisionError:
+        raise VMError('division-by-zero', "Erro de execução: divisão por zero", {},
+                      program.line_at(pc - 1)) from None
+    except TypeError as e:
+        raise VMError('runtime-type-error', "Erro de execução: {detail}", {'detail': str(e)},
+                      program.line_at(pc - 1)) from None
+
+
+def disassemble(program, out=None):
+    """Lista o bytecode em texto (linha, pc, opcode e argumentos já resolvidos)."""
+    out = out or sys.stdout
+    lines = dict(program.lines)
+    for pc, (op, a, b, c, d) in enumerate(program.code):
+        if op in (LOAD, STORE):
+            detail = program.operand_repr(a)
+        elif op == MOVE:
+            detail = f"{program.operand_repr(b)} = {program.operand_repr(a)}"
+        elif op in _JUMPS:
+            detail = f"-> {a}"
+        elif op in _BINARY_LR_OPS:
+            detail = f"{program.operand_repr(b)} {_OPERATOR_NAMES[a]} {program.operand_repr(c)}"
+            if op == BINARY_LR_STORE:
+                detail = f"{program.operand_repr(d)} = {detail}"
+            elif op != BINARY_LR:
+                detail += f" -> {d}"
+        elif op == BINARY:
+            detail = _OPERATOR_NAMES[a]
+        elif op == BINARY_L:
+            detail = f"{program.operand_repr(b)} {_OPERATOR_NAMES[a]} [pilha]"
+        elif op == BINARY_R:
+            detail = f"[pilha] {_OPERATOR_NAMES[a]} {program.operand_repr(b)}"
+        else:
+            detail = ''
+        line = f"{lines[pc]:>4}" if pc in lines else '    '
+        out.write(f"{line} {pc:>6} {OPCODE_NAMES[op]:<25}{detail}\n")
+    out.write(f"constantes: {program.consts!r}\n")
+    out.write(f"slots: {program.names!r}\n")
+
+
+# ---------------------------
+# Interpretador de referência
+# ---------------------------
+class TreeInterpreter:
+    """Interpretador ingênuo (recursivo) sobre a AST, usado como comparação."""
+
+    def __init__(self, out=None):
+        self.out = out or sys.stdout
+        self.variables = {}
+
+    def run(self, node):
+        getattr(self, 'exec_' + node.type)(node)
+
+    def exec_program(self, node):
+        for child in node.children:
+            self.run(child)
+
+    exec_block = exec_program
+
+    def exec_assign(self, node):
+        self.variables[node.children[0].value] = self.eval(node.children[1])
+
+    def exec_print(self, node):
+        if node.children:
+            self.out.write(f"{self.eval(node.children[0])}\n")
+
+    def exec_if(self, node):
+        if self.eval(node.children[0]):
+            self.run(node.children[1])
+
+    def exec_if_else(self, node):
+        if self.eval(node.children[0]):
+            self.run(node.children[1])
+        else:
+            self.run(node.children[2])
+
+    def exec_while(self, node):
+        while self.eval(node.children[0]):
+            self.run(node.children[1])
+
+    def eval(self, node):
+        kind = node.type
+        if kind in ('number', 'string', 'boolean'):
+            return node.value
+        if kind == 'var':
+            return self.variables[node.value]
+        if kind == 'unop':
+            return not self.eval(node.children[0])
+        op = node.value
+        left = self.eval(node.children[0])
+        if op == 'and':
+            return left and self.eval(node.children[1])
+        if op == 'or':
+            return left or self.eval(node.children[1])
+        right = self.eval(node.children[1])
+        if op == '+':
+            return left + right
+        if op == '-':
+            return left - right
+        if op == '*':
+            return left * right
+        if op == '/':
+            return left / right
+        if op == '<':
+            return left < right
+        if op == '>':
+            return left > right
+        if op == '<=':
+            return left <= right
+        if op == '>=':
+            return left >= right
+        if op == '==':
+            return left == right
+        return left != right